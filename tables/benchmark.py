@@ -0,0 +1,456 @@
+"""Benchmarks of the table-building stages on synthetic data.
+
+Synthetic corpora and user bases are generated at multiples of the current
+``data/`` sizes, the heavy dependencies are replaced by deterministic local
+stand-ins (random embeddings instead of PhoBERT, a whitespace analyzer instead
+of pyvi/underthesea, a dictionary instead of Google Translate, a file writer
+instead of gTTS), and every stage runs in its own process so its peak RSS (and
+that of its largest pool worker) can be read from ``resource``. Stage modules
+are imported by the stage that uses them, and the RSS right after the shared
+imports is reported and subtracted before peaks are compared. Run from the
+repository root::
+
+    python tables/benchmark.py                       # every stage at 1x, 10x and 100x
+    python tables/benchmark.py --scales 1 10 -- words  # some stages and scales only
+    python tables/benchmark.py --check               # exit 1 on a regression
+
+Results are appended to ``RESULTS_FILE`` (one JSON line per stage and scale)
+and compared with the previous result of the same stage, scale and host.
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import zlib
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from metrics import lifetime_peak_rss_mb, rss_mb
+from progress import generate_progress
+from table_io import read_table, write_table
+from updated_lesson_sentence import sample_sentences
+
+RESULTS_FILE = "data/benchmarks.jsonl"
+SCALES = [1, 10, 100]
+SEED = 42
+
+# Sizes of the current data/ tables, i.e. scale 1
+BASE_SENTENCES = 11057
+BASE_USERS = 50
+BASE_VOCAB = 5000
+TOPICS = 19
+LESSONS_PER_TOPIC = 5
+WORDS_PER_SENTENCE = (4, 16)
+# Stand-in for PhoBERT's hidden size, so the similarity search does the same work
+EMBEDDING_DIM = 768
+# Synthesizing one file per sentence at 100x would mostly measure the file system
+TTS_MAX_SENTENCES = 20000
+# The leaderboard stage ranks this many users per 1x, with a progress row for
+# every lesson like progress.py, so 100x covers 10^5 users and 9.5M rows
+LEADERBOARD_USERS = 1000
+LEADERBOARD_QUERIES = 10000
+
+# A stage is reported as a regression when it gets this much slower or larger
+REGRESSION_TOLERANCE = 1.25
+# Timings below this are too noisy to compare
+MIN_SECONDS = 0.5
+# Peak RSS increases below this are too noisy to report
+MIN_RSS_MB = 20
+
+SYLLABLES = ["an", "ba", "cho", "dan", "em", "gia", "hoa", "khi", "lam", "minh", "nha", "ong",
+             "phai", "qua", "ren", "sang", "tay", "uong", "van", "xin", "yeu", "duoc", "truong", "nguoi"]
+POS_TAGS = ["N", "V", "A", "E", "R", "Np"]
+
+
+def scaled(base, scale):
+    return max(1, int(round(base * scale)))
+
+
+def vocab_size(scale):
+    # Vocabulary grows sublinearly with the corpus (Heaps' law)
+    return scaled(BASE_VOCAB, scale ** 0.5)
+
+
+def make_vocabulary(size, rng):
+    """Distinct pseudo-Vietnamese words of one to three syllables joined by ``_``."""
+    words = set()
+    while len(words) < size:
+        n_syllables = rng.integers(1, 4)
+        words.add("_".join(rng.choice(SYLLABLES, n_syllables)))
+    return sorted(words)
+
+
+def make_dataset(root, scale, seed=SEED):
+    """Write synthetic ``sentences``, ``topics``, ``users``, ``lessons``,
+    ``selected_sentences``, ``progress`` tables and a stopword list to ``root``."""
+    rng = np.random.default_rng(seed)
+    vocab = np.array(make_vocabulary(vocab_size(scale), rng))
+    n_sentences = scaled(BASE_SENTENCES, scale)
+
+    lengths = rng.integers(*WORDS_PER_SENTENCE, n_sentences)
+    # Zipf-like word frequencies, as in a real corpus
+    weights = 1 / np.arange(1, len(vocab) + 1)
+    tokens = rng.choice(vocab, lengths.sum(), p=weights / weights.sum())
+    viet = [" ".join(words).replace("_", " ") for words in np.split(tokens, np.cumsum(lengths)[:-1])]
+
+    topics = pd.DataFrame({
+        "topic_id": range(1, TOPICS + 1),
+        "topic_name": [f"topic_{i}" for i in range(1, TOPICS + 1)],
+        "description": [f"Synthetic topic {i}" for i in range(1, TOPICS + 1)],
+    })
+    sentences = pd.DataFrame({
+        "s_id": range(1, n_sentences + 1),
+        "eng": [f"sentence {i}" for i in range(1, n_sentences + 1)],
+        "viet": viet,
+        "topic_name": rng.choice(topics["topic_name"].to_numpy(), n_sentences),
+    })
+    lessons = pd.DataFrame({
+        "topic_id": np.repeat(topics["topic_id"].to_numpy(), LESSONS_PER_TOPIC),
+        "lesson_id": np.tile(np.arange(1, LESSONS_PER_TOPIC + 1), TOPICS),
+        "lesson_type": "Vocab",
+    })
+    users = pd.DataFrame({"u_id": range(1, scaled(BASE_USERS, scale) + 1)})
+
+    write_table(sentences, "sentences", root)
+    write_table(topics, "topics", root)
+    write_table(lessons, "lessons", root)
+    write_table(users, "users", root)
+    write_table(sample_sentences(sentences, topics, seed=seed), "selected_sentences", root)
+    generate_progress(users["u_id"].to_numpy(), lessons[["topic_id", "lesson_id"]], root, seed=seed)
+    with open(os.path.join(root, "stopwords.txt"), "w", encoding="utf-8") as f:
+        f.write("\n".join(vocab[:50]).replace("_", " "))
+
+
+def standin_analyzer(sentence):
+    """Deterministic replacement for :func:`sentence_analysis.analyze_sentence`.
+
+    Syllables are paired into two-syllable words and tags are derived from a
+    checksum of the word, so the vocabulary and the share of proper nouns
+    (``Np``, never selected) stay stable across runs.
+    """
+    cleaned = sentence.lower()
+    syllables = cleaned.split()
+    tokens = ["_".join(syllables[i:i + 2]) for i in range(0, len(syllables), 2)]
+    pos_tags = [POS_TAGS[zlib.crc32(token.encode("utf-8")) % len(POS_TAGS)] for token in tokens]
+    return {"cleaned": cleaned, "tokens": tokens, "pos_tags": pos_tags}
+
+
+def standin_embeddings(words, seed=SEED):
+    """Random embeddings, identical for a given word list and seed."""
+    return np.random.default_rng(seed).standard_normal((len(words), EMBEDDING_DIM), dtype=np.float32)
+
+
+class StandinTTSBackend:
+    """Writes a tiny file with an ID3 header instead of calling a TTS service."""
+
+    def synthesize(self, text, lang, output_filename):
+        with open(output_filename, "wb") as f:
+            f.write(b"ID3" + text.encode("utf-8"))
+
+
+class Phases:
+    """Wall time of the named phases of one stage."""
+
+    def __init__(self):
+        self.seconds = {}
+        self._name = None
+        self._start = None
+
+    def __call__(self, name):
+        self._name = name
+        return self
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+
+    def __exit__(self, *exc_info):
+        self.seconds[self._name] = round(time.perf_counter() - self._start, 4)
+
+
+def bench_words(root, work_dir, phase):
+    """word.py: analysis, embeddings, similarity index, selection and merge."""
+    from embedding_store import EmbeddingStore
+    from sentence_analysis import SentenceAnalysisCache
+    from similarity_index import SimilarityIndex
+    from translation_memo import DictionaryBackend, TranslationMemo
+    from words_builder import make_shards, merge_shards, select_shards
+
+    sentences = read_table("sentences", root, columns=["s_id", "viet"])
+    with open(os.path.join(root, "stopwords.txt"), "r", encoding="utf-8") as f:
+        stopwords = {line.strip().replace(" ", "_") for line in f}
+    shards = make_shards(sentences, 500)
+
+    with phase("analysis"):
+        cache = SentenceAnalysisCache(os.path.join(work_dir, "analysis.sqlite"), analyzer=standin_analyzer)
+        shard_analyses = [cache.analyze_many(shard_sentences) for _, _, shard_sentences in shards]
+        cache.close()
+    with phase("embeddings"):
+        vocab = sorted({token for analyses in shard_analyses for analysis in analyses for token in analysis["tokens"]})
+        store_file = os.path.join(work_dir, "embeddings.npy")
+        EmbeddingStore(vocab, standin_embeddings(vocab), model_name="benchmark").save(store_file)
+        store = EmbeddingStore.load(store_file)
+    with phase("index"):
+        index_file = os.path.join(work_dir, "index.npz")
+        SimilarityIndex(store.words, store.matrix).save(index_file)
+    with phase("select"):
+        shard_paths = select_shards(shards, shard_analyses, index_file, stopwords, 2, SEED,
+                                    os.path.join(work_dir, "shards"), top_n=2, workers=1)
+    with phase("merge"):
+        backend = DictionaryBackend({word.replace("_", " "): f"en {word}" for word in vocab})
+        translator = TranslationMemo(os.path.join(work_dir, "translations.sqlite"), backend)
+        words = merge_shards(shard_paths, translator)
+        translator.close()
+    return len(words)
+
+
+def bench_selected_sentences(root, work_dir, phase):
+    """updated_lesson_sentence.py: per-topic sampling."""
+    topics = read_table("topics", root, columns=["topic_id", "topic_name"])
+    sentences = read_table("sentences", root)
+    with phase("sample"):
+        selected = sample_sentences(sentences, topics, seed=SEED)
+    return len(selected)
+
+
+def bench_lessons_sentences(root, work_dir, phase):
+    """lesson_sentence.py: sentences of every lesson."""
+    from lesson_sentence import build_lessons_sentences
+
+    topics = read_table("topics", root, columns=["topic_id", "topic_name"])
+    sentences = read_table("selected_sentences", root, columns=["s_id", "topic"])
+    with phase("build"):
+        lessons_sentences = build_lessons_sentences(topics, sentences)
+    return len(lessons_sentences)
+
+
+def bench_progress(root, work_dir, phase):
+    """progress.py: progress rows for every user and lesson."""
+    users = read_table("users", root, columns=["u_id"])
+    lessons = read_table("lessons", root, columns=["topic_id", "lesson_id"])
+    with phase("generate"):
+        return generate_progress(users["u_id"].to_numpy(), lessons, work_dir, seed=SEED)
+
+
+def bench_user_friends(root, work_dir, phase):
+    """friend_graph.py: friend graph and its CSV exports."""
+    from friend_graph import generate_friend_graph
+
+    users = read_table("users", root, columns=["u_id"])
+    with phase("generate"):
+        graph = generate_friend_graph(users["u_id"].to_numpy(), seed=SEED)
+    with phase("export"):
+        graph.save(os.path.join(work_dir, "user_friends.npz"))
+        graph.to_edge_frame().to_csv(os.path.join(work_dir, "user_friends_edges.csv"), index=False)
+        graph.to_legacy_frame().to_csv(os.path.join(work_dir, "user_friends.csv"), index=False)
+    return graph.num_edges
+
+
+def bench_points(root, work_dir, phase):
+    """add_columns.ipynb: user points, built in full then updated from 1% of progress rows."""
+    from points import PointsAggregator
+
+    progress = read_table("progress", root, columns=["u_id", "topic_id", "lesson_id", "score"])
+    with phase("build"):
+        aggregator = PointsAggregator.from_progress(progress)
+    updates = progress.sample(frac=0.01, random_state=SEED).assign(score=10000)
+    with phase("update"):
+        aggregator.apply_progress(updates)
+    with phase("points_for"):
+        aggregator.points_for(progress["u_id"].unique())
+    return len(progress)
+
+
+def bench_leaderboard(root, work_dir, phase):
+    """leaderboard.py: rank indexes, then rank and friends queries and score updates."""
+    from friend_graph import generate_friend_graph
+    from leaderboard import Leaderboard
+
+    lessons = read_table("lessons", root, columns=["topic_id", "lesson_id"])
+    n_users = max(1, round(len(read_table("users", root, columns=["u_id"])) * LEADERBOARD_USERS / BASE_USERS))
+    rng = np.random.default_rng(SEED)
+    progress = pd.DataFrame({
+        "u_id": np.repeat(np.arange(1, n_users + 1, dtype=np.int32), len(lessons)),
+        "topic_id": np.tile(lessons["topic_id"].to_numpy(dtype=np.int16), n_users),
+        "lesson_id": np.tile(lessons["lesson_id"].to_numpy(dtype=np.int16), n_users),
+        "score": rng.integers(0, 10001, n_users * len(lessons), dtype=np.int16),
+    })
+    graph = generate_friend_graph(np.arange(1, n_users + 1), seed=SEED)
+
+    with phase("build"):
+        leaderboard = Leaderboard.from_progress(progress, graph=graph)
+    u_ids = rng.integers(1, n_users + 1, LEADERBOARD_QUERIES).tolist()
+    topic_ids = rng.choice(lessons["topic_id"].to_numpy(), LEADERBOARD_QUERIES).tolist()
+    with phase("rank"):
+        for u_id, topic_id in zip(u_ids, topic_ids):
+            leaderboard.rank(u_id), leaderboard.rank(u_id, topic_id)
+    with phase("friends"):
+        for u_id in u_ids:
+            leaderboard.friends_top(u_id), leaderboard.friends_rank(u_id)
+    updates = progress.sample(n=min(LEADERBOARD_QUERIES, len(progress)), random_state=SEED).assign(score=10000)
+    with phase("update"):
+        leaderboard.apply_progress(updates)
+    # Two rank and two friends queries per sampled user, one update per row
+    return 4 * LEADERBOARD_QUERIES + len(updates)
+
+
+def bench_media(root, work_dir, phase):
+    """media.py: TTS job scheduling, deduplication and file handling."""
+    from tts_runner import build_manifest, run_jobs
+
+    sentences = read_table("sentences", root, columns=["s_id", "eng", "viet"]).head(TTS_MAX_SENTENCES)
+    jobs = build_manifest(sentences, os.path.join(work_dir, "media"))
+    with phase("synthesize"):
+        failures = run_jobs(jobs, StandinTTSBackend(), os.path.join(work_dir, "audio_texts.sqlite"),
+                            workers=4, rate=1e9, burst=1000, retries=0)
+    return len(jobs) - len(failures)
+
+
+STAGES = {
+    "words": bench_words,
+    "selected_sentences": bench_selected_sentences,
+    "lessons_sentences": bench_lessons_sentences,
+    "progress": bench_progress,
+    "user_friends": bench_user_friends,
+    "points": bench_points,
+    "leaderboard": bench_leaderboard,
+    "media": bench_media,
+}
+
+
+def run_stage(name, root, work_dir):
+    """Run one stage in the current process and measure it."""
+    phase = Phases()
+    # numpy, pandas and the dataset helpers every stage process imports
+    import_rss_mb = rss_mb()
+    start = time.perf_counter()
+    items = STAGES[name](root, work_dir, phase)
+    seconds = time.perf_counter() - start
+    peak_rss_mb = lifetime_peak_rss_mb()
+    return {
+        "seconds": round(seconds, 4),
+        "items": int(items),
+        "items_per_second": round(items / seconds, 1) if seconds else None,
+        # The stage process lives for this stage only, so its lifetime peak is the stage's
+        "peak_rss_mb": peak_rss_mb,
+        "import_rss_mb": import_rss_mb,
+        # What the stage itself (including its own imports) added to the peak
+        "stage_peak_rss_mb": None if import_rss_mb is None else round(peak_rss_mb - import_rss_mb, 1),
+        # Largest process-pool worker of the stage (pools are shut down by now)
+        "children_peak_rss_mb": lifetime_peak_rss_mb(resource.RUSAGE_CHILDREN),
+        "phases": phase.seconds,
+    }
+
+
+def run_in_subprocess(name, root, work_dir):
+    """Run one stage in a fresh interpreter so its peak RSS is its own."""
+    result = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--run-stage", name, "--root", root, "--work-dir", work_dir],
+        stdout=subprocess.PIPE, text=True,
+    )
+    if result.returncode != 0:
+        return {"error": f"exit code {result.returncode}"}
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def load_results(path=RESULTS_FILE):
+    if not os.path.exists(path):
+        return []
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def previous_result(results, record):
+    """Latest earlier result of the same stage and scale on the same host."""
+    for previous in reversed(results):
+        if (previous["stage"], previous["scale"], previous["host"]) == (record["stage"], record["scale"], record["host"]) \
+                and "error" not in previous:
+            return previous
+    return None
+
+
+def regressions(record, previous, tolerance=REGRESSION_TOLERANCE):
+    """Metrics of ``record`` that got worse than ``previous`` by more than ``tolerance``."""
+    if previous is None or "error" in record:
+        return []
+    found = []
+    if record["seconds"] > tolerance * previous["seconds"] and record["seconds"] >= MIN_SECONDS:
+        found.append(f"time {previous['seconds']:.2f}s -> {record['seconds']:.2f}s")
+    # Compared above the import baseline, which dominates the peak of small stages
+    before, after = previous.get("stage_peak_rss_mb"), record.get("stage_peak_rss_mb")
+    if before is not None and after is not None and after > tolerance * before and after - before >= MIN_RSS_MB:
+        found.append(f"peak RSS above imports {before:.0f} MB -> {after:.0f} MB")
+    return found
+
+
+def benchmark(stages, scales, results_file=RESULTS_FILE):
+    """Benchmark ``stages`` at every scale and append the results.
+
+    Returns:
+        list[tuple[dict, list[str]]]: Every new record with its regressions.
+    """
+    results = load_results(results_file)
+    commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], stdout=subprocess.PIPE,
+                            stderr=subprocess.DEVNULL, text=True).stdout.strip() or None
+    run_at = datetime.now().isoformat(timespec="seconds")
+
+    report = []
+    for scale in scales:
+        with tempfile.TemporaryDirectory(prefix=f"benchmark_{scale}x_") as tmp_dir:
+            root = os.path.join(tmp_dir, "data")
+            print(f"Generating synthetic data at {scale}x...")
+            make_dataset(root, scale)
+            for name in stages:
+                work_dir = os.path.join(tmp_dir, name)
+                os.makedirs(work_dir)
+                print(f"[{name} {scale}x] running")
+                record = {"stage": name, "scale": scale, "run_at": run_at, "commit": commit,
+                          "host": platform.node(), **run_in_subprocess(name, root, work_dir)}
+                found = regressions(record, previous_result(results, record))
+                report.append((record, found))
+                results.append(record)
+
+                os.makedirs(os.path.dirname(results_file), exist_ok=True)
+                with open(results_file, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(record) + "\n")
+                if "error" in record:
+                    print(f"[{name} {scale}x] failed: {record['error']}")
+                else:
+                    print(f"[{name} {scale}x] {record['seconds']:.2f}s, {record['peak_rss_mb']:.0f} MB peak RSS "
+                          f"({record['import_rss_mb']} MB after imports), {record['items']} items")
+                for regression in found:
+                    print(f"[{name} {scale}x] REGRESSION: {regression}")
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the table-building stages on synthetic data.")
+    parser.add_argument("stages", nargs="*", help=f"stages to benchmark (default: all of {', '.join(STAGES)})")
+    parser.add_argument("--scales", type=float, nargs="+", default=SCALES,
+                        help="multiples of the current data sizes")
+    parser.add_argument("--results", default=RESULTS_FILE, help="JSON lines file the results are appended to")
+    parser.add_argument("--check", action="store_true", help="exit with status 1 if any stage regressed")
+    parser.add_argument("--run-stage", help=argparse.SUPPRESS)
+    parser.add_argument("--root", help=argparse.SUPPRESS)
+    parser.add_argument("--work-dir", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_stage:
+        # Child process: the progress bars go to stderr, the result is the last stdout line
+        outcome = run_stage(args.run_stage, args.root, args.work_dir)
+        print(json.dumps(outcome))
+        sys.exit(0)
+
+    unknown = set(args.stages) - set(STAGES)
+    if unknown:
+        raise SystemExit(f"Unknown stages: {', '.join(sorted(unknown))}")
+    scales = [int(scale) if float(scale).is_integer() else scale for scale in args.scales]
+    report = benchmark(args.stages or list(STAGES), scales, args.results)
+    if args.check and any(found or "error" in record for record, found in report):
+        sys.exit(1)
@@ -0,0 +1,227 @@
+"""Near-duplicate sentence detection with MinHash and LSH banding.
+
+Sentences are normalized (case, punctuation, whitespace), turned into
+character shingles of both the English and the Vietnamese text, and
+summarized by MinHash signatures. Signatures are split into bands; sentences
+sharing a band fall in the same bucket and are compared with the bucket's
+first sentence only, so the work grows with the number of sentences rather
+than the number of pairs. Accepted pairs are merged with union-find and every
+cluster keeps its smallest ``s_id`` as canonical. Scripts reading the
+sentences table drop the other members with :func:`canonical_sentences`.
+The mapping is saved with a hash of the sentences it was computed from, as
+``s_id`` values change whenever the sentences table is rebuilt.
+"""
+import hashlib
+import json
+import os
+import re
+import unicodedata
+import zlib
+
+import numpy as np
+import pandas as pd
+
+from table_io import read_table, table_path, write_table
+
+DATA_DIR = "data"
+SHINGLE_SIZE = 5
+NUM_PERM = 128
+# 16 bands of 8 rows: pairs above ~0.7 estimated Jaccard similarity almost
+# always share a band, pairs below ~0.5 rarely do
+BANDS = 16
+THRESHOLD = 0.8
+SEED = 42
+# Sentences hashed at a time; bounds the (shingles x NUM_PERM) work matrix
+CHUNK_ROWS = 500
+
+MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+MAX_HASH = np.uint64((1 << 32) - 1)
+
+_non_word = re.compile(r"[^\w\s]|_")
+_spaces = re.compile(r"\s+")
+
+
+def normalize_text(text):
+    """Lowercase, drop punctuation and collapse whitespace (Unicode NFC)."""
+    text = unicodedata.normalize("NFC", str(text)).lower()
+    return _spaces.sub(" ", _non_word.sub(" ", text)).strip()
+
+
+def shingles(text, k=SHINGLE_SIZE):
+    """Character ``k``-grams of ``text`` (the whole text if it is shorter)."""
+    if len(text) <= k:
+        return {text} if text else set()
+    return {text[i:i + k] for i in range(len(text) - k + 1)}
+
+
+def shingle_hashes(eng, viet, k=SHINGLE_SIZE):
+    """32-bit hashes of the shingles of both sides of a sentence pair."""
+    parts = {f"e{s}" for s in shingles(normalize_text(eng), k)} | {f"v{s}" for s in shingles(normalize_text(viet), k)}
+    return np.fromiter((zlib.crc32(part.encode("utf-8")) for part in parts), dtype=np.uint64, count=len(parts))
+
+
+def minhash_signatures(hash_sets, num_perm=NUM_PERM, seed=SEED, chunk_rows=CHUNK_ROWS):
+    """MinHash signature of every set of shingle hashes.
+
+    Returns:
+        np.ndarray: uint32 matrix of shape (len(hash_sets), num_perm); rows of
+        empty sets are all ``MAX_HASH``.
+    """
+    rng = np.random.default_rng(seed)
+    a = rng.integers(1, MERSENNE_PRIME, num_perm, dtype=np.uint64)
+    b = rng.integers(0, MERSENNE_PRIME, num_perm, dtype=np.uint64)
+
+    signatures = np.full((len(hash_sets), num_perm), MAX_HASH, dtype=np.uint64)
+    for start in range(0, len(hash_sets), chunk_rows):
+        chunk = hash_sets[start:start + chunk_rows]
+        rows = np.array([row for row, hashes in enumerate(chunk) if len(hashes)], dtype=np.int64)
+        if not len(rows):
+            continue
+        flat = np.concatenate([chunk[row] for row in rows])
+        offsets = np.concatenate([[0], np.cumsum([len(chunk[row]) for row in rows])[:-1]])
+        # Universal hashing (a * x + b) mod p, as in datasketch; uint64 products wrap
+        permuted = ((flat[:, None] * a + b) % MERSENNE_PRIME) & MAX_HASH
+        signatures[start + rows] = np.minimum.reduceat(permuted, offsets, axis=0)
+    return signatures.astype(np.uint32)
+
+
+def candidate_pairs(signatures, bands=BANDS, threshold=THRESHOLD, seed=SEED):
+    """Pairs of rows sharing an LSH band whose estimated similarity reaches ``threshold``.
+
+    Within a bucket every row is only compared with the bucket's first row.
+
+    Returns:
+        np.ndarray: (n_pairs, 2) array of (row, representative row).
+    """
+    n, num_perm = signatures.shape
+    rows_per_band = num_perm // bands
+    multipliers = np.random.default_rng(seed).integers(1, 1 << 63, rows_per_band, dtype=np.uint64) | np.uint64(1)
+    positions = np.arange(n)
+
+    pairs = []
+    for band in range(bands):
+        block = signatures[:, band * rows_per_band:(band + 1) * rows_per_band].astype(np.uint64)
+        keys = (block * multipliers).sum(axis=1)
+        order = np.argsort(keys, kind="stable")
+        sorted_keys = keys[order]
+        starts = np.concatenate([[True], sorted_keys[1:] != sorted_keys[:-1]])
+        # First (smallest) row of the bucket of every row
+        representative = np.empty(n, dtype=np.int64)
+        representative[order] = order[np.maximum.accumulate(np.where(starts, positions, 0))]
+
+        rows = np.flatnonzero(representative != positions)
+        if not len(rows):
+            continue
+        similarity = (signatures[rows] == signatures[representative[rows]]).mean(axis=1)
+        accepted = rows[similarity >= threshold]
+        pairs.append(np.stack([accepted, representative[accepted]], axis=1))
+    return np.concatenate(pairs) if pairs else np.zeros((0, 2), dtype=np.int64)
+
+
+def cluster_roots(n, pairs):
+    """Union-find over ``pairs``; every row maps to the smallest row of its cluster."""
+    parent = np.arange(n)
+
+    def find(x):
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    for left, right in pairs:
+        root_left, root_right = find(left), find(right)
+        if root_left != root_right:
+            parent[max(root_left, root_right)] = min(root_left, root_right)
+    return np.array([find(x) for x in range(n)], dtype=np.int64)
+
+
+def find_duplicates(sentences, threshold=THRESHOLD):
+    """Map every sentence to the canonical ``s_id`` of its near-duplicate cluster.
+
+    Args:
+        sentences (pd.DataFrame): Sentences table with s_id, eng and viet.
+        threshold (float): Minimum estimated Jaccard similarity of the shingles.
+
+    Returns:
+        pd.DataFrame: s_id and canonical_s_id (the smallest s_id of the
+        cluster; equal to s_id for unique sentences).
+    """
+    sentences = sentences.sort_values("s_id", kind="stable")
+    s_ids = sentences["s_id"].to_numpy()
+    hash_sets = [shingle_hashes(eng, viet) for eng, viet in zip(sentences["eng"], sentences["viet"])]
+
+    # Sentences without text would all share the empty signature
+    has_text = np.array([len(hashes) > 0 for hashes in hash_sets], dtype=bool)
+    rows = np.flatnonzero(has_text)
+    roots = np.arange(len(s_ids))
+    if len(rows):
+        signatures = minhash_signatures([hash_sets[row] for row in rows])
+        roots[rows] = rows[cluster_roots(len(rows), candidate_pairs(signatures, threshold=threshold))]
+    return pd.DataFrame({"s_id": s_ids, "canonical_s_id": s_ids[roots]})
+
+
+def non_canonical_ids(duplicates):
+    """s_ids that duplicate another, canonical sentence."""
+    return set(duplicates.loc[duplicates["s_id"] != duplicates["canonical_s_id"], "s_id"])
+
+
+def sentences_hash(sentences):
+    """SHA-256 of the s_id, eng and viet columns of the sentences table."""
+    rows = pd.util.hash_pandas_object(sentences[["s_id", "eng", "viet"]], index=False)
+    return hashlib.sha256(rows.to_numpy().tobytes()).hexdigest()
+
+
+def save_duplicates(duplicates, sentences, data_dir=DATA_DIR):
+    """Write the sentence_duplicates table and the hash of the ``sentences`` it maps."""
+    write_table(duplicates, "sentence_duplicates", data_dir)
+    with open(table_path("sentence_duplicates", data_dir, "json"), "w", encoding="utf-8") as f:
+        json.dump({"sentences_hash": sentences_hash(sentences)}, f)
+
+
+def load_duplicates(data_dir=DATA_DIR, sentences=None):
+    """The sentence_duplicates table, or None until this script has written it.
+
+    Args:
+        data_dir (str): Folder of the sentences and sentence_duplicates tables.
+        sentences (pd.DataFrame): The sentences table, if already read.
+
+    Raises:
+        ValueError: The mapping was computed from other sentences (or saved
+            without their hash), so its s_ids may point at the wrong rows.
+    """
+    if not os.path.exists(table_path("sentence_duplicates", data_dir)):
+        return None
+    if sentences is None:
+        sentences = read_table("sentences", data_dir, columns=["s_id", "eng", "viet"])
+    try:
+        with open(table_path("sentence_duplicates", data_dir, "json"), "r", encoding="utf-8") as f:
+            saved_hash = json.load(f).get("sentences_hash")
+    except (OSError, ValueError):
+        saved_hash = None
+    if saved_hash != sentences_hash(sentences):
+        raise ValueError(f"{table_path('sentence_duplicates', data_dir)} does not match the current sentences "
+                         "table; run tables/dedupe.py again")
+    return read_table("sentence_duplicates", data_dir)
+
+
+def canonical_sentences(sentences, data_dir=DATA_DIR):
+    """Drop the sentences that near-duplicate a canonical one.
+
+    Sentences are returned unchanged until this script has written the
+    sentence_duplicates table to ``data_dir``; see :func:`load_duplicates`.
+    """
+    duplicates = load_duplicates(data_dir)
+    if duplicates is None:
+        return sentences
+    excluded = non_canonical_ids(duplicates)
+    return sentences[~sentences["s_id"].isin(excluded)].reset_index(drop=True)
+
+
+if __name__ == "__main__":
+    sentences = read_table("sentences", DATA_DIR, columns=["s_id", "eng", "viet"])
+    duplicates = find_duplicates(sentences)
+    save_duplicates(duplicates, sentences, DATA_DIR)
+
+    n_duplicates = len(non_canonical_ids(duplicates))
+    n_clusters = duplicates.loc[duplicates["s_id"] != duplicates["canonical_s_id"], "canonical_s_id"].nunique()
+    print(f"{n_duplicates} of {len(duplicates)} sentences are near-duplicates of {n_clusters} canonical sentences")
@@ -0,0 +1,198 @@
+import json
+import os
+import tempfile
+
+import numpy as np
+from tqdm.auto import tqdm
+
+from metrics import count
+
+
+class EmbeddingStore:
+    """Word embeddings kept as one contiguous matrix plus a vocab -> row index.
+
+    The matrix is written as a plain ``.npy`` file so it can be opened with
+    ``mmap_mode`` instead of unpickling a dictionary of arrays at startup. The
+    vocabulary file also records which model produced the vectors, so a cache
+    built with another model or revision is never reused.
+    """
+
+    def __init__(self, words, matrix, model_name=None, revision=None):
+        """
+        Args:
+            words (list[str]): Vocabulary, one word per matrix row.
+            matrix (np.ndarray): Embedding matrix of shape (len(words), dim).
+            model_name (str): Name of the model that produced the vectors.
+            revision (str): Model revision (commit hash or tag).
+        """
+        self.words = list(words)
+        self.matrix = matrix
+        self.model_name = model_name
+        self.revision = revision
+        self.word_to_row = {word: row for row, word in enumerate(self.words)}
+
+    def __len__(self):
+        return len(self.words)
+
+    def __contains__(self, word):
+        return word in self.word_to_row
+
+    def __getitem__(self, word):
+        return self.matrix[self.word_to_row[word]]
+
+    @classmethod
+    def from_dict(cls, embeddings_dict, model_name=None, revision=None):
+        """Build a store from a legacy ``{word: vector}`` dictionary."""
+        words = list(embeddings_dict)
+        matrix = np.stack([embeddings_dict[word] for word in words]).astype(np.float32)
+        return cls(words, matrix, model_name, revision)
+
+    def matches(self, model_name, revision):
+        """Whether the vectors were produced by the given model and revision."""
+        return self.model_name == model_name and self.revision == revision
+
+    def missing(self, words):
+        """Words not present in the store, in first-seen order and without duplicates."""
+        return [word for word in dict.fromkeys(words) if word not in self.word_to_row]
+
+    def append(self, words, matrix):
+        """Return a new in-memory store with extra rows appended."""
+        combined = np.concatenate([np.asarray(self.matrix, dtype=np.float32),
+                                   np.asarray(matrix, dtype=np.float32)])
+        return EmbeddingStore(self.words + list(words), combined, self.model_name, self.revision)
+
+    @staticmethod
+    def vocab_path(path):
+        """Path of the vocabulary file stored next to the ``.npy`` matrix."""
+        return os.path.splitext(path)[0] + "_vocab.json"
+
+    @classmethod
+    def exists(cls, path):
+        return os.path.exists(path) and os.path.exists(cls.vocab_path(path))
+
+    def save(self, path):
+        """Write the matrix to ``path`` and the vocabulary next to it.
+
+        Both files are written to unique temporary names first. The vocabulary
+        records the row count of its matrix, so :meth:`load` detects a pair
+        left inconsistent by a crash or a concurrent writer.
+        """
+        directory = os.path.dirname(path) or "."
+        fd, tmp_path = tempfile.mkstemp(suffix=".npy", dir=directory)
+        with os.fdopen(fd, "wb") as f:
+            np.save(f, np.ascontiguousarray(self.matrix, dtype=np.float32))
+        metadata = {"model_name": self.model_name, "revision": self.revision, "rows": len(self.words),
+                    "words": self.words}
+        fd, tmp_vocab_path = tempfile.mkstemp(suffix=".json", dir=directory)
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(metadata, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+        os.replace(tmp_vocab_path, self.vocab_path(path))
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        """Open a store written by :meth:`save`, memory-mapping the matrix by default.
+
+        Raises:
+            ValueError: If the vocabulary does not match the matrix.
+        """
+        with open(cls.vocab_path(path), "r", encoding="utf-8") as f:
+            metadata = json.load(f)
+        if isinstance(metadata, list):
+            # Vocabulary written before model metadata was recorded
+            metadata = {"words": metadata}
+        matrix = np.load(path, mmap_mode="r" if mmap else None)
+        rows = metadata.get("rows", len(metadata["words"]))
+        if not rows == len(metadata["words"]) == len(matrix):
+            raise ValueError(f"{path} has {len(matrix)} rows but its vocabulary lists "
+                             f"{len(metadata['words'])} words ({rows} recorded)")
+        return cls(metadata["words"], matrix, metadata.get("model_name"), metadata.get("revision"))
+
+
+def embed_words(words, tokenizer, model, batch_size=64):
+    """Compute mean-pooled embeddings for a list of words in batches.
+
+    Words are grouped by token length so every batch has a single sequence
+    length; no padding is needed and each row equals the embedding of the
+    word run on its own.
+
+    Args:
+        words (list[str]): Words to embed.
+        tokenizer: Hugging Face tokenizer matching ``model``.
+        model: Hugging Face encoder returning ``last_hidden_state``.
+        batch_size (int): Maximum number of words per forward pass.
+
+    Returns:
+        np.ndarray: Matrix of shape (len(words), hidden_size), in input order.
+    """
+    import torch
+
+    words = list(words)
+    matrix = np.zeros((len(words), model.config.hidden_size), dtype=np.float32)
+    if not words:
+        return matrix
+
+    input_ids = tokenizer(words, truncation=True)["input_ids"]
+    buckets = {}
+    for row, ids in enumerate(input_ids):
+        buckets.setdefault(len(ids), []).append(row)
+
+    batches = [
+        rows[start:start + batch_size]
+        for _, rows in sorted(buckets.items())
+        for start in range(0, len(rows), batch_size)
+    ]
+    for rows in tqdm(batches, desc="Generating embeddings"):
+        ids = torch.tensor([input_ids[row] for row in rows])
+        with torch.no_grad():
+            outputs = model(input_ids=ids, attention_mask=torch.ones_like(ids))
+        count("embedding_forward_passes")
+        matrix[rows] = outputs.last_hidden_state.mean(dim=1).numpy()
+    return matrix
+
+
+def update_store(path, vocab, embed, model_name, revision):
+    """Bring the store at ``path`` up to date with ``vocab`` and return it.
+
+    Only words missing from the cache are embedded and appended. The cache is
+    discarded and rebuilt when it was produced by a different model or
+    revision, or when its vocabulary does not match its matrix.
+
+    Args:
+        path (str): Location of the ``.npy`` matrix.
+        vocab (Iterable[str]): Words that must be present in the store.
+        embed (Callable[[list[str]], np.ndarray]): Embeds a list of words,
+            e.g. :func:`models.embed`; only called for missing words, so the
+            model is never loaded when the cache is complete.
+        model_name (str): Name recorded with the cache.
+        revision (str): Revision recorded with the cache.
+
+    Returns:
+        EmbeddingStore: The memory-mapped, up-to-date store.
+    """
+    vocab = list(vocab)
+    store = None
+    if EmbeddingStore.exists(path):
+        try:
+            store = EmbeddingStore.load(path)
+        except ValueError as error:
+            print(f"Embedding cache is inconsistent ({error}), rebuilding...")
+        if store is not None and not store.matches(model_name, revision):
+            print(f"Embedding cache was built with {store.model_name}@{store.revision}, rebuilding...")
+            store = None
+
+    if store is None:
+        words = sorted(set(vocab))
+        print(f"Embedding {len(words)} words...")
+        matrix = embed(words)
+        EmbeddingStore(words, matrix, model_name, revision).save(path)
+        return EmbeddingStore.load(path)
+
+    missing = store.missing(vocab)
+    if not missing:
+        return store
+
+    print(f"Embedding {len(missing)} new words...")
+    matrix = embed(missing)
+    store.append(missing, matrix).save(path)
+    return EmbeddingStore.load(path)
@@ -0,0 +1,20 @@
+"""Copy the tables the web app imports unchanged from data/ to final_data/.
+
+Run from the repository root::
+
+    python tables/final_tables.py                # topics and lessons
+    python tables/final_tables.py topics         # only these tables
+"""
+import sys
+
+from table_io import copy_table
+
+DATA_DIR = 'data'
+FINAL_DATA_DIR = 'final_data'
+TABLES = ['topics', 'lessons']
+
+
+if __name__ == "__main__":
+    for name in sys.argv[1:] or TABLES:
+        copy_table(name, DATA_DIR, FINAL_DATA_DIR)
+        print(f"Copied {name} to {FINAL_DATA_DIR}/")
@@ -0,0 +1,138 @@
+import numpy as np
+import pandas as pd
+
+from table_io import read_table, table_path, write_table
+
+FINAL_DATA_DIR = 'final_data'
+GRAPH_FILE = 'final_data/user_friends.npz'
+EDGES_TABLE = 'user_friends_edges'
+# Comma-joined format read by the web app importer
+LEGACY_TABLE = 'user_friends'
+MIN_FRIENDS = 2
+MAX_FRIENDS = 10
+SYMMETRIC = True
+SEED = None
+
+
+class FriendGraph:
+    """Friend lists stored as CSR arrays.
+
+    ``user_ids`` is sorted; the friends of ``user_ids[i]`` are
+    ``neighbors[offsets[i]:offsets[i + 1]]`` (sorted user ids), so a lookup is
+    a binary search plus a slice.
+    """
+
+    def __init__(self, user_ids, offsets, neighbors):
+        self.user_ids = np.asarray(user_ids)
+        self.offsets = np.asarray(offsets)
+        self.neighbors = np.asarray(neighbors)
+
+    def __len__(self):
+        return len(self.user_ids)
+
+    @property
+    def num_edges(self):
+        return len(self.neighbors)
+
+    @classmethod
+    def from_edges(cls, user_ids, src, dst):
+        """Build the graph from directed edges given as user ids."""
+        user_ids = np.unique(np.asarray(user_ids))
+        src_pos = np.searchsorted(user_ids, src)
+        order = np.lexsort((dst, src_pos))
+        counts = np.bincount(src_pos, minlength=len(user_ids))
+        offsets = np.concatenate([[0], np.cumsum(counts)])
+        return cls(user_ids, offsets, np.asarray(dst)[order])
+
+    @classmethod
+    def from_legacy_frame(cls, df):
+        """Read the ``user_id,friend_id`` table with comma-joined friend ids."""
+        friends = [[int(fid) for fid in fids.split(',') if fid.strip()]
+                   for fids in df['friend_id'].fillna('').astype(str)]
+        src = np.repeat(df['user_id'].to_numpy(), [len(fids) for fids in friends])
+        dst = np.array([fid for fids in friends for fid in fids], dtype=np.int64)
+        return cls.from_edges(df['user_id'].to_numpy(), src, dst)
+
+    def friends_of(self, user_id):
+        """Friend ids of ``user_id`` (empty if the user is unknown)."""
+        pos = np.searchsorted(self.user_ids, user_id)
+        if pos == len(self.user_ids) or self.user_ids[pos] != user_id:
+            return self.neighbors[:0]
+        return self.neighbors[self.offsets[pos]:self.offsets[pos + 1]]
+
+    def edges(self):
+        """Directed edges as (src, dst) arrays of user ids."""
+        return np.repeat(self.user_ids, np.diff(self.offsets)), self.neighbors
+
+    def to_edge_frame(self):
+        src, dst = self.edges()
+        return pd.DataFrame({'user_id': src, 'friend_id': dst})
+
+    def to_legacy_frame(self):
+        return pd.DataFrame({
+            'user_id': self.user_ids,
+            'friend_id': [",".join(map(str, self.neighbors[start:end]))
+                          for start, end in zip(self.offsets[:-1], self.offsets[1:])],
+        })
+
+    def save(self, path):
+        np.savez(path, user_ids=self.user_ids, offsets=self.offsets, neighbors=self.neighbors)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls(data['user_ids'], data['offsets'], data['neighbors'])
+
+
+def sample_friend_edges(num_users, min_friends=MIN_FRIENDS, max_friends=MAX_FRIENDS, rng=None):
+    """Give every user a random number of distinct friends other than themselves.
+
+    Friends are drawn as random positions in ``[0, num_users - 1)`` shifted past
+    the user's own position, so no per-user candidate list is built; duplicate
+    draws are dropped and redrawn until every user has their target count.
+
+    Returns:
+        tuple[np.ndarray, np.ndarray]: Directed edges as (src, dst) positions.
+    """
+    rng = rng or np.random.default_rng()
+    if num_users < 2:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    high = min(max_friends, num_users - 1)
+    low = min(min_friends, high)
+    targets = rng.integers(low, high + 1, num_users)
+
+    keys = np.zeros(0, dtype=np.int64)
+    missing = targets.copy()
+    while missing.any():
+        src = np.repeat(np.arange(num_users), missing)
+        dst = rng.integers(0, num_users - 1, len(src))
+        dst += dst >= src
+        keys = np.unique(np.concatenate([keys, src * num_users + dst]))
+        missing = targets - np.bincount(keys // num_users, minlength=num_users)
+    return keys // num_users, keys % num_users
+
+
+def generate_friend_graph(user_ids, min_friends=MIN_FRIENDS, max_friends=MAX_FRIENDS,
+                          symmetric=SYMMETRIC, seed=SEED):
+    """Generate a random friend graph over ``user_ids``.
+
+    With ``symmetric`` every friendship is mutual, so users may end up with
+    more than ``max_friends`` friends through incoming edges.
+    """
+    user_ids = np.unique(np.asarray(user_ids))
+    src, dst = sample_friend_edges(len(user_ids), min_friends, max_friends, np.random.default_rng(seed))
+    if symmetric:
+        keys = np.unique(np.concatenate([src * len(user_ids) + dst, dst * len(user_ids) + src]))
+        src, dst = keys // len(user_ids), keys % len(user_ids)
+    return FriendGraph.from_edges(user_ids, user_ids[src], user_ids[dst])
+
+
+if __name__ == "__main__":
+    users = read_table('users', FINAL_DATA_DIR, columns=['u_id'])
+    graph = generate_friend_graph(users['u_id'].to_numpy())
+
+    graph.save(GRAPH_FILE)
+    write_table(graph.to_edge_frame(), EDGES_TABLE, FINAL_DATA_DIR)
+    write_table(graph.to_legacy_frame(), LEGACY_TABLE, FINAL_DATA_DIR)
+    print(f"Friend graph with {len(graph)} users and {graph.num_edges} edges saved to {GRAPH_FILE}, "
+          f"{table_path(EDGES_TABLE, FINAL_DATA_DIR)} and {table_path(LEGACY_TABLE, FINAL_DATA_DIR)}")
@@ -0,0 +1,239 @@
+"""Global, per-topic and friends-only leaderboards built from progress scores.
+
+Every leaderboard is a :class:`RankIndex`: a sorted int64 array of keys
+ordering users by points, so a rank is one binary search, the top N is a
+slice and a score change shifts the keys between its old and new position. Friends-only queries read the
+friend lists from the CSR :class:`friend_graph.FriendGraph` and rank the few
+friends by the points already held in the global or topic index, so no list
+is parsed or sorted per request. Run from the repository root::
+
+    python tables/leaderboard.py             # build and time sample queries
+    python tables/leaderboard.py --user 42   # ranks of one user
+"""
+import argparse
+import os
+import random
+import time
+
+import numpy as np
+import pandas as pd
+
+from friend_graph import GRAPH_FILE, FriendGraph
+from points import KEY_COLUMNS, PointsAggregator
+from table_io import read_table
+
+FINAL_DATA_DIR = "final_data"
+TOP_N = 10
+QUERY_SAMPLE = 10000
+SEED = 42
+
+
+class RankIndex:
+    """Users sorted by points, highest first; ties are ordered by u_id.
+
+    ``keys`` is a sorted int64 array of ``-points << 32 | u_id``, so a rank is
+    a binary search and the top N a slice; ``u_ids`` (sorted) and ``points``
+    answer point lookups. Ranks are competition ranks ("1224"): one plus the
+    number of users with strictly more points.
+    """
+
+    def __init__(self, u_ids=(), points=()):
+        u_ids = np.asarray(u_ids, dtype=np.int64)
+        points = np.asarray(points, dtype=np.int64)
+        order = np.argsort(u_ids, kind="stable")
+        self.u_ids = u_ids[order]
+        self.points = points[order]
+        self.keys = np.sort(encode_keys(self.points, self.u_ids))
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __contains__(self, u_id):
+        return self._position(u_id) is not None
+
+    def _position(self, u_id):
+        pos = int(np.searchsorted(self.u_ids, u_id))
+        return pos if pos < len(self.u_ids) and self.u_ids[pos] == u_id else None
+
+    def points_of(self, u_ids):
+        """Points of every user in ``u_ids``, 0 for users not ranked."""
+        u_ids = np.asarray(u_ids, dtype=np.int64)
+        if not len(self.u_ids):
+            return np.zeros(len(u_ids), dtype=np.int64)
+        pos = np.minimum(np.searchsorted(self.u_ids, u_ids), len(self.u_ids) - 1)
+        return np.where(self.u_ids[pos] == u_ids, self.points[pos], 0)
+
+    def set(self, u_id, points):
+        """Insert a user or move them to their new ``points``."""
+        u_id, points = int(u_id), int(points)
+        key = int(encode_keys(points, u_id))
+        pos = self._position(u_id)
+        if pos is None:
+            insert_at = int(np.searchsorted(self.u_ids, u_id))
+            self.u_ids = np.insert(self.u_ids, insert_at, u_id)
+            self.points = np.insert(self.points, insert_at, points)
+            self.keys = np.insert(self.keys, np.searchsorted(self.keys, key), key)
+            return
+        previous = int(self.points[pos])
+        if previous == points:
+            return
+        self.points[pos] = points
+        # Shift the keys between the old and the new position by one, in place
+        old = int(np.searchsorted(self.keys, encode_keys(previous, u_id)))
+        new = int(np.searchsorted(self.keys, key))
+        if new > old:
+            self.keys[old:new - 1] = self.keys[old + 1:new]
+            self.keys[new - 1] = key
+        else:
+            self.keys[new + 1:old + 1] = self.keys[new:old]
+            self.keys[new] = key
+
+    def remove(self, u_id):
+        pos = self._position(u_id)
+        if pos is not None:
+            key = encode_keys(self.points[pos], u_id)
+            self.keys = np.delete(self.keys, np.searchsorted(self.keys, key))
+            self.u_ids = np.delete(self.u_ids, pos)
+            self.points = np.delete(self.points, pos)
+
+    def rank(self, u_id):
+        """1-based rank of ``u_id``, or None if the user is not ranked."""
+        pos = self._position(u_id)
+        if pos is None:
+            return None
+        return int(np.searchsorted(self.keys, -self.points[pos] << 32)) + 1
+
+    def top(self, n=TOP_N):
+        """The ``n`` best users as (u_id, points) pairs."""
+        keys = self.keys[:n]
+        return list(zip((keys & 0xFFFFFFFF).tolist(), (-(keys >> 32)).tolist()))
+
+
+def encode_keys(points, u_ids):
+    """Sort keys ordering by points descending, then by u_id (below 2**32)."""
+    return (-np.asarray(points, dtype=np.int64) << 32) | np.asarray(u_ids, dtype=np.int64)
+
+
+class Leaderboard:
+    """Global and per-topic rank indexes kept in step with the progress scores.
+
+    Args:
+        aggregator (PointsAggregator): Point totals per user and per (user, topic).
+        user_ids (Iterable[int]): Users to rank globally even without progress
+            (with 0 points).
+        graph (FriendGraph): Friend lists for the friends-only queries.
+    """
+
+    def __init__(self, aggregator, user_ids=(), graph=None):
+        self.aggregator = aggregator
+        self.graph = graph if graph is not None else FriendGraph([], [0], [])
+
+        u_ids = np.union1d(np.asarray(list(user_ids), dtype=np.int64), aggregator.u_ids)
+        self.global_index = RankIndex(u_ids, aggregator.points_for(u_ids))
+        self.topic_indexes = {topic_id: RankIndex(*aggregator.topic_users(topic_id))
+                              for topic_id in aggregator.topic_columns}
+
+    @classmethod
+    def from_progress(cls, progress_df, user_ids=(), graph=None):
+        """Build the leaderboards from a full progress table."""
+        return cls(PointsAggregator.from_progress(progress_df), user_ids, graph)
+
+    def index(self, topic_id=None):
+        """The global index, or that of ``topic_id`` (empty for an unknown topic)."""
+        if topic_id is None:
+            return self.global_index
+        return self.topic_indexes.get(int(topic_id)) or RankIndex()
+
+    def top(self, n=TOP_N, topic_id=None):
+        return self.index(topic_id).top(n)
+
+    def rank(self, u_id, topic_id=None):
+        """Rank of ``u_id`` globally or within ``topic_id``; None if unranked."""
+        return self.index(topic_id).rank(u_id)
+
+    def friends_top(self, u_id, n=TOP_N, topic_id=None):
+        """The ``n`` best among ``u_id`` and their friends, as (u_id, points) pairs."""
+        members = np.concatenate([[int(u_id)], self.graph.friends_of(u_id)]).astype(np.int64)
+        points = self.index(topic_id).points_of(members)
+        best = np.lexsort((members, -points))[:n]
+        return list(zip(members[best].tolist(), points[best].tolist()))
+
+    def friends_rank(self, u_id, topic_id=None):
+        """Rank of ``u_id`` among themselves and their friends."""
+        index = self.index(topic_id)
+        own = index.points_of([int(u_id)])[0]
+        return 1 + int((index.points_of(self.graph.friends_of(u_id)) > own).sum())
+
+    def apply(self, u_id, topic_id, lesson_id, score):
+        """Insert or update one progress row and move the user in the affected indexes.
+
+        Returns:
+            int: The change in the user's points.
+        """
+        delta = self.aggregator.apply(u_id, topic_id, lesson_id, score)
+        u_id, topic_id = int(u_id), int(topic_id)
+        # A user's first row is ranked even when it scores 0, as in a rebuild
+        if delta or u_id not in self.global_index:
+            self.global_index.set(u_id, self.aggregator.points(u_id))
+        topic_index = self.topic_indexes.get(topic_id)
+        if topic_index is None:
+            topic_index = self.topic_indexes[topic_id] = RankIndex()
+        if delta or u_id not in topic_index:
+            topic_index.set(u_id, self.aggregator.topic_points_of(u_id, topic_id))
+        return delta
+
+    def apply_progress(self, rows):
+        """Apply progress inserts/updates, see :meth:`PointsAggregator.apply_progress`.
+
+        Returns:
+            set[int]: u_ids whose points changed.
+        """
+        if isinstance(rows, pd.DataFrame):
+            rows = rows[KEY_COLUMNS + ['score']].itertuples(index=False, name=None)
+        else:
+            rows = ((row['u_id'], row['topic_id'], row['lesson_id'], row['score']) for row in rows)
+        return {int(u_id) for u_id, topic_id, lesson_id, score in rows
+                if self.apply(u_id, topic_id, lesson_id, score)}
+
+
+def load_graph(path=GRAPH_FILE):
+    """The saved friend graph, or the one parsed from the legacy comma-joined table."""
+    if os.path.exists(path):
+        return FriendGraph.load(path)
+    return FriendGraph.from_legacy_frame(read_table('user_friends', FINAL_DATA_DIR))
+
+
+def mean_microseconds(func, args):
+    start = time.perf_counter()
+    for arg in args:
+        func(arg)
+    return (time.perf_counter() - start) / max(len(args), 1) * 1e6
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the leaderboards and query them.")
+    parser.add_argument("--user", type=int, help="print the ranks of this u_id")
+    parser.add_argument("--topic", type=int, help="rank within this topic_id instead of globally")
+    parser.add_argument("--top", type=int, default=TOP_N, help="number of users listed")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    users = read_table('users', FINAL_DATA_DIR, columns=['u_id'])
+    progress = read_table('progress', FINAL_DATA_DIR, columns=KEY_COLUMNS + ['score'])
+    leaderboard = Leaderboard.from_progress(progress, users['u_id'], load_graph())
+    print(f"Leaderboards of {len(leaderboard.global_index)} users and {len(leaderboard.topic_indexes)} topics "
+          f"built in {time.perf_counter() - start:.2f}s")
+
+    if args.user is not None:
+        print(f"User {args.user}: rank {leaderboard.rank(args.user, args.topic)}, "
+              f"rank among friends {leaderboard.friends_rank(args.user, args.topic)}")
+        for position, (u_id, points) in enumerate(leaderboard.friends_top(args.user, args.top, args.topic), 1):
+            print(f"{position:>4}. {u_id:<8} {points}")
+    else:
+        for position, (u_id, points) in enumerate(leaderboard.top(args.top, args.topic), 1):
+            print(f"{position:>4}. {u_id:<8} {points}")
+        ranked = leaderboard.global_index.u_ids.tolist()
+        sample = random.Random(SEED).choices(ranked, k=QUERY_SAMPLE) if ranked else []
+        print(f"rank: {mean_microseconds(leaderboard.rank, sample):.1f}us, "
+              f"friends_top: {mean_microseconds(leaderboard.friends_top, sample):.1f}us, "
+              f"friends_rank: {mean_microseconds(leaderboard.friends_rank, sample):.1f}us per query")
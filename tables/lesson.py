@@ -1,8 +1,9 @@
 import pandas as pd 
 import random 
+from table_io import read_table, write_table
 
-topics = pd.read_csv('data/topics.csv')
-sentences = pd.read_csv('data/sentences.csv')
+topics = read_table('topics', 'data', columns=['topic_id', 'topic_name'])
+sentences = read_table('sentences', 'data', columns=['s_id', 'topic_name'])
 
 lesson_types = ['Vocab', 'Fill_in_the_blank', 'Re_order_words', 'Re_order_chars', 'Listen_and_fill']
 lesson_data = []
@@ -19,6 +20,6 @@ for i in range(len(topics)):
 lesson_df = pd.DataFrame(lesson_data)
 
 # Save the DataFrame to a CSV file
-lesson_df.to_csv('data/lessons.csv', index=False)
+write_table(lesson_df, 'lessons', 'data')
 
 print("Lesson table has been created successfully!")
\ No newline at end of file
@@ -0,0 +1,207 @@
+"""Ready-to-serve lesson bundles, one per (topic_id, lesson_id).
+
+A bundle holds everything needed to render a lesson: its sentences in both
+languages, the target words with their distractors and the audio paths. It
+is stored as compressed JSON in a SQLite table keyed by (topic_id, lesson_id)
+together with the hash of its input rows and of its content. A rerun hashes
+the input rows of every lesson first, only builds the bundles of lessons
+whose inputs changed, only rewrites those whose content changed and drops
+those of removed lessons.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import zlib
+
+import pandas as pd
+
+from table_io import read_table, table_path
+from media import AUDIO_EXTENSION
+from tts_runner import LANGUAGES, audio_file
+
+DATA_DIR = "data"
+FINAL_DATA_DIR = "final_data"
+BUNDLES_FILE = "final_data/lesson_bundles.sqlite"
+SENTENCES_TABLE = "selected_sentences"
+WORDS_TABLE = "selected_words"
+# Bump when the bundle layout changes, to rebuild every bundle
+BUNDLE_VERSION = 1
+
+
+def text_or_none(value):
+    return None if pd.isna(value) else str(value)
+
+
+def split_list(text):
+    text = text_or_none(text)
+    return text.split(", ") if text else []
+
+
+def audio_paths(s_id):
+    """Audio files of a sentence, relative to the media folder (see tts_runner.build_manifest)."""
+    return {column: audio_file(column, s_id, AUDIO_EXTENSION) for column in LANGUAGES}
+
+
+def digests_by(df, key):
+    """SHA-256 of the rows of ``df`` per value of its ``key`` column, in row order."""
+    rows = pd.util.hash_pandas_object(df, index=False)
+    return rows.groupby(df[key].to_numpy()).agg(lambda hashes: hashlib.sha256(hashes.to_numpy().tobytes()).hexdigest())
+
+
+def input_hashes(lessons, lessons_sentences, sentences, words, media=None):
+    """Hash of the input rows of every lesson's bundle.
+
+    Covers the lesson row, its lessons_sentences rows (in order) and the
+    sentence, words and media rows of those sentences, plus BUNDLE_VERSION
+    and the audio format.
+
+    Returns:
+        dict[tuple[int, int], str]: Hash per (topic_id, lesson_id) with sentences.
+    """
+    rows = lessons_sentences.merge(lessons[['topic_id', 'lesson_id', 'lesson_type']], on=['topic_id', 'lesson_id'])
+    words = words.sort_values(['s_id', 'idx'], kind='stable')
+    per_sentence = {'sentence': (sentences[['s_id', 'eng', 'viet']], 's_id'), 'words': (words, 's_id')}
+    if media is not None:
+        per_sentence['media'] = (media.sort_values(['s_id', 'lang'], kind='stable'), 's_id')
+    for column, (df, key) in per_sentence.items():
+        rows[column] = rows['s_id'].map(digests_by(df, key)).fillna('')
+
+    prefix = f"{BUNDLE_VERSION}:{AUDIO_EXTENSION}:".encode('utf-8')
+    row_hashes = pd.util.hash_pandas_object(rows, index=False)
+    return {(int(topic_id), int(lesson_id)): hashlib.sha256(prefix + hashes.to_numpy().tobytes()).hexdigest()
+            for (topic_id, lesson_id), hashes in row_hashes.groupby([rows['topic_id'], rows['lesson_id']], sort=True)}
+
+
+def build_bundles(lessons, lessons_sentences, sentences, words):
+    """Assemble the bundle of every lesson.
+
+    Args:
+        lessons (pd.DataFrame): topic_id, lesson_id, lesson_type.
+        lessons_sentences (pd.DataFrame): topic_id, lesson_id, s_id.
+        sentences (pd.DataFrame): s_id, eng, viet.
+        words (pd.DataFrame): Words table (w_id, s_id, idx, viet, eng and similar words).
+
+    Returns:
+        dict[tuple[int, int], dict]: Bundle per (topic_id, lesson_id).
+    """
+    rows = (lessons_sentences
+            .merge(lessons[['topic_id', 'lesson_id', 'lesson_type']], on=['topic_id', 'lesson_id'])
+            .merge(sentences[['s_id', 'eng', 'viet']], on='s_id', how='left'))
+
+    words = words[words['s_id'].isin(rows['s_id'])].sort_values(['s_id', 'idx'], kind='stable')
+    words_by_sentence = {}
+    for word in words.itertuples(index=False):
+        words_by_sentence.setdefault(int(word.s_id), []).append({
+            'w_id': int(word.w_id),
+            'idx': int(word.idx),
+            'viet': text_or_none(word.viet),
+            'eng': text_or_none(word.eng),
+            'distractors': {'viet': split_list(word.viet_similar_words), 'eng': split_list(word.eng_similar_words)},
+        })
+
+    bundles = {}
+    for (topic_id, lesson_id), group in rows.groupby(['topic_id', 'lesson_id'], sort=True):
+        bundles[(int(topic_id), int(lesson_id))] = {
+            'topic_id': int(topic_id),
+            'lesson_id': int(lesson_id),
+            'lesson_type': str(group['lesson_type'].iloc[0]),
+            'sentences': [{
+                's_id': int(s_id),
+                'eng': text_or_none(eng),
+                'viet': text_or_none(viet),
+                'audio': audio_paths(int(s_id)),
+                'words': words_by_sentence.get(int(s_id), []),
+            } for s_id, eng, viet in zip(group['s_id'], group['eng'], group['viet'])],
+        }
+    return bundles
+
+
+def encode_bundle(bundle):
+    """Serialized bundle and the hash identifying its content."""
+    payload = json.dumps(bundle, ensure_ascii=False, sort_keys=True, separators=(',', ':')).encode('utf-8')
+    digest = hashlib.sha256(f"{BUNDLE_VERSION}:".encode('utf-8') + payload).hexdigest()
+    return zlib.compress(payload, 6), digest
+
+
+def connect(path=BUNDLES_FILE):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    conn = sqlite3.connect(path)
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS lesson_bundles ("
+        "topic_id INTEGER NOT NULL, lesson_id INTEGER NOT NULL, content_hash TEXT NOT NULL, "
+        "bundle BLOB NOT NULL, input_hash TEXT, PRIMARY KEY (topic_id, lesson_id)) WITHOUT ROWID"
+    )
+    columns = [row[1] for row in conn.execute("PRAGMA table_info(lesson_bundles)")]
+    with conn:
+        if "content_hash" not in columns:
+            # The first version stored the content hash under the name input_hash
+            conn.execute("ALTER TABLE lesson_bundles RENAME COLUMN input_hash TO content_hash")
+            columns.remove("input_hash")
+        if "input_hash" not in columns:
+            # Bundles stored without an input hash are rebuilt once
+            conn.execute("ALTER TABLE lesson_bundles ADD COLUMN input_hash TEXT")
+    return conn
+
+
+def stale_lessons(conn, hashes):
+    """Lessons of ``hashes`` whose stored bundle was built from other input rows."""
+    stored = dict(((topic_id, lesson_id), input_hash) for topic_id, lesson_id, input_hash
+                  in conn.execute("SELECT topic_id, lesson_id, input_hash FROM lesson_bundles"))
+    return {key for key, input_hash in hashes.items() if stored.get(key) != input_hash}
+
+
+def store_bundles(conn, bundles, hashes):
+    """Write the rebuilt bundles whose content changed and delete those of removed lessons.
+
+    Args:
+        conn (sqlite3.Connection): Connection from :func:`connect`.
+        bundles (dict): Rebuilt bundles per (topic_id, lesson_id).
+        hashes (dict): Input hash of every current lesson, see :func:`input_hashes`.
+
+    Returns:
+        dict: Numbers of bundles ``written``, ``unchanged`` (rebuilt with the
+        same content) and ``deleted``.
+    """
+    stored = {(topic_id, lesson_id): content_hash for topic_id, lesson_id, content_hash
+              in conn.execute("SELECT topic_id, lesson_id, content_hash FROM lesson_bundles")}
+    changed, unchanged = [], []
+    for key, bundle in bundles.items():
+        blob, digest = encode_bundle(bundle)
+        if stored.get(key) != digest:
+            changed.append((*key, hashes[key], digest, blob))
+        else:
+            unchanged.append((hashes[key], *key))
+    removed = [key for key in stored if key not in hashes]
+
+    with conn:
+        conn.executemany("INSERT OR REPLACE INTO lesson_bundles (topic_id, lesson_id, input_hash, content_hash, bundle) "
+                         "VALUES (?, ?, ?, ?, ?)", changed)
+        conn.executemany("UPDATE lesson_bundles SET input_hash = ? WHERE topic_id = ? AND lesson_id = ?", unchanged)
+        conn.executemany("DELETE FROM lesson_bundles WHERE topic_id = ? AND lesson_id = ?", removed)
+    return {"written": len(changed), "unchanged": len(unchanged), "deleted": len(removed)}
+
+
+def load_bundle(conn, topic_id, lesson_id):
+    """The bundle of one lesson, or None if there is none."""
+    row = conn.execute("SELECT bundle FROM lesson_bundles WHERE topic_id = ? AND lesson_id = ?",
+                       (topic_id, lesson_id)).fetchone()
+    return None if row is None else json.loads(zlib.decompress(row[0]))
+
+
+if __name__ == "__main__":
+    lessons = read_table('lessons', FINAL_DATA_DIR, columns=['topic_id', 'lesson_id', 'lesson_type'])
+    lessons_sentences = read_table('lessons_sentences', FINAL_DATA_DIR)
+    sentences = read_table(SENTENCES_TABLE, DATA_DIR, columns=['s_id', 'eng', 'viet'])
+    words = read_table(WORDS_TABLE, DATA_DIR)
+    media = read_table('media', DATA_DIR) if os.path.exists(table_path('media', DATA_DIR)) else None
+
+    hashes = input_hashes(lessons, lessons_sentences, sentences, words, media)
+    conn = connect(BUNDLES_FILE)
+    stale = stale_lessons(conn, hashes)
+    rebuild = [key in stale for key in zip(lessons_sentences['topic_id'], lessons_sentences['lesson_id'])]
+    bundles = build_bundles(lessons, lessons_sentences[rebuild], sentences, words)
+    result = store_bundles(conn, bundles, hashes)
+    conn.close()
+    print(f"Lesson bundles saved to {BUNDLES_FILE}: {len(hashes) - len(stale)} skipped, {result['written']} written, "
+          f"{result['unchanged']} unchanged, {result['deleted']} deleted")
@@ -1,25 +1,38 @@
-import pandas as pd 
-import random 
+import pandas as pd
+import random
+from table_io import read_table, write_table
 
-topics = pd.read_csv('final_data/topics.csv')
-sentences = pd.read_csv('data/selected_sentences.csv')
+LESSONS_PER_TOPIC = 5
+SENTENCES_PER_LESSON = 10
 
 lesson_types = ['Vocab', 'Fill_in_the_blank', 'Re_order_words', 'Re_order_chars', 'Listen_and_fill']
-lesson_data = []
-for i in range(len(topics)):
-    selected_sentences = sentences[sentences['topic'] == topics['topic_name'][i]]['s_id'].to_list()
-    for j in range(5):
-        for s_id in selected_sentences[:10]:
-            lesson_data.append({
-                'topic_id': topics['topic_id'][i],
-                'lesson_id': j + 1,
-                's_id': s_id
-            })
-
-# Create a DataFrame from the lesson data
-lesson_df = pd.DataFrame(lesson_data)
-
-# Save the DataFrame to a CSV file
-lesson_df.to_csv('final_data/lessons_sentences.csv', index=False)
-
-print("Lesson table has been created successfully!")
\ No newline at end of file
+
+
+def build_lessons_sentences(topics, sentences, lessons_per_topic=LESSONS_PER_TOPIC,
+                            per_lesson=SENTENCES_PER_LESSON):
+    """Assign the first ``per_lesson`` selected sentences of every topic to each of its lessons."""
+    lesson_data = []
+    for i in range(len(topics)):
+        selected_sentences = sentences[sentences['topic'] == topics['topic_name'][i]]['s_id'].to_list()
+        for j in range(lessons_per_topic):
+            for s_id in selected_sentences[:per_lesson]:
+                lesson_data.append({
+                    'topic_id': topics['topic_id'][i],
+                    'lesson_id': j + 1,
+                    's_id': s_id
+                })
+
+    # Create a DataFrame from the lesson data
+    return pd.DataFrame(lesson_data, columns=['topic_id', 'lesson_id', 's_id'])
+
+
+if __name__ == "__main__":
+    topics = read_table('topics', 'final_data', columns=['topic_id', 'topic_name'])
+    sentences = read_table('selected_sentences', 'data', columns=['s_id', 'topic'])
+
+    lesson_df = build_lessons_sentences(topics, sentences)
+
+    # Save the DataFrame to a CSV file
+    write_table(lesson_df, 'lessons_sentences', 'final_data')
+
+    print("Lesson table has been created successfully!")
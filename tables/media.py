@@ -1,55 +1,51 @@
-from gtts import gTTS
-import librosa
-import numpy as np
+import os
+
 import pandas as pd
-from tqdm.auto import tqdm  # Import tqdm
-import time  # For sleep
-
-
-def text_to_speech(text: str, output_filename: str, lang: str = "en") -> None:
-    """Convert text to speech and save as an audio file.
-
-    Args:
-        text (str): The text to convert to speech.
-        output_filename (str): The name of the output audio file.
-        lang (str): The language of the text. Default is 'en' (English).
-    """
-    output = gTTS(text, lang=lang, slow=False)
-    output.save(output_filename)
-
-
-# Read sentences from CSV file
-sentences = pd.read_csv("data/sentences.csv")
-
-K = 2000
-# Convert English sentences to audio files using tqdm for progress tracking
-# for i in tqdm(range(len(sentences)), desc="Converting English sentences"):
-for i in tqdm(range(0, K), desc="Converting English sentences"):
-# for i in tqdm(range(K, 2*K), desc="Converting English sentences"):
-# for i in tqdm(range(2*K, 3*K), desc="Converting English sentences"):
-# for i in tqdm(range(3*K, 4*K), desc="Converting English sentences"):
-# for i in tqdm(range(4*K, 5*K), desc="Converting English sentences"):
-# for i in tqdm(range(5*K, len(sentences)), desc="Converting English sentences"):
-    text = sentences.iloc[i]["eng"]
-    output_filename = f"data/media/english/eng_{i + 1}.mp3"
-    try:
-        text_to_speech(text, output_filename, lang="en")
-    except Exception as e:
-        print(f"Error processing English sentence {i + 1}: {e}")
-    time.sleep(1.5)
-
-# # Convert Vietnamese sentences to audio files using tqdm for progress tracking
-# # for i in tqdm(range(len(sentences)), desc="Converting Vietnamese sentences"):
-# for i in tqdm(range(0, K), desc="Converting Vietnamese sentences"):
-# # for i in tqdm(range(K, 2*K), desc="Converting Vietnamese sentences"):
-# # for i in tqdm(range(2*K, 3*K), desc="Converting Vietnamese sentences"):
-# # for i in tqdm(range(3*K, 4*K), desc="Converting Vietnamese sentences"):
-# # for i in tqdm(range(4*K, 5*K), desc="Converting Vietnamese sentences"):
-# # for i in tqdm(range(5*K, len(sentences)), desc="Converting Vietnamese sentences"):
-#     text = sentences.iloc[i]["viet"]
-#     output_filename = f"data/media/vietnamese/viet_{i + 1}.mp3"
-#     try:
-#         text_to_speech(text, output_filename, lang="vi")
-#     except Exception as e:
-#         print(f"Error processing Vietnamese sentence {i + 1}: {e}")
-#     time.sleep(1.5)
\ No newline at end of file
+
+import metrics
+from dedupe import canonical_sentences
+from table_io import read_table
+from tts_runner import CommandBackend, GTTSBackend, build_manifest, run_jobs
+
+DATA_DIR = "data"
+MEDIA_DIR = "data/media"
+FAILED_JOBS_FILE = "data/media/failed_jobs.csv"
+# "gtts" for Google Text-to-Speech, "command" to synthesize offline with OFFLINE_COMMAND
+TTS_BACKEND = "gtts"
+OFFLINE_COMMAND = ["espeak-ng", "-v", "{lang}", "-w", "{path}", "{text}"]
+# Format OFFLINE_COMMAND writes (espeak-ng -w writes WAV)
+OFFLINE_EXTENSION = "wav"
+AUDIO_EXTENSION = OFFLINE_EXTENSION if TTS_BACKEND == "command" else GTTSBackend.extension
+# Text hash of every generated file, so files of renumbered sentences are redone
+TEXTS_FILE = "data/media/audio_texts.sqlite"
+# gTTS throttles aggressive clients; the old loop slept 1.5 s after every call
+WORKERS = 4
+REQUESTS_PER_SECOND = 1.0
+BURST = 2
+RETRIES = 3
+BACKOFF_SECONDS = 2.0
+
+
+if __name__ == "__main__":
+    with metrics.run("media"):
+        # Read the canonical sentences; lessons never use their near-duplicates
+        sentences = canonical_sentences(read_table("sentences", DATA_DIR, columns=["s_id", "eng", "viet"]), DATA_DIR)
+
+        # English and Vietnamese audio for every sentence; up-to-date files are skipped
+        jobs = build_manifest(sentences, MEDIA_DIR, AUDIO_EXTENSION)
+
+        if TTS_BACKEND == "command":
+            backend = CommandBackend(OFFLINE_COMMAND, OFFLINE_EXTENSION)
+        else:
+            backend = GTTSBackend()
+
+        with metrics.phase("synthesize", items=len(jobs)):
+            failures = run_jobs(jobs, backend, TEXTS_FILE, workers=WORKERS, rate=REQUESTS_PER_SECOND,
+                                burst=BURST, retries=RETRIES, backoff=BACKOFF_SECONDS)
+
+        failed_df = pd.DataFrame(
+            [{"lang": job.lang, "s_id": job.s_id, "path": job.path, "error": str(error)} for job, error in failures],
+            columns=["lang", "s_id", "path", "error"])
+        os.makedirs(os.path.dirname(FAILED_JOBS_FILE), exist_ok=True)
+        failed_df.to_csv(FAILED_JOBS_FILE, index=False)
+        print(f"Audio generation finished, {len(failed_df)} jobs failed (see {FAILED_JOBS_FILE})")
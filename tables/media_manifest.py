@@ -0,0 +1,119 @@
+import hashlib
+import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+
+import librosa
+import numpy as np
+import pandas as pd
+from tqdm.auto import tqdm
+
+from dedupe import canonical_sentences
+from table_io import read_table, table_path, write_table
+from media import AUDIO_EXTENSION, TEXTS_FILE
+from tts_runner import AudioTexts, build_manifest, text_hash
+
+DATA_DIR = "data"
+MEDIA_DIR = "data/media"
+WORKERS = os.cpu_count() or 1
+# Report the non-silent span of every file (librosa.effects.trim); the audio
+# itself is left untouched because librosa cannot write mp3
+TRIM_SILENCE = True
+TRIM_TOP_DB = 40
+
+COLUMNS = ["s_id", "lang", "path", "duration_ms", "bytes", "checksum",
+           "peak_dbfs", "rms_dbfs", "trim_start_ms", "trim_end_ms", "status"]
+
+
+def to_dbfs(amplitude: float) -> float:
+    """Convert a linear amplitude (1.0 = full scale) to dBFS."""
+    return float(20 * np.log10(max(amplitude, 1e-10)))
+
+
+def file_checksum(path: str) -> str:
+    """SHA-256 of a file, read in blocks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def describe_audio(job, media_dir: str = MEDIA_DIR, trim: bool = TRIM_SILENCE, top_db: int = TRIM_TOP_DB,
+                   recorded_hash: str = None) -> dict:
+    """Decode one audio file and measure it.
+
+    Broken files are not raised but reported through the ``status`` column
+    (``missing``, ``empty`` or ``error: ...``) so they can be found in bulk;
+    files not recorded as made from the job's text are ``stale``.
+
+    Args:
+        job (TTSJob): The job that produced (or should have produced) the file.
+        media_dir (str): Root folder the stored ``path`` is made relative to.
+        trim (bool): Whether to compute the non-silent span of the audio.
+        top_db (int): Threshold below peak, in dB, considered silence.
+        recorded_hash (str): Text hash recorded for the file by the TTS run.
+
+    Returns:
+        dict: One row of the media table.
+    """
+    row = dict.fromkeys(COLUMNS)
+    row.update(s_id=job.s_id, lang=job.lang, path=os.path.relpath(job.path, media_dir))
+    if not os.path.exists(job.path):
+        row["status"] = "missing"
+        return row
+
+    row["bytes"] = os.path.getsize(job.path)
+    row["checksum"] = file_checksum(job.path)
+    try:
+        y, sr = librosa.load(job.path, sr=None, mono=True)
+    except Exception as e:
+        row["status"] = f"error: {e}"
+        return row
+    if len(y) == 0:
+        row["status"] = "empty"
+        return row
+
+    row["duration_ms"] = int(round(1000 * len(y) / sr))
+    row["peak_dbfs"] = round(to_dbfs(np.max(np.abs(y))), 2)
+    row["rms_dbfs"] = round(to_dbfs(np.sqrt(np.mean(np.square(y)))), 2)
+    if trim:
+        _, (start, end) = librosa.effects.trim(y, top_db=top_db)
+        row["trim_start_ms"] = int(round(1000 * start / sr))
+        row["trim_end_ms"] = int(round(1000 * end / sr))
+    row["status"] = "ok" if recorded_hash == text_hash(job.lang, job.text) else "stale"
+    return row
+
+
+def build_media_table(jobs, recorded=None, workers: int = WORKERS, chunksize: int = 64) -> pd.DataFrame:
+    """Describe every audio file of ``jobs`` across a process pool.
+
+    ``recorded`` maps file paths to the text hash they were made from
+    (:meth:`tts_runner.AudioTexts.hashes`).
+    """
+    recorded = recorded or {}
+    args = (jobs, repeat(MEDIA_DIR), repeat(TRIM_SILENCE), repeat(TRIM_TOP_DB),
+            [recorded.get(job.path) for job in jobs])
+    if workers <= 1:
+        rows = list(tqdm(map(describe_audio, *args), total=len(jobs), desc="Analysing audio"))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            rows = list(tqdm(executor.map(describe_audio, *args, chunksize=chunksize),
+                             total=len(jobs), desc="Analysing audio"))
+    media_df = pd.DataFrame(rows, columns=COLUMNS)
+    for column in ["duration_ms", "bytes", "trim_start_ms", "trim_end_ms"]:
+        media_df[column] = media_df[column].astype("Int64")
+    return media_df
+
+
+if __name__ == "__main__":
+    sentences = canonical_sentences(read_table("sentences", DATA_DIR, columns=["s_id", "eng", "viet"]), DATA_DIR)
+    audio_texts = AudioTexts(TEXTS_FILE)
+    media_df = build_media_table(build_manifest(sentences, MEDIA_DIR, AUDIO_EXTENSION), audio_texts.hashes())
+    audio_texts.close()
+    write_table(media_df, "media", DATA_DIR)
+
+    broken = media_df[media_df["status"] != "ok"]
+    print(f"Media table saved to {table_path('media', DATA_DIR)}: {len(media_df) - len(broken)} ok, {len(broken)} broken")
+    if len(broken):
+        print(broken["status"].str.split(":").str[0].value_counts().to_string())
@@ -0,0 +1,238 @@
+"""Lightweight per-phase metrics for the long-running scripts.
+
+A script wraps its main block in :func:`run` and every sub-phase in
+:func:`phase`; library code counts external calls (model forward passes,
+translator and TTS requests) with :func:`count`. When a phase ends, one JSON
+line is appended to the metrics file with its wall time, throughput, memory
+and the calls made during the phase::
+
+    with metrics.run("word"):
+        with metrics.phase("analysis", items=len(sentences)):
+            ...
+        with metrics.phase("translate") as p:
+            p.items = len(texts)
+            ...
+
+Outside of :func:`run`, phases are timed but nothing is written. Counters are
+per process: calls made inside process-pool workers are not included, while
+the model worker reports its calls back (see models.py). Peak memory is
+sampled while a phase runs, for this process, summed for its live child
+processes (e.g. process-pool workers) and for every :func:`watch`-ed process.
+"""
+import json
+import os
+import resource
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from functools import wraps
+
+METRICS_FILE = "data/metrics.jsonl"
+# How often the RSS of a running phase (and of its child processes) is sampled
+RSS_SAMPLE_SECONDS = 0.05
+
+# Recorder of the current run, see run()
+_recorder = None
+_counters = {}
+# Other processes whose memory the phases report, by name (see watch())
+_watched = {}
+_lock = threading.Lock()
+
+
+def count(name, n=1):
+    """Add ``n`` to the counter ``name`` (e.g. ``translator_calls``)."""
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + n
+
+
+def counters():
+    with _lock:
+        return dict(_counters)
+
+
+def counter_delta(before, after):
+    """Counters that changed between two :func:`counters` snapshots."""
+    return {name: value - before.get(name, 0) for name, value in after.items() if value != before.get(name, 0)}
+
+
+def watch(name, pid):
+    """Also sample the RSS of process ``pid`` (e.g. the model worker) in every phase."""
+    with _lock:
+        _watched[name] = pid
+
+
+def lifetime_peak_rss_mb(who=resource.RUSAGE_SELF):
+    """Peak resident set size over the whole life of this process.
+
+    With ``RUSAGE_CHILDREN``, the peak of the largest child process that has
+    already exited (e.g. process-pool workers after the pool shut down).
+    """
+    peak = resource.getrusage(who).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    return round(peak / (1 << 20) if sys.platform == "darwin" else peak / (1 << 10), 1)
+
+
+def rss_mb(pid="self"):
+    """Current resident set size of a process, when /proc is available."""
+    try:
+        with open(f"/proc/{pid}/statm", "r") as f:
+            pages = int(f.read().split()[1])
+    except (OSError, IndexError, ValueError):
+        return None
+    return round(pages * os.sysconf("SC_PAGE_SIZE") / (1 << 20), 1)
+
+
+def child_pids():
+    """Pids of the live child processes of this process, read from /proc."""
+    pids = []
+    parent = os.getpid()
+    try:
+        entries = [entry for entry in os.listdir("/proc") if entry.isdigit()]
+    except OSError:
+        return pids
+    for entry in entries:
+        try:
+            with open(f"/proc/{entry}/stat", "r") as f:
+                # The command name may contain spaces; the ppid follows it
+                fields = f.read().rsplit(")", 1)[1].split()
+        except (OSError, IndexError):
+            continue
+        if int(fields[1]) == parent:
+            pids.append(int(entry))
+    return pids
+
+
+def children_rss_mb():
+    """Summed resident set size of the live child processes (e.g. a process pool)."""
+    sizes = [size for size in map(rss_mb, child_pids()) if size is not None]
+    return round(sum(sizes), 1)
+
+
+class RssSampler(threading.Thread):
+    """Polls the RSS of this process and of its children, keeping the maxima.
+
+    ``ru_maxrss`` only reports the peak over the whole life of a process, so
+    the peak of one phase is sampled instead; spikes shorter than
+    ``interval`` can be missed.
+    """
+
+    def __init__(self, interval=RSS_SAMPLE_SECONDS):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.stopped = threading.Event()
+        self.peak_mb = None
+        self.children_peak_mb = None
+        self.watched_peak_mb = {}
+        self.sample()
+
+    def sample(self):
+        rss, children = rss_mb(), children_rss_mb()
+        if rss is not None:
+            self.peak_mb = max(self.peak_mb or 0.0, rss)
+        self.children_peak_mb = max(self.children_peak_mb or 0.0, children)
+        with _lock:
+            watched = dict(_watched)
+        for name, pid in watched.items():
+            size = rss_mb(pid)
+            if size is not None:
+                self.watched_peak_mb[name] = max(self.watched_peak_mb.get(name, 0.0), size)
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            self.sample()
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+        self.sample()
+
+
+class Phase:
+    """Measurements of one phase; ``items`` may be set while it runs."""
+
+    def __init__(self, name, items=None):
+        self.name = name
+        self.items = items
+        self.seconds = None
+
+
+class Recorder:
+    """Appends the metrics of one run to a JSON lines file."""
+
+    def __init__(self, script, path=METRICS_FILE):
+        self.script = script
+        self.path = path
+        self.run_id = f"{datetime.now().strftime('%Y%m%dT%H%M%S')}-{os.getpid()}"
+
+    def write(self, record):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        record = {"run_id": self.run_id, "script": self.script, **record}
+        with _lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record) + "\n")
+
+
+@contextmanager
+def phase(name, items=None):
+    """Time a phase and, inside :func:`run`, write its metrics.
+
+    Args:
+        name (str): Phase name, e.g. ``"embeddings"``.
+        items (int): Number of items processed, for ``items_per_second``;
+            can also be set on the yielded :class:`Phase`.
+    """
+    current = Phase(name, items)
+    before = counters()
+    sampler = RssSampler() if _recorder is not None else None
+    if sampler is not None:
+        sampler.start()
+    start = time.perf_counter()
+    try:
+        yield current
+    finally:
+        current.seconds = time.perf_counter() - start
+        if sampler is not None:
+            sampler.stop()
+        if _recorder is not None:
+            _recorder.write({
+                "phase": name,
+                "seconds": round(current.seconds, 4),
+                "items": current.items,
+                "items_per_second": (round(current.items / current.seconds, 1)
+                                     if current.items is not None and current.seconds else None),
+                "rss_mb": rss_mb(),
+                # Sampled during this phase; children are summed over the live ones
+                "peak_rss_mb": sampler.peak_mb if sampler is not None else None,
+                "children_peak_rss_mb": sampler.children_peak_mb if sampler is not None else None,
+                # ru_maxrss: whole life of the process / largest exited child
+                "lifetime_peak_rss_mb": lifetime_peak_rss_mb(),
+                "children_lifetime_peak_rss_mb": lifetime_peak_rss_mb(resource.RUSAGE_CHILDREN),
+                # Sampled peak of every watched process, e.g. {"model_worker": ...}
+                "watched_peak_rss_mb": sampler.watched_peak_mb if sampler is not None else None,
+                "calls": counter_delta(before, counters()),
+            })
+
+
+def timed(name=None):
+    """Decorator running the function as a phase (named after it by default)."""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with phase(name or func.__name__):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+@contextmanager
+def run(script, path=METRICS_FILE):
+    """Record the phases of one script run; a ``total`` line is written at the end."""
+    global _recorder
+    previous = _recorder
+    _recorder = Recorder(script, path)
+    try:
+        with phase("total"):
+            yield _recorder
+    finally:
+        _recorder = previous
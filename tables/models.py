@@ -0,0 +1,284 @@
+"""Lazily loaded models and an optional long-lived worker keeping them warm.
+
+Every model is loaded on first use and kept for the life of the process, so
+a run that only hits caches never pays the startup cost. Optionally, start a
+worker once; while it is running the scripts send their batched embed,
+classify and casing requests to it instead of loading the models themselves.
+The worker reports the time and model calls of every request back, and its
+memory is sampled, so the scripts' metrics still cover the model work::
+
+    python tables/models.py              # serve on WORKER_ADDRESS until Ctrl-C
+    python tables/word.py                # uses the warm worker
+"""
+import argparse
+import os
+import threading
+import time
+from functools import lru_cache
+from multiprocessing.managers import BaseManager
+
+import metrics
+
+PHOBERT = "vinai/phobert-base"
+TOPIC_MODEL = "cardiffnlp/tweet-topic-21-multi"
+SPACY_MODEL = "en_core_web_sm"
+# Unix socket of the worker; scripts use the worker when it is listening there
+WORKER_ADDRESS = "data/.model_worker.sock"
+WORKER_AUTHKEY = b"se-data-models"
+USE_WORKER = True
+
+
+@lru_cache(maxsize=None)
+def config(name):
+    """Hugging Face config of a model; cheap, no weights are loaded."""
+    from transformers import AutoConfig
+
+    return AutoConfig.from_pretrained(name)
+
+
+def hub_cache():
+    """Folder of the local Hugging Face hub cache."""
+    home = os.environ.get("HF_HOME", os.path.join(os.path.expanduser("~"), ".cache", "huggingface"))
+    return os.environ.get("HF_HUB_CACHE", os.path.join(home, "hub"))
+
+
+@lru_cache(maxsize=None)
+def revision(name):
+    """Best-effort revision of a model (its hub commit hash).
+
+    Read from the ``refs/main`` file of the local hub cache when the model
+    was downloaded, so checking an output cache against the model imports
+    neither transformers nor the model config.
+    """
+    try:
+        with open(os.path.join(hub_cache(), f"models--{name.replace('/', '--')}", "refs", "main"), "r") as f:
+            return f.read().strip()
+    except OSError:
+        return getattr(config(name), "_commit_hash", None)
+
+
+@lru_cache(maxsize=None)
+def tokenizer(name):
+    from transformers import AutoTokenizer
+
+    return AutoTokenizer.from_pretrained(name, use_fast=True)
+
+
+@lru_cache(maxsize=None)
+def encoder(name, quantize=False):
+    """Encoder model (e.g. PhoBERT) in eval mode, int8-quantized if requested."""
+    from transformers import AutoModel
+
+    from quantization import quantize_int8
+
+    model = AutoModel.from_pretrained(name).eval()
+    return quantize_int8(model) if quantize else model
+
+
+@lru_cache(maxsize=None)
+def classifier(name, quantize=False):
+    """Sequence classification model in eval mode, int8-quantized if requested."""
+    from transformers import AutoModelForSequenceClassification
+
+    from quantization import quantize_int8
+
+    model = AutoModelForSequenceClassification.from_pretrained(name).eval()
+    return quantize_int8(model) if quantize else model
+
+
+@lru_cache(maxsize=None)
+def spacy_english():
+    import spacy
+
+    return spacy.load(SPACY_MODEL)
+
+
+@lru_cache(maxsize=None)
+def english_pool(processes):
+    """spaCy process pool, started once and reused by every casing request."""
+    from sentence_casing import english_pool
+
+    return english_pool(SPACY_MODEL, processes)
+
+
+@lru_cache(maxsize=None)
+def vietnamese_pool(workers):
+    """Underthesea process pool, started once and reused by every casing request."""
+    from sentence_casing import vietnamese_pool
+
+    return vietnamese_pool(workers)
+
+
+def classify_topics(texts, tokenizer, model, class_mapping, batch_size=32):
+    """Predict a topic name (or None) for every text.
+
+    Texts are sorted by token length before batching so each batch pads to
+    a similar length; predictions are returned in input order.
+    """
+    import numpy as np
+    import torch
+    from scipy.special import expit
+
+    texts = list(texts)
+    lengths = [len(ids) for ids in tokenizer(texts, truncation=True)["input_ids"]]
+    order = np.argsort(lengths, kind="stable")
+    topics = [None] * len(texts)
+
+    for i in range(0, len(order), batch_size):
+        batch_rows = order[i:i + batch_size]
+        tokens_batch = tokenizer([texts[row] for row in batch_rows],
+                                 return_tensors='pt',
+                                 padding=True,
+                                 truncation=True)
+        with torch.inference_mode():
+            output = model(**tokens_batch)
+        metrics.count("topic_forward_passes")
+        scores = expit(output.logits.numpy())
+        for row, row_scores in zip(batch_rows, scores):
+            prediction_id = int(np.argmax(row_scores))
+            prediction_score = float(np.max(row_scores))
+            if prediction_score >= 0.5:
+                topics[row] = class_mapping[prediction_id].replace("_", " ").title()
+    return topics
+
+
+class ModelService:
+    """Batched model operations, run in-process or inside the worker."""
+
+    def __init__(self):
+        # One request at a time: torch and spaCy already use every core
+        self.lock = threading.RLock()
+
+    def embed(self, words, name=PHOBERT, quantize=False, batch_size=64):
+        from embedding_store import embed_words
+
+        with self.lock:
+            return embed_words(list(words), tokenizer(name), encoder(name, quantize), batch_size=batch_size)
+
+    def classify(self, texts, name=TOPIC_MODEL, quantize=False, batch_size=32):
+        with self.lock:
+            return classify_topics(texts, tokenizer(name), classifier(name, quantize),
+                                   config(name).id2label, batch_size=batch_size)
+
+    def normalize_english(self, sentences, batch_size=256, n_process=1):
+        from sentence_casing import normalize_english_bulk
+
+        with self.lock:
+            if n_process > 1:
+                return normalize_english_bulk(list(sentences), None, batch_size=batch_size,
+                                              executor=english_pool(n_process))
+            return normalize_english_bulk(list(sentences), spacy_english(), batch_size=batch_size)
+
+    def normalize_vietnamese(self, sentences, workers=1):
+        from sentence_casing import normalize_vietnamese_bulk
+
+        with self.lock:
+            return normalize_vietnamese_bulk(list(sentences), vietnamese_pool(workers) if workers > 1 else None)
+
+    def pid(self):
+        return os.getpid()
+
+    def measured(self, method, args):
+        """Run ``method(*args)`` and report its time and model calls to the caller.
+
+        Returns:
+            tuple: The result and a dict with ``seconds`` and ``calls`` (the
+            :mod:`metrics` counters the request incremented).
+        """
+        with self.lock:
+            before = metrics.counters()
+            start = time.perf_counter()
+            result = getattr(self, method)(*args)
+            return result, {"seconds": time.perf_counter() - start,
+                            "calls": metrics.counter_delta(before, metrics.counters())}
+
+    def preload(self, quantize=False):
+        """Load every model now rather than on the first request."""
+        tokenizer(PHOBERT), encoder(PHOBERT, quantize)
+        tokenizer(TOPIC_MODEL), classifier(TOPIC_MODEL, quantize)
+        spacy_english()
+
+
+class ModelManager(BaseManager):
+    pass
+
+
+ModelManager.register("models")
+
+_local = ModelService()
+
+
+@lru_cache(maxsize=1)
+def worker(address=WORKER_ADDRESS):
+    """Proxy of the running worker, or None when no worker is listening."""
+    if not USE_WORKER or not os.path.exists(address):
+        return None
+    manager = ModelManager(address=address, authkey=WORKER_AUTHKEY)
+    try:
+        manager.connect()
+    except OSError:
+        return None
+    remote = manager.models()
+    metrics.watch("model_worker", remote.pid())
+    return remote
+
+
+def call(method, *args):
+    """Run a :class:`ModelService` method on the worker if one is running, else in-process.
+
+    The worker's time and model calls are added to this process's counters
+    (``model_worker_seconds`` and e.g. ``embedding_forward_passes``).
+    """
+    remote = worker()
+    if remote is None:
+        return getattr(_local, method)(*args)
+    result, report = remote.measured(method, args)
+    for counter, n in report["calls"].items():
+        metrics.count(counter, n)
+    metrics.count("model_worker_seconds", round(report["seconds"], 4))
+    return result
+
+
+def embed(words, name=PHOBERT, quantize=False, batch_size=64):
+    """Mean-pooled embeddings of ``words``, see :func:`embedding_store.embed_words`."""
+    return call("embed", list(words), name, quantize, batch_size)
+
+
+def classify(texts, name=TOPIC_MODEL, quantize=False, batch_size=32):
+    """Topic name (or None) of every text, see :func:`classify_topics`."""
+    return call("classify", list(texts), name, quantize, batch_size)
+
+
+def normalize_english(sentences, batch_size=256, n_process=1):
+    return call("normalize_english", list(sentences), batch_size, n_process)
+
+
+def normalize_vietnamese(sentences, workers=1):
+    return call("normalize_vietnamese", list(sentences), workers)
+
+
+def serve(address=WORKER_ADDRESS, preload=True, quantize=False):
+    """Run the worker until interrupted."""
+    if os.path.exists(address):
+        os.remove(address)
+    os.makedirs(os.path.dirname(address) or ".", exist_ok=True)
+    if preload:
+        print("Loading models...")
+        _local.preload(quantize)
+    ModelManager.register("models", callable=lambda: _local)
+    server = ModelManager(address=address, authkey=WORKER_AUTHKEY).get_server()
+    print(f"Model worker listening on {address}")
+    try:
+        server.serve_forever()
+    finally:
+        if os.path.exists(address):
+            os.remove(address)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Keep the models warm for the table-building scripts.")
+    parser.add_argument("--address", default=WORKER_ADDRESS, help="Unix socket to listen on")
+    parser.add_argument("--no-preload", action="store_true", help="load each model on its first request")
+    parser.add_argument("--quantize", action="store_true", help="preload the int8 models instead of fp32")
+    args = parser.parse_args()
+    serve(args.address, preload=not args.no_preload, quantize=args.quantize)
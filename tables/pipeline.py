@@ -0,0 +1,264 @@
+"""Incremental runner for the table-building stages.
+
+Every stage declares the files it reads and writes. A stage is skipped when
+the hash of its inputs, command and parameters matches the last successful
+run and its outputs still exist; stages whose inputs are ready run in
+parallel. Run from the repository root::
+
+    python tables/pipeline.py                 # everything that is out of date
+    python tables/pipeline.py progress media  # only these stages (and what they need)
+    python tables/pipeline.py --dry-run       # show what would run
+"""
+import argparse
+import hashlib
+import json
+import os
+import subprocess
+import sys
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+# Stage commands and paths are relative to the repository root
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STATE_FILE = "data/.pipeline_state.json"
+
+Stage = namedtuple("Stage", ["name", "command", "inputs", "outputs", "params"])
+
+
+def script(path, *args):
+    return [sys.executable, path, *args]
+
+
+def notebook(path):
+    # Executed copy goes to stdout so the notebook itself (a stage input) is unchanged
+    return ["jupyter", "nbconvert", "--to", "notebook", "--execute", "--stdout", path]
+
+
+MODEL_MODULES = ["tables/models.py", "tables/metrics.py", "tables/quantization.py", "tables/similarity_index.py",
+                 "tables/embedding_store.py", "tables/sentence_casing.py"]
+WORDS_MODULES = ["tables/word.py", *MODEL_MODULES, "tables/words_builder.py", "tables/sentence_analysis.py",
+                 "tables/translation_memo.py", "tables/dedupe.py", "tables/table_io.py"]
+MEDIA_MODULES = ["tables/media.py", "tables/tts_runner.py", "tables/dedupe.py", "tables/metrics.py",
+                 "tables/table_io.py"]
+# Caches shared by word.py and updated_word.py. The words stage declares them
+# and selected_words reads words.csv (its offline dictionary) so it runs after
+# words; the two never write the caches at once.
+WORDS_CACHES = ["data/word_embeddings.npy", "data/word_embeddings_vocab.json", "data/word_index.npz",
+                "data/sentence_analysis.sqlite", "data/translations.sqlite"]
+
+STAGES = [
+    Stage("sentences", script("tables/sentence_and_topic.py"),
+          ["tables/sentence_and_topic.py", *MODEL_MODULES],
+          ["data/sentences.csv", "data/topics.csv"],
+          {"dataset": "HoangVuSnape/vi_en_translation_small"}),
+    Stage("sentence_duplicates", script("tables/dedupe.py"),
+          ["tables/dedupe.py", "tables/table_io.py", "data/sentences.csv"],
+          ["data/sentence_duplicates.csv", "data/sentence_duplicates.json"], {}),
+    Stage("selected_sentences", script("tables/updated_lesson_sentence.py"),
+          ["tables/updated_lesson_sentence.py", "tables/dedupe.py", "tables/table_io.py", "data/sentences.csv",
+           "data/topics.csv", "data/sentence_duplicates.csv"],
+          ["data/selected_sentences.csv"], {}),
+    Stage("words", script("tables/word.py"),
+          [*WORDS_MODULES, "data/sentences.csv", "data/sentence_duplicates.csv", "data/stopwords.txt"],
+          ["data/words.csv", *WORDS_CACHES], {}),
+    Stage("selected_words", script("tables/updated_word.py"),
+          ["tables/updated_word.py", *WORDS_MODULES, "data/selected_sentences.csv", "data/sentence_duplicates.csv",
+           "data/stopwords.txt", "data/words.csv"],
+          ["data/selected_words.csv"], {}),
+    Stage("lessons", script("tables/lesson.py"),
+          ["tables/lesson.py", "tables/table_io.py", "data/topics.csv", "data/sentences.csv"],
+          ["data/lessons.csv"], {}),
+    Stage("final_tables", script("tables/final_tables.py"),
+          ["tables/final_tables.py", "tables/table_io.py", "data/topics.csv", "data/lessons.csv"],
+          ["final_data/topics.csv", "final_data/lessons.csv"], {}),
+    Stage("lessons_sentences", script("tables/lesson_sentence.py"),
+          ["tables/lesson_sentence.py", "tables/table_io.py", "final_data/topics.csv",
+           "data/selected_sentences.csv"],
+          ["final_data/lessons_sentences.csv"], {}),
+    Stage("progress", script("tables/progress.py"),
+          ["tables/progress.py", "tables/table_io.py", "data/users.csv", "data/lessons.csv"],
+          ["data/progress.csv", "final_data/progress.csv"], {}),
+    Stage("users", notebook("add_columns.ipynb"),
+          ["add_columns.ipynb", "tables/points.py", "data/users.csv", "data/progress.csv"],
+          ["final_data/users.csv"], {}),
+    Stage("user_friends", script("tables/friend_graph.py"),
+          ["tables/friend_graph.py", "tables/table_io.py", "final_data/users.csv"],
+          ["final_data/user_friends.csv", "final_data/user_friends_edges.csv", "final_data/user_friends.npz"], {}),
+    Stage("lesson_bundles", script("tables/lesson_bundles.py"),
+          ["tables/lesson_bundles.py", *MEDIA_MODULES, "final_data/lessons.csv",
+           "final_data/lessons_sentences.csv", "data/selected_sentences.csv", "data/selected_words.csv",
+           "data/media.csv"],
+          ["final_data/lesson_bundles.sqlite"], {}),
+    Stage("media", script("tables/media.py"),
+          [*MEDIA_MODULES, "data/sentences.csv", "data/sentence_duplicates.csv"],
+          ["data/media/failed_jobs.csv", "data/media/audio_texts.sqlite"], {}),
+    Stage("media_table", script("tables/media_manifest.py"),
+          ["tables/media_manifest.py", *MEDIA_MODULES, "data/sentences.csv", "data/sentence_duplicates.csv",
+           "data/media/failed_jobs.csv", "data/media/audio_texts.sqlite"],
+          ["data/media.csv"], {}),
+    # Reruns whenever one of the final tables changes
+    Stage("validate", script("tables/validate.py"),
+          ["tables/validate.py", "tables/sqlite_loader.py", "tables/friend_graph.py", "tables/table_io.py",
+           "final_data/topics.csv",
+           "final_data/users.csv", "data/sentences.csv", "data/selected_words.csv", "final_data/lessons.csv",
+           "final_data/lessons_sentences.csv", "final_data/progress.csv", "final_data/user_friends.csv",
+           "final_data/user_friends_edges.csv"],
+          [], {}),
+]
+
+
+class FileHasher:
+    """SHA-256 of files, reusing earlier hashes while size and mtime are unchanged."""
+
+    def __init__(self, cache):
+        self.cache = cache
+
+    def __call__(self, path):
+        if not os.path.exists(path):
+            return None
+        stat = os.stat(path)
+        cached = self.cache.get(path)
+        if cached and cached[0] == stat.st_size and cached[1] == stat.st_mtime_ns:
+            return cached[2]
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+        self.cache[path] = [stat.st_size, stat.st_mtime_ns, digest.hexdigest()]
+        return digest.hexdigest()
+
+
+def fingerprint(stage, hash_file):
+    """Hash of everything that determines a stage's outputs."""
+    payload = {
+        "command": [os.path.basename(part) if part == sys.executable else part for part in stage.command],
+        "params": stage.params,
+        "inputs": {path: hash_file(path) for path in stage.inputs},
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def load_state():
+    if not os.path.exists(STATE_FILE):
+        return {"stages": {}, "files": {}}
+    with open(STATE_FILE, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_state(state):
+    os.makedirs(os.path.dirname(STATE_FILE), exist_ok=True)
+    tmp_file = STATE_FILE + ".tmp"
+    with open(tmp_file, "w", encoding="utf-8") as f:
+        json.dump(state, f, indent=1, sort_keys=True)
+    os.replace(tmp_file, STATE_FILE)
+
+
+def dependencies(stages):
+    """Map every stage to the stages producing its inputs."""
+    producers = {output: stage.name for stage in stages for output in stage.outputs}
+    return {
+        stage.name: {producers[path] for path in stage.inputs if path in producers and producers[path] != stage.name}
+        for stage in stages
+    }
+
+
+def select(stages, targets):
+    """Stages needed for ``targets`` (all stages when empty), in declaration order."""
+    if not targets:
+        return list(stages)
+    by_name = {stage.name: stage for stage in stages}
+    unknown = set(targets) - set(by_name)
+    if unknown:
+        raise SystemExit(f"Unknown stages: {', '.join(sorted(unknown))}")
+    deps = dependencies(stages)
+    needed, todo = set(), list(targets)
+    while todo:
+        name = todo.pop()
+        if name not in needed:
+            needed.add(name)
+            todo.extend(deps[name])
+    return [stage for stage in stages if stage.name in needed]
+
+
+def run(stages, force=False, workers=4, dry_run=False):
+    """Run out-of-date stages, in parallel where dependencies allow.
+
+    Returns:
+        dict[str, str]: Outcome per stage: ``ran``, ``skipped``, ``failed``,
+        ``blocked`` (an upstream stage failed) or ``would run`` (dry run).
+    """
+    state = load_state()
+    hash_file = FileHasher(state["files"])
+    deps = dependencies(stages)
+    pending = {stage.name: stage for stage in stages}
+    outcome = {}
+
+    def up_to_date(stage):
+        previous = state["stages"].get(stage.name)
+        return (not force and previous is not None
+                and previous == fingerprint(stage, hash_file)
+                and all(os.path.exists(path) for path in stage.outputs))
+
+    def launch(stage):
+        # Hashed before the run: an input edited while the stage runs makes it out of date
+        stage_fingerprint = fingerprint(stage, hash_file)
+        print(f"[{stage.name}] running: {' '.join(stage.command)}")
+        # nbconvert --stdout would dump the whole executed notebook
+        stdout = subprocess.DEVNULL if stage.command[0] == "jupyter" else None
+        return subprocess.run(stage.command, stdout=stdout).returncode, stage_fingerprint
+
+    running = {}
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        while pending or running:
+            progressed = False
+            for name, stage in list(pending.items()):
+                upstream = [outcome.get(dep) for dep in deps[name]]
+                if None in upstream:
+                    continue
+                del pending[name]
+                progressed = True
+                if any(result in ("failed", "blocked") for result in upstream):
+                    outcome[name] = "blocked"
+                    print(f"[{name}] blocked by a failed upstream stage")
+                elif up_to_date(stage) and "would run" not in upstream:
+                    outcome[name] = "skipped"
+                    print(f"[{name}] up to date")
+                elif dry_run:
+                    outcome[name] = "would run"
+                    print(f"[{name}] would run")
+                else:
+                    running[executor.submit(launch, stage)] = stage
+
+            if not running:
+                if pending and not progressed:
+                    raise RuntimeError(f"Dependency cycle between stages: {', '.join(pending)}")
+                continue
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                stage = running.pop(future)
+                returncode, stage_fingerprint = future.result()
+                if returncode == 0:
+                    outcome[stage.name] = "ran"
+                    state["stages"][stage.name] = stage_fingerprint
+                    save_state(state)
+                    print(f"[{stage.name}] done")
+                else:
+                    outcome[stage.name] = "failed"
+                    state["stages"].pop(stage.name, None)
+                    print(f"[{stage.name}] failed with exit code {returncode}")
+    save_state(state)
+    return outcome
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the table-building stages incrementally.")
+    parser.add_argument("targets", nargs="*", help="stages to bring up to date (default: all)")
+    parser.add_argument("--force", action="store_true", help="run the stages even if they are up to date")
+    parser.add_argument("--workers", type=int, default=4, help="maximum number of stages running at once")
+    parser.add_argument("--dry-run", action="store_true", help="only report which stages would run")
+    args = parser.parse_args()
+
+    os.chdir(ROOT)
+
+    outcome = run(select(STAGES, args.targets), force=args.force, workers=args.workers, dry_run=args.dry_run)
+    sys.exit(1 if any(result in ("failed", "blocked") for result in outcome.values()) else 0)
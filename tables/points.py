@@ -0,0 +1,200 @@
+import numpy as np
+import pandas as pd
+
+KEY_COLUMNS = ['u_id', 'topic_id', 'lesson_id']
+
+
+class PointsAggregator:
+    """Per-user and per-user-per-topic point totals keyed by ``u_id``.
+
+    Scores are kept in a dense (users x lessons) int32 matrix, next to a mask
+    of the recorded cells, and totals in int64 arrays aligned with its rows, so
+    memory grows by a few bytes per (user, lesson) instead of a Python object
+    per progress row. Users get a row on first sight (``rows`` maps u_id to
+    row) and lessons a column. Totals are maintained from progress deltas:
+    applying a progress row adds the difference between its new score and the
+    score previously recorded for the same (u_id, topic_id, lesson_id). A full
+    recompute over all scores is only done on demand.
+    """
+
+    def __init__(self):
+        self.rows = {}
+        self.lesson_columns = {}
+        self.topic_columns = {}
+        self._u_ids = np.zeros(0, dtype=np.int64)
+        self._scores = np.zeros((0, 0), dtype=np.int32)
+        self._recorded = np.zeros((0, 0), dtype=bool)
+        self._user_points = np.zeros(0, dtype=np.int64)
+        self._topic_points = np.zeros((0, 0), dtype=np.int64)
+        # Topic column of every lesson column
+        self.lesson_topic = np.zeros(0, dtype=np.int64)
+
+    @classmethod
+    def from_progress(cls, progress_df):
+        """Build the aggregator from a full progress table."""
+        aggregator = cls()
+        user_rows, u_ids = pd.factorize(progress_df['u_id'].to_numpy(dtype=np.int64), sort=True)
+        lesson_keys = ((progress_df['topic_id'].to_numpy(dtype=np.int64) << 32)
+                       | progress_df['lesson_id'].to_numpy(dtype=np.int64))
+        lesson_cols, lessons = pd.factorize(lesson_keys, sort=True)
+
+        aggregator._u_ids = np.asarray(u_ids, dtype=np.int64)
+        aggregator.rows = dict(zip(aggregator._u_ids.tolist(), range(len(u_ids))))
+        for col, key in enumerate(np.asarray(lessons).tolist()):
+            aggregator.lesson_columns[(key >> 32, key & 0xFFFFFFFF)] = col
+        topic_ids = sorted({topic_id for topic_id, _ in aggregator.lesson_columns})
+        aggregator.topic_columns = {topic_id: col for col, topic_id in enumerate(topic_ids)}
+        aggregator.lesson_topic = np.array([aggregator.topic_columns[topic_id]
+                                            for topic_id, _ in aggregator.lesson_columns], dtype=np.int64)
+
+        aggregator._scores = np.zeros((len(u_ids), len(lessons)), dtype=np.int32)
+        aggregator._recorded = np.zeros((len(u_ids), len(lessons)), dtype=bool)
+        aggregator._user_points = np.zeros(len(u_ids), dtype=np.int64)
+        aggregator._topic_points = np.zeros((len(u_ids), len(topic_ids)), dtype=np.int64)
+        # Like a dict update, the last row of a duplicated key wins
+        aggregator._scores[user_rows, lesson_cols] = progress_df['score'].to_numpy(dtype=np.int32)
+        aggregator._recorded[user_rows, lesson_cols] = True
+        aggregator.recompute()
+        return aggregator
+
+    @property
+    def u_ids(self):
+        """u_id of every row."""
+        return self._u_ids[:len(self.rows)]
+
+    @property
+    def user_points(self):
+        """Total points of every row."""
+        return self._user_points[:len(self.rows)]
+
+    @property
+    def topic_points(self):
+        """(users x topics) matrix of points, columns as in ``topic_columns``."""
+        return self._topic_points[:len(self.rows)]
+
+    def recompute(self):
+        """Recompute every total from the recorded scores."""
+        scores = self._scores[:len(self.rows)]
+        self._user_points[:len(self.rows)] = scores.sum(axis=1, dtype=np.int64)
+        for col in range(len(self.topic_columns)):
+            topic_scores = scores[:, self.lesson_topic == col]
+            self._topic_points[:len(self.rows), col] = topic_scores.sum(axis=1, dtype=np.int64)
+
+    def _grow_rows(self, n):
+        """Reserve room for ``n`` rows, doubling the capacity when needed."""
+        capacity = len(self._u_ids)
+        if n <= capacity:
+            return
+        extra = max(n, 2 * capacity, 16) - capacity
+        self._u_ids = np.concatenate([self._u_ids, np.zeros(extra, dtype=np.int64)])
+        self._scores = np.concatenate([self._scores, np.zeros((extra, self._scores.shape[1]), dtype=np.int32)])
+        self._recorded = np.concatenate([self._recorded, np.zeros((extra, self._recorded.shape[1]), dtype=bool)])
+        self._user_points = np.concatenate([self._user_points, np.zeros(extra, dtype=np.int64)])
+        self._topic_points = np.concatenate(
+            [self._topic_points, np.zeros((extra, self._topic_points.shape[1]), dtype=np.int64)])
+
+    def _row(self, u_id):
+        row = self.rows.get(u_id)
+        if row is None:
+            row = len(self.rows)
+            self._grow_rows(row + 1)
+            self._u_ids[row] = u_id
+            self.rows[u_id] = row
+        return row
+
+    def _topic_column(self, topic_id):
+        col = self.topic_columns.get(topic_id)
+        if col is None:
+            col = len(self.topic_columns)
+            self._topic_points = np.concatenate(
+                [self._topic_points, np.zeros((len(self._topic_points), 1), dtype=np.int64)], axis=1)
+            self.topic_columns[topic_id] = col
+        return col
+
+    def _lesson_column(self, topic_id, lesson_id):
+        col = self.lesson_columns.get((topic_id, lesson_id))
+        if col is None:
+            col = len(self.lesson_columns)
+            self.lesson_topic = np.append(self.lesson_topic, self._topic_column(topic_id))
+            self._scores = np.concatenate([self._scores, np.zeros((len(self._scores), 1), dtype=np.int32)], axis=1)
+            self._recorded = np.concatenate([self._recorded, np.zeros((len(self._recorded), 1), dtype=bool)], axis=1)
+            self.lesson_columns[(topic_id, lesson_id)] = col
+        return col
+
+    def apply(self, u_id, topic_id, lesson_id, score):
+        """Insert or update one progress row and return the change in points."""
+        row = self._row(int(u_id))
+        col = self._lesson_column(int(topic_id), int(lesson_id))
+        delta = int(score) - int(self._scores[row, col])
+        self._scores[row, col] = int(score)
+        self._recorded[row, col] = True
+        if delta:
+            self._user_points[row] += delta
+            self._topic_points[row, self.lesson_topic[col]] += delta
+        return delta
+
+    def apply_progress(self, rows):
+        """Apply progress inserts/updates.
+
+        Args:
+            rows (pd.DataFrame | Iterable[dict]): Rows with u_id, topic_id,
+                lesson_id and score.
+
+        Returns:
+            set[int]: u_ids whose points changed.
+        """
+        if isinstance(rows, pd.DataFrame):
+            rows = rows[KEY_COLUMNS + ['score']].itertuples(index=False, name=None)
+        else:
+            rows = ((row['u_id'], row['topic_id'], row['lesson_id'], row['score']) for row in rows)
+        return {int(u_id) for u_id, topic_id, lesson_id, score in rows
+                if self.apply(u_id, topic_id, lesson_id, score)}
+
+    def points(self, u_id):
+        row = self.rows.get(int(u_id))
+        return 0 if row is None else int(self._user_points[row])
+
+    def points_for(self, u_ids):
+        """Points of every user in ``u_ids``, 0 for users without progress."""
+        u_ids = np.asarray(u_ids, dtype=np.int64)
+        if not self.rows:
+            return np.zeros(len(u_ids), dtype=np.int64)
+        rows = pd.Index(self.u_ids).get_indexer(u_ids)
+        return np.where(rows >= 0, self.user_points[rows], 0).astype(np.int64)
+
+    def topic_points_of(self, u_id, topic_id):
+        row = self.rows.get(int(u_id))
+        col = self.topic_columns.get(int(topic_id))
+        return 0 if row is None or col is None else int(self._topic_points[row, col])
+
+    def topic_users(self, topic_id):
+        """u_ids with progress in ``topic_id`` and their points in it."""
+        col = self.topic_columns.get(int(topic_id))
+        if col is None:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+        rows = np.flatnonzero(self._recorded[:len(self.rows), self.lesson_topic == col].any(axis=1))
+        return self.u_ids[rows], self.topic_points[rows, col]
+
+    def to_frame(self):
+        """Recorded scores as a progress-like DataFrame."""
+        rows, cols = np.nonzero(self._recorded[:len(self.rows)])
+        lessons = np.array(list(self.lesson_columns), dtype=np.int64).reshape(-1, 2)
+        return pd.DataFrame({
+            'u_id': self.u_ids[rows],
+            'topic_id': lessons[cols, 0],
+            'lesson_id': lessons[cols, 1],
+            'score': self._scores[rows, cols].astype(np.int64),
+        })
+
+    def check_consistency(self, progress_df):
+        """Compare the maintained user totals with a full groupby over ``progress_df``.
+
+        Returns:
+            pd.DataFrame: Users whose totals differ (u_id, expected, actual);
+            empty when the aggregator is consistent.
+        """
+        expected = progress_df.groupby('u_id')['score'].sum()
+        actual = pd.Series(self.user_points, index=self.u_ids, dtype=np.int64)
+        compared = pd.concat([expected.rename('expected'), actual.rename('actual')], axis=1).fillna(0)
+        compared = compared.astype(np.int64).rename_axis('u_id').reset_index()
+        return compared[compared['expected'] != compared['actual']].reset_index(drop=True)
@@ -1,48 +1,83 @@
-import pandas as pd 
-import random 
-from datetime import datetime, timedelta
-
-users = pd.read_csv('data/users.csv')
-lessons = pd.read_csv('data/lessons.csv')
-topics = pd.read_csv('data/topics.csv')
-lessons = lessons.drop_duplicates(subset=['topic_id', 'lesson_id'])
-lessons = lessons[['topic_id', 'lesson_id']]
-lessons = lessons.reset_index(drop=True)
-
-progress_data = []
-in_progress_scores = [1000, 2000, 3000, 4000, 5000, 6000, 7000, 8000, 9000]
-
-for user_id in users['u_id']:
-    for i in range(len(lessons)):
-        # Generate random score trigger
-        score_trigger = random.uniform(0, 10000)
-        
-        # Assign score and status based on trigger
-        if score_trigger < 1000:
-            score = 0
-            status = 'Not Started'
-        elif score_trigger > 9000:
-            score = 10000
-            status = 'Completed'
-        else:
-            score = random.choice(in_progress_scores)
-            status = 'In Progress'
-        
-        last_updated = datetime.now() - timedelta(days=random.randint(0, 365))
-        
-        progress_data.append({
-            'u_id': user_id,
-            'topic_id': lessons['topic_id'][i],
-            'lesson_id': lessons['lesson_id'][i],
-            'score': score,
-            'status': status,
-            'last_updated': last_updated.strftime('%Y-%m-%d %H:%M:%S')
-        })
-
-# Create the progress DataFrame
-progress_df = pd.DataFrame(progress_data)   
-
-# Save to CSV
-progress_df.to_csv('data/progress.csv', index=False)
-
-print("Progress data generated and saved to data/progress.csv")
\ No newline at end of file
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from table_io import TableWriter, copy_table, read_table
+
+DATA_DIR = 'data'
+FINAL_DATA_DIR = 'final_data'
+# Number of users whose progress rows are generated and written at a time
+CHUNK_USERS = 20000
+SEED = None
+
+in_progress_scores = np.array([1000, 2000, 3000, 4000, 5000, 6000, 7000, 8000, 9000])
+STATUSES = ['Not_Started', 'In_Progress', 'Completed']
+COLUMNS = ['u_id', 'topic_id', 'lesson_id', 'score', 'status', 'last_updated']
+
+
+def generate_progress_chunk(user_ids, lessons, rng, now):
+    """Generate the progress rows of a chunk of users for every lesson.
+
+    A score trigger is drawn uniformly in [0, 10000): below 1000 the lesson is
+    not started (score 0), above 9000 it is completed (score 10000), otherwise
+    it is in progress with a random multiple of 1000 as score. ``last_updated``
+    is up to 365 days before ``now``.
+
+    Args:
+        user_ids (np.ndarray): u_id of the users in this chunk.
+        lessons (pd.DataFrame): Distinct (topic_id, lesson_id) pairs.
+        rng (np.random.Generator): Random generator.
+        now (np.datetime64): Reference time for ``last_updated``.
+
+    Returns:
+        pd.DataFrame: One row per (user, lesson), users in input order.
+    """
+    n_rows = len(user_ids) * len(lessons)
+
+    score_trigger = rng.uniform(0, 10000, n_rows)
+    status_codes = np.where(score_trigger < 1000, 0, np.where(score_trigger > 9000, 2, 1))
+    score = rng.choice(in_progress_scores, n_rows)
+    score[status_codes == 0] = 0
+    score[status_codes == 2] = 10000
+
+    days_ago = rng.integers(0, 366, n_rows).astype('timedelta64[D]')
+
+    return pd.DataFrame({
+        'u_id': np.repeat(user_ids, len(lessons)),
+        'topic_id': np.tile(lessons['topic_id'].to_numpy(), len(user_ids)),
+        'lesson_id': np.tile(lessons['lesson_id'].to_numpy(), len(user_ids)),
+        'score': score,
+        'status': pd.Categorical.from_codes(status_codes, STATUSES),
+        'last_updated': now - days_ago,
+    }, columns=COLUMNS)
+
+
+def generate_progress(user_ids, lessons, root=DATA_DIR, chunk_users=CHUNK_USERS, seed=SEED):
+    """Generate the progress table chunk by chunk, writing each chunk to ``{root}/progress.*``.
+
+    Returns:
+        int: Number of rows written.
+    """
+    rng = np.random.default_rng(seed)
+    now = np.datetime64(datetime.now().replace(microsecond=0), 's')
+    user_ids = np.asarray(user_ids)
+
+    with TableWriter('progress', root=root) as writer:
+        for start in range(0, len(user_ids), chunk_users):
+            writer.write(generate_progress_chunk(user_ids[start:start + chunk_users], lessons, rng, now))
+    return writer.rows
+
+
+if __name__ == "__main__":
+    users = read_table('users', DATA_DIR, columns=['u_id'])
+    lessons = read_table('lessons', DATA_DIR, columns=['topic_id', 'lesson_id'])
+    lessons = lessons.drop_duplicates(subset=['topic_id', 'lesson_id'])
+    lessons = lessons.reset_index(drop=True)
+
+    rows = generate_progress(users['u_id'].to_numpy(), lessons, DATA_DIR)
+
+    # Status values already use the web app's spelling, so the final table is a copy
+    copy_table('progress', DATA_DIR, FINAL_DATA_DIR)
+
+    print(f"Progress data generated ({rows} rows) and saved to {DATA_DIR}/ and {FINAL_DATA_DIR}/")
@@ -0,0 +1,82 @@
+"""Opt-in int8 CPU inference and checks of its agreement with fp32.
+
+Dynamic quantization stores the weights of every ``nn.Linear`` as int8 and
+quantizes activations on the fly, which speeds up CPU forward passes of
+BERT-style encoders at a small accuracy cost. The checks below measure that
+cost on a sample of the actual data, so the faster mode can be validated per
+dataset before its output is used.
+"""
+import random
+
+import numpy as np
+
+from similarity_index import SimilarityIndex
+
+# Appended to a model revision, so caches never mix fp32 and int8 outputs
+QUANTIZED_SUFFIX = "+int8"
+
+
+def quantize_int8(model):
+    """Dynamically quantized copy of ``model`` (linear layers in int8), in eval mode."""
+    import torch
+
+    return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8).eval()
+
+
+def quantized_revision(revision, quantized):
+    """Revision recorded with outputs of the model, marking int8 ones."""
+    return f"{revision}{QUANTIZED_SUFFIX}" if quantized else revision
+
+
+def sample_items(items, size, seed=0):
+    """Reproducible sample of up to ``size`` items, in input order."""
+    items = list(items)
+    if len(items) <= size:
+        return items
+    rows = sorted(random.Random(seed).sample(range(len(items)), size))
+    return [items[row] for row in rows]
+
+
+def label_agreement(reference, candidate):
+    """Share of positions where two label lists agree.
+
+    Returns:
+        dict: ``sample`` size, ``agreement`` in [0, 1] and the number of
+        ``changed`` labels per (reference, candidate) pair.
+    """
+    reference, candidate = list(reference), list(candidate)
+    changed = {}
+    for ref, cand in zip(reference, candidate):
+        if ref != cand:
+            changed[f"{ref} -> {cand}"] = changed.get(f"{ref} -> {cand}", 0) + 1
+    agreement = 1 - sum(changed.values()) / len(reference) if reference else 1.0
+    return {"sample": len(reference), "agreement": round(agreement, 4), "changed": changed}
+
+
+def neighbour_overlap(words, reference_matrix, candidate_matrix, top_n=10):
+    """Agreement of two embeddings of the same words.
+
+    For every word, its ``top_n`` most similar words among ``words`` are found
+    in both embeddings and the overlap of the two lists is averaged.
+
+    Neighbours are searched within ``words`` only, not the full vocabulary,
+    so the overlap is not the agreement of the neighbours words.csv uses;
+    only compare it between runs with the same sample size.
+
+    Returns:
+        dict: ``sample`` size, mean ``overlap`` in [0, 1] and the mean cosine
+        similarity between the two vectors of each word (``mean_cosine``).
+    """
+    words = list(words)
+    top_n = min(top_n, len(words) - 1)
+    if top_n < 1:
+        return {"sample": len(words), "overlap": 1.0, "mean_cosine": 1.0}
+
+    reference = SimilarityIndex(words, reference_matrix)
+    candidate = SimilarityIndex(words, candidate_matrix)
+    reference_neighbours = reference.most_similar(words, top_n=top_n)
+    candidate_neighbours = candidate.most_similar(words, top_n=top_n)
+    overlap = np.mean([len(set(reference_neighbours[word]) & set(candidate_neighbours[word])) / top_n
+                       for word in words])
+    mean_cosine = np.mean(np.sum(reference.matrix * candidate.matrix, axis=1))
+    return {"sample": len(words), "overlap": round(float(overlap), 4), "mean_cosine": round(float(mean_cosine), 4)}
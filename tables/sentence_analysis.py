@@ -0,0 +1,121 @@
+import hashlib
+import json
+import re
+import sqlite3
+import string
+
+# Bump when clean_sentence or the tokenizer/tagger output changes, so cached
+# analyses are recomputed instead of silently reused.
+ANALYZER_VERSION = 1
+
+
+# Sentence cleaning function
+def clean_sentence(sentence):
+    """Clean a Vietnamese sentence: lowercase, remove punctuation, strip redundant spaces."""
+    from underthesea import ner
+
+    entities = ner(sentence)
+    words = [entity[0] for entity in entities]
+    for entity in entities:
+        if entity[3] != 'O':
+            words.remove(entity[0])
+
+    sentence = ' '.join(words)        #type: ignore
+    sentence = sentence.lower()
+    sentence = sentence.translate(str.maketrans(string.punctuation, ' ' * len(string.punctuation)))
+    sentence = re.sub(r'\s+', ' ', sentence).strip()  # Strip redundant spaces
+
+    return sentence
+
+
+def analyze_sentence(sentence):
+    """Run NER cleaning, word segmentation and POS tagging on one sentence.
+
+    Returns:
+        dict: ``cleaned`` text, segmented ``tokens`` and their ``pos_tags``.
+    """
+    from pyvi import ViTokenizer, ViPosTagger
+
+    cleaned = clean_sentence(sentence)
+    tokenized = ViTokenizer.tokenize(cleaned)
+    tokens, pos_tags = ViPosTagger.postagging(tokenized)
+    return {"cleaned": cleaned, "tokens": list(tokens), "pos_tags": list(pos_tags)}
+
+
+def sentence_hash(sentence):
+    return hashlib.sha1(f"{ANALYZER_VERSION}\n{sentence}".encode("utf-8")).hexdigest()
+
+
+class SentenceAnalysisCache:
+    """Persistent per-sentence analysis results keyed by sentence hash.
+
+    Vocabulary extraction and candidate-word selection both need the cleaned,
+    segmented and tagged form of every sentence; with this cache NER and
+    tagging run once per distinct sentence across phases, scripts and runs.
+    """
+
+    def __init__(self, path, analyzer=analyze_sentence):
+        """
+        Args:
+            path (str): SQLite database file.
+            analyzer (Callable[[str], dict]): Function producing the analysis
+                of one sentence, see :func:`analyze_sentence`.
+        """
+        self.analyzer = analyzer
+        # Shard workers write to the same file concurrently
+        self.conn = sqlite3.connect(path, timeout=60)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS sentence_analysis ("
+            "sentence_hash TEXT PRIMARY KEY, cleaned TEXT NOT NULL, "
+            "tokens TEXT NOT NULL, pos_tags TEXT NOT NULL)"
+        )
+
+    def _lookup(self, hashes, chunk_size=500):
+        found = {}
+        for start in range(0, len(hashes), chunk_size):
+            chunk = hashes[start:start + chunk_size]
+            placeholders = ",".join("?" * len(chunk))
+            rows = self.conn.execute(
+                f"SELECT sentence_hash, cleaned, tokens, pos_tags FROM sentence_analysis "
+                f"WHERE sentence_hash IN ({placeholders})",
+                chunk,
+            )
+            for key, cleaned, tokens, pos_tags in rows:
+                found[key] = {"cleaned": cleaned, "tokens": json.loads(tokens), "pos_tags": json.loads(pos_tags)}
+        return found
+
+    def analyze_many(self, sentences, progress=None):
+        """Analyse a list of sentences, computing only those not cached yet.
+
+        Args:
+            sentences (list[str]): Sentences to analyse.
+            progress (Callable): Optional wrapper such as ``tqdm`` applied to
+                the sentences that still need analysing.
+
+        Returns:
+            list[dict]: One analysis per input sentence, in input order.
+        """
+        sentences = list(sentences)
+        keys = [sentence_hash(sentence) for sentence in sentences]
+        found = self._lookup(list(dict.fromkeys(keys)))
+
+        missing = {key: sentence for key, sentence in zip(keys, sentences) if key not in found}
+        if missing:
+            items = missing.items()
+            if progress is not None:
+                items = progress(items, total=len(missing))
+            new_rows = []
+            for key, sentence in items:
+                analysis = self.analyzer(sentence)
+                found[key] = analysis
+                new_rows.append((key, analysis["cleaned"],
+                                 json.dumps(analysis["tokens"], ensure_ascii=False),
+                                 json.dumps(analysis["pos_tags"], ensure_ascii=False)))
+            with self.conn:
+                self.conn.executemany("INSERT OR REPLACE INTO sentence_analysis VALUES (?, ?, ?, ?)", new_rows)
+
+        return [found[key] for key in keys]
+
+    def close(self):
+        self.conn.close()
@@ -1,149 +1,216 @@
+import json
+import os
+import shutil
+
 import pandas as pd
-from datasets import load_dataset
-from transformers import AutoModelForSequenceClassification, AutoTokenizer
-import numpy as np
-from scipy.special import expit
 from tqdm.auto import tqdm
-import spacy
-from underthesea import pos_tag, word_tokenize
+import metrics
+import models
+from quantization import label_agreement, quantized_revision, sample_items
+from table_io import TableWriter, table_path, write_table
+
+DATASET = "HoangVuSnape/vi_en_translation_small"
+MODEL = "cardiffnlp/tweet-topic-21-multi"
+# sentences and topics tables, written through table_io
+DATA_DIR = "data"
+# Classified rows are appended here chunk by chunk; the checkpoint records how
+# many dataset rows (and bytes of the partial file) are complete and which
+# dataset fingerprint they come from, so a rerun over the same dataset resumes
+# after the last finished chunk.
+PARTIAL_FILE = "data/sentences_topics.partial.csv"
+CHECKPOINT_FILE = "data/sentences_topics.checkpoint.json"
+CHUNK_SIZE = 2048
+BATCH_SIZE = 32
+# Casing normalization: spaCy batch size / processes and Underthesea processes
+SPACY_BATCH_SIZE = 256
+SPACY_PROCESSES = 1
+TAGGER_WORKERS = os.cpu_count() or 1
+# Classify with int8 dynamic quantization (faster on CPU). With CHECK_AGREEMENT
+# the labels of AGREEMENT_SAMPLE sentences are compared against fp32 first.
+QUANTIZE = False
+CHECK_AGREEMENT = True
+AGREEMENT_SAMPLE = 1000
+SEED = 42
+
+
+def classifier_name():
+    """Model (and precision) the checkpointed rows were classified with."""
+    return quantized_revision(MODEL, QUANTIZE)
+
 
-# Load spaCy English model
-nlp_eng = spacy.load("en_core_web_sm")
+def checkpoint_source(dataset):
+    """Model (and precision) and dataset fingerprint the checkpointed rows come from."""
+    return {"model": classifier_name(), "dataset": getattr(dataset, "_fingerprint", None)}
 
 
-def process_sentence(sentence: str, lang: str = 'en') -> str:
+def load_checkpoint(dataset):
+    """Return the checkpoint of the streaming run over ``dataset``, or an empty one.
+
+    A checkpoint written with another model or precision, or over another
+    version of the dataset, is discarded, so the partial file never mixes
+    fp32 and int8 labels or rows of different datasets.
     """
-    Processes a sentence so that:
-      - The first word of the sentence is capitalized (if it's not a proper noun),
-      - All proper nouns are fully uppercased.
-      
-    For English, spaCy is used; for Vietnamese, Underthesea is used.
-    
-    Args:
-        sentence (str): The input sentence.
-        lang (str): Language code ('en' for English, 'vi' for Vietnamese).
-        
+    source = checkpoint_source(dataset)
+    empty = {"rows_done": 0, "bytes": 0, **source}
+    if not os.path.exists(CHECKPOINT_FILE) or not os.path.exists(PARTIAL_FILE):
+        return empty
+    with open(CHECKPOINT_FILE, "r", encoding="utf-8") as f:
+        checkpoint = json.load(f)
+    # Checkpoints without a model entry predate quantization, i.e. fp32
+    if checkpoint.get("model", MODEL) != source["model"]:
+        print(f"Checkpoint was written with {checkpoint.get('model', MODEL)}, starting over...")
+        return empty
+    if checkpoint.get("dataset") != source["dataset"]:
+        print(f"Checkpoint was written for dataset {checkpoint.get('dataset')}, not {source['dataset']}, "
+              f"starting over...")
+        return empty
+    return checkpoint
+
+
+def save_checkpoint(checkpoint):
+    tmp_file = CHECKPOINT_FILE + ".tmp"
+    with open(tmp_file, "w", encoding="utf-8") as f:
+        json.dump(checkpoint, f)
+    os.replace(tmp_file, CHECKPOINT_FILE)
+
+
+def check_agreement(dataset):
+    """Compare int8 and fp32 topic labels on a sample of the dataset."""
+    rows = sample_items(range(len(dataset)), AGREEMENT_SAMPLE, seed=SEED)
+    texts = dataset.select(rows)["English"]
+    report = label_agreement(models.classify(texts, MODEL, quantize=False, batch_size=BATCH_SIZE),
+                             models.classify(texts, MODEL, quantize=True, batch_size=BATCH_SIZE))
+    print(f"int8 vs fp32 topic labels on {report['sample']} sentences: {report['agreement']:.1%} agree")
+    for change, n in sorted(report["changed"].items(), key=lambda item: -item[1])[:10]:
+        print(f"  {change}: {n}")
+    return report
+
+
+def stream_classify(dataset):
+    """Classify ``dataset`` chunk by chunk, appending results to PARTIAL_FILE.
+
+    Only one chunk is held in memory at a time. After every chunk the partial
+    file is flushed and the checkpoint advanced; on restart the partial file is
+    truncated back to the last checkpoint and classification resumes there.
+
     Returns:
-        str: The processed sentence.
+        int: Number of rows classified by this call.
     """
-    if lang == 'en':
-        # Use spaCy for English
-        doc = nlp_eng(sentence)
-        tokens = []
-        for i, token in enumerate(doc):
-            text = token.text
-            if token.pos_ == "PROPN":
-                text = text.capitalize()
-            if i == 0 and token.pos_ != "PROPN":
-                text = text.capitalize()
-            tokens.append(text + token.whitespace_)
-        return "".join(tokens)
-    elif lang == 'vi':
-        # Use Underthesea for Vietnamese processing.
-        # Underthesea's pos_tag returns a list of tuples (word, tag).
-        # Typically, proper nouns are tagged with "Np".
-        tagged = pos_tag(sentence)
-        tokens = []
-        for i, (word, tag) in enumerate(tagged):
-            new_word = word
-            if tag == "Np":
-                new_word = word.capitalize()
-            if i == 0 and tag != "Np":
-                new_word = word.capitalize()
-            tokens.append(new_word)
-        # Vietnamese is typically space-separated; we join tokens by spaces.
-        return " ".join(tokens)
-    else:
-        raise ValueError(f"Unsupported language: {lang}")
-
-
-# Load the sentences and convert splits to DataFrames
-ds = load_dataset("HoangVuSnape/vi_en_translation_small")
-train = ds["train"].to_pandas()
-valid = ds["valid"].to_pandas()
-test = ds["test"].to_pandas()
-
-# Concatenate splits and reset index
-sentences = pd.concat([train, valid, test])
-sentences.reset_index(drop=True, inplace=True)
-sentences.rename(columns={
-    "English": "eng",
-    "Vietnamese": "viet"
-},
-                 inplace=True)
-
-# Load the model and tokenizer for topic classification
-MODEL = "cardiffnlp/tweet-topic-21-multi"
-tokenizer = AutoTokenizer.from_pretrained(MODEL)
-model = AutoModelForSequenceClassification.from_pretrained(MODEL)
-class_mapping = model.config.id2label
+    checkpoint = load_checkpoint(dataset)
+    if checkpoint["rows_done"]:
+        print(f"Resuming topic classification at row {checkpoint['rows_done']}...")
+        with open(PARTIAL_FILE, "r+b") as f:
+            f.truncate(checkpoint["bytes"])
+    elif os.path.exists(PARTIAL_FILE):
+        os.remove(PARTIAL_FILE)
+
+    first_row = checkpoint["rows_done"]
+    starts = range(first_row, len(dataset), CHUNK_SIZE)
+    for start in tqdm(starts, desc="Classifying topics"):
+        chunk = dataset[start:start + CHUNK_SIZE]
+        chunk_df = pd.DataFrame({"eng": chunk["English"], "viet": chunk["Vietnamese"]})
+        chunk_df["topic_name"] = models.classify(chunk_df["eng"].tolist(), MODEL, QUANTIZE, BATCH_SIZE)
+
+        write_header = not os.path.exists(PARTIAL_FILE) or os.path.getsize(PARTIAL_FILE) == 0
+        with open(PARTIAL_FILE, "a", encoding="utf-8", newline="") as f:
+            chunk_df.to_csv(f, index=False, header=write_header)
+            f.flush()
+            os.fsync(f.fileno())
+
+        checkpoint = {"rows_done": start + len(chunk_df), "bytes": os.path.getsize(PARTIAL_FILE),
+                      **checkpoint_source(dataset)}
+        save_checkpoint(checkpoint)
+    return len(dataset) - first_row
+
+
+def finalize_sentences():
+    """Turn the classified partial file into the sentences table, one chunk at a time.
+
+    Rows without a topic are dropped, ``s_id`` is assigned in dataset order and
+    both languages get their casing normalized.
 
-# Set a batch size for faster inference
-BATCH_SIZE = 32
-topics = []
-
-# Process the 'eng' column in batches with tqdm progress bar.
-for i in tqdm(range(0, len(sentences), BATCH_SIZE), desc="Classifying topics"):
-    batch_texts = sentences['eng'].iloc[i:i + BATCH_SIZE].tolist()
-    tokens_batch = tokenizer(batch_texts,
-                             return_tensors='pt',
-                             padding=True,
-                             truncation=True)
-    output = model(**tokens_batch)
-    logits = output.logits.detach().numpy()
-    scores = expit(logits)
-    for row_scores in scores:
-        prediction_id = int(np.argmax(row_scores))
-        prediction_score = float(np.max(row_scores))
-        if prediction_score < 0.5:
-            topics.append(None)
-        else:
-            topics.append(class_mapping[prediction_id].replace("_",
-                                                               " ").title())
-
-# Add the predicted topics as a new column in the DataFrame
-sentences['topic_name'] = topics
-sentences = sentences.dropna(subset=['topic_name'])
-sentences.insert(0, "s_id", range(1, len(sentences) + 1))
-
-# Process English and Vietnamese sentences using the merged function
-sentences['eng'] = sentences['eng'].apply(
-    lambda x: process_sentence(x, lang='en'))
-sentences['viet'] = sentences['viet'].apply(
-    lambda x: process_sentence(x, lang='vi'))
-
-# Save the resulting DataFrame to a CSV file
-sentences.to_csv("data/sentences.csv", index=False)
-
-# Process and save the topic mapping
-topics_df = pd.DataFrame(class_mapping.items(),
-                         columns=['topic_id', 'topic_name'])
-topics_df['topic_name'] = topics_df['topic_name'].apply(
-    lambda x: x.replace("_", " ").title())
-
-topics_df["topic_id"] = topics_df["topic_id"] + 1
-
-descriptions = [
-    "Discover the language of creativity and expression through topics on literature, visual arts, music, and cultural traditions. Deepen your understanding while learning vocabulary that brings art and culture to life.",
-    "Learn the key terms and phrases used in the professional world—from meetings and negotiations to startup lingo. Perfect for aspiring professionals and entrepreneurs eager to navigate international business communications.",
-    "Dive into the vibrant world of entertainment, celebrity news, and current trends. Expand your vocabulary with topics that keep you updated on pop culture and the lifestyles of famous personalities.",
-    "Practice everyday language through real-life narratives and personal stories. Topics include daily routines, personal reflections, and informal conversations that make learning practical and relatable.",
-    "Explore vocabulary and expressions centered on family relationships, from bonding with relatives to describing family dynamics. Ideal for understanding both formal terms and everyday language at home.",
-    "Learn the words and phrases that describe modern trends and timeless styles. This topic covers clothing, accessories, and expressions that help you discuss fashion confidently.",
-    "Discover the language used in movies, television shows, and online videos. Improve your listening and conversational skills by engaging with content about entertainment, reviews, and film discussions.",
-    "Build your vocabulary around well-being, exercise, and lifestyle health. From gym routines to healthy eating, learn useful terms that help you communicate about fitness and personal wellness.",
-    "Delve into the world of culinary delights with terms related to food, cooking, and dining out. Learn how to order, discuss recipes, and explore the rich vocabulary surrounding Vietnam’s food culture.",
-    "Immerse yourself in the language of digital play with vocabulary and expressions related to video games, online communities, and esports. Great for those who love interactive and modern gaming culture.",
-    "Focus on language skills within academic and educational contexts. Topics include studying strategies, classroom discussions, and learning resources to support your language journey.",
-    "Explore vocabulary and topics around music genres, lyrics, and the art of sound. Understand how music influences language and culture while enhancing your listening skills.",
-    "Stay informed with vocabulary and expressions used in current affairs and social issues. This topic helps you discuss politics, local news, and global events in a clear, conversational style.",
-    "Broaden your language skills by exploring various leisure activities and personal interests. From crafts to outdoor activities, learn expressions that describe your favorite pastimes.",
-    "Enhance your understanding of interpersonal communication with topics focused on friendships, romantic relationships, and social dynamics. Perfect for learning how to express emotions and connect with others.",
-    "Build a strong technical vocabulary with lessons on scientific discoveries and technological innovations. Ideal for discussing modern trends and academic subjects in everyday conversations.",
-    "Learn the vocabulary of athletic competitions, team sports, and physical activities. From game-day commentary to fitness talk, this topic helps you engage in lively sports discussions.",
-    "Equip yourself with essential travel phrases and vocabulary for booking trips, exploring new places, and describing local experiences. Perfect for adventurers planning their next journey.",
-    "Connect with language that reflects the energy and experiences of young learners and students. Topics include campus life, student culture, and the challenges and joys of youth."
-]
-topics_df['description'] = descriptions
-
-topics_df.to_csv("data/topics.csv", index=False)
\ No newline at end of file
+    Returns:
+        int: Number of sentences written.
+    """
+    next_s_id = 1
+    # Written next to the table and moved into place once complete
+    tmp_dir = os.path.join(DATA_DIR, ".sentences.tmp")
+    reader = pd.read_csv(PARTIAL_FILE, chunksize=CHUNK_SIZE, keep_default_na=False, dtype=str)
+    with TableWriter("sentences", root=tmp_dir) as writer:
+        for chunk_df in tqdm(reader, desc="Normalizing sentences"):
+            chunk_df = chunk_df[chunk_df["topic_name"] != ""].copy()
+            chunk_df.insert(0, "s_id", range(next_s_id, next_s_id + len(chunk_df)))
+            next_s_id += len(chunk_df)
+
+            # Casing rules of sentence_casing, applied to the whole chunk at once
+            chunk_df['eng'] = models.normalize_english(
+                chunk_df['eng'].tolist(), batch_size=SPACY_BATCH_SIZE, n_process=SPACY_PROCESSES)
+            chunk_df['viet'] = models.normalize_vietnamese(
+                chunk_df['viet'].tolist(), workers=TAGGER_WORKERS)
+
+            writer.write(chunk_df)
+    # CSV first: read_table only trusts a Parquet file at least as new as the CSV
+    for ext in ["csv", "parquet"]:
+        if os.path.exists(table_path("sentences", tmp_dir, ext)):
+            os.replace(table_path("sentences", tmp_dir, ext), table_path("sentences", DATA_DIR, ext))
+        elif os.path.exists(table_path("sentences", DATA_DIR, ext)):
+            os.remove(table_path("sentences", DATA_DIR, ext))
+    shutil.rmtree(tmp_dir)
+    return next_s_id - 1
+
+
+def save_topics(class_mapping):
+    """Process and save the topic mapping."""
+    topics_df = pd.DataFrame(class_mapping.items(),
+                             columns=['topic_id', 'topic_name'])
+    topics_df['topic_name'] = topics_df['topic_name'].apply(
+        lambda x: x.replace("_", " ").title())
+
+    topics_df["topic_id"] = topics_df["topic_id"] + 1
+
+    descriptions = [
+        "Discover the language of creativity and expression through topics on literature, visual arts, music, and cultural traditions. Deepen your understanding while learning vocabulary that brings art and culture to life.",
+        "Learn the key terms and phrases used in the professional world—from meetings and negotiations to startup lingo. Perfect for aspiring professionals and entrepreneurs eager to navigate international business communications.",
+        "Dive into the vibrant world of entertainment, celebrity news, and current trends. Expand your vocabulary with topics that keep you updated on pop culture and the lifestyles of famous personalities.",
+        "Practice everyday language through real-life narratives and personal stories. Topics include daily routines, personal reflections, and informal conversations that make learning practical and relatable.",
+        "Explore vocabulary and expressions centered on family relationships, from bonding with relatives to describing family dynamics. Ideal for understanding both formal terms and everyday language at home.",
+        "Learn the words and phrases that describe modern trends and timeless styles. This topic covers clothing, accessories, and expressions that help you discuss fashion confidently.",
+        "Discover the language used in movies, television shows, and online videos. Improve your listening and conversational skills by engaging with content about entertainment, reviews, and film discussions.",
+        "Build your vocabulary around well-being, exercise, and lifestyle health. From gym routines to healthy eating, learn useful terms that help you communicate about fitness and personal wellness.",
+        "Delve into the world of culinary delights with terms related to food, cooking, and dining out. Learn how to order, discuss recipes, and explore the rich vocabulary surrounding Vietnam’s food culture.",
+        "Immerse yourself in the language of digital play with vocabulary and expressions related to video games, online communities, and esports. Great for those who love interactive and modern gaming culture.",
+        "Focus on language skills within academic and educational contexts. Topics include studying strategies, classroom discussions, and learning resources to support your language journey.",
+        "Explore vocabulary and topics around music genres, lyrics, and the art of sound. Understand how music influences language and culture while enhancing your listening skills.",
+        "Stay informed with vocabulary and expressions used in current affairs and social issues. This topic helps you discuss politics, local news, and global events in a clear, conversational style.",
+        "Broaden your language skills by exploring various leisure activities and personal interests. From crafts to outdoor activities, learn expressions that describe your favorite pastimes.",
+        "Enhance your understanding of interpersonal communication with topics focused on friendships, romantic relationships, and social dynamics. Perfect for learning how to express emotions and connect with others.",
+        "Build a strong technical vocabulary with lessons on scientific discoveries and technological innovations. Ideal for discussing modern trends and academic subjects in everyday conversations.",
+        "Learn the vocabulary of athletic competitions, team sports, and physical activities. From game-day commentary to fitness talk, this topic helps you engage in lively sports discussions.",
+        "Equip yourself with essential travel phrases and vocabulary for booking trips, exploring new places, and describing local experiences. Perfect for adventurers planning their next journey.",
+        "Connect with language that reflects the energy and experiences of young learners and students. Topics include campus life, student culture, and the challenges and joys of youth."
+    ]
+    topics_df['description'] = descriptions
+
+    write_table(topics_df, "topics", DATA_DIR)
+
+
+if __name__ == "__main__":
+    with metrics.run("sentence_and_topic"):
+        # Load the sentence splits; rows stay Arrow-backed until a chunk is read
+        with metrics.phase("load_dataset") as p:
+            from datasets import concatenate_datasets, load_dataset
+
+            ds = load_dataset(DATASET)
+            dataset = concatenate_datasets([ds["train"], ds["valid"], ds["test"]])
+            p.items = len(dataset)
+
+        # The topic model and spaCy are loaded on first use (or served by the model worker)
+        if QUANTIZE and CHECK_AGREEMENT:
+            with metrics.phase("agreement", items=AGREEMENT_SAMPLE):
+                check_agreement(dataset)
+
+        with metrics.phase("classify") as p:
+            p.items = stream_classify(dataset)
+        with metrics.phase("normalize") as p:
+            p.items = finalize_sentences()
+        save_topics(models.config(MODEL).id2label)
@@ -0,0 +1,118 @@
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+# Components of en_core_web_sm that do not influence ``token.pos_`` or
+# ``token.whitespace_`` and can be skipped when normalizing casing
+UNUSED_ENGLISH_COMPONENTS = ["parser", "ner", "lemmatizer"]
+
+
+def format_english_doc(doc) -> str:
+    """Capitalize the first token and every proper noun of a spaCy ``Doc``."""
+    tokens = []
+    for i, token in enumerate(doc):
+        text = token.text
+        if token.pos_ == "PROPN":
+            text = text.capitalize()
+        if i == 0 and token.pos_ != "PROPN":
+            text = text.capitalize()
+        tokens.append(text + token.whitespace_)
+    return "".join(tokens)
+
+
+def format_vietnamese_tagged(tagged) -> str:
+    """Capitalize the first word and every proper noun (``Np``) of a tagged sentence."""
+    tokens = []
+    for i, (word, tag) in enumerate(tagged):
+        new_word = word
+        if tag == "Np":
+            new_word = word.capitalize()
+        if i == 0 and tag != "Np":
+            new_word = word.capitalize()
+        tokens.append(new_word)
+    # Vietnamese is typically space-separated; we join tokens by spaces.
+    return " ".join(tokens)
+
+
+def normalize_vietnamese(sentence: str) -> str:
+    """Normalize the casing of one Vietnamese sentence with Underthesea."""
+    from underthesea import pos_tag
+
+    return format_vietnamese_tagged(pos_tag(sentence))
+
+
+# spaCy pipeline of an English pool worker, loaded once by its initializer
+_worker_nlp = None
+
+
+def _init_english_worker(model_name):
+    global _worker_nlp
+    import spacy
+
+    _worker_nlp = spacy.load(model_name)
+
+
+def _normalize_english_batch(sentences, batch_size):
+    return normalize_english_bulk(sentences, _worker_nlp, batch_size=batch_size)
+
+
+def _init_vietnamese_worker():
+    # Load Underthesea's tagger once per worker instead of on its first sentence
+    normalize_vietnamese("Xin chào")
+
+
+def english_pool(model_name, processes):
+    """Process pool whose workers each load the spaCy pipeline ``model_name`` once.
+
+    Create it once per run and pass it to every :func:`normalize_english_bulk`
+    call; ``nlp.pipe(n_process=...)`` would start and load new processes per call.
+    """
+    return ProcessPoolExecutor(max_workers=processes, initializer=_init_english_worker, initargs=(model_name,))
+
+
+def vietnamese_pool(workers):
+    """Process pool whose workers each load Underthesea once, see :func:`english_pool`."""
+    return ProcessPoolExecutor(max_workers=workers, initializer=_init_vietnamese_worker)
+
+
+def normalize_english_bulk(sentences, nlp, batch_size=256, executor=None):
+    """Normalize the casing of many English sentences.
+
+    Sentences are streamed through ``nlp.pipe`` with the components that do not
+    affect POS tags disabled.
+
+    Args:
+        sentences (list[str]): Sentences to normalize.
+        nlp: Loaded spaCy pipeline (e.g. ``en_core_web_sm``); unused with ``executor``.
+        batch_size (int): Number of sentences per spaCy batch.
+        executor (ProcessPoolExecutor): Pool from :func:`english_pool`; batches
+            are spread over its workers. None runs in-process.
+
+    Returns:
+        list[str]: Normalized sentences, in input order.
+    """
+    sentences = list(sentences)
+    if executor is not None:
+        batches = [sentences[i:i + batch_size] for i in range(0, len(sentences), batch_size)]
+        normalize = partial(_normalize_english_batch, batch_size=batch_size)
+        return [sentence for batch in executor.map(normalize, batches) for sentence in batch]
+    disable = [name for name in UNUSED_ENGLISH_COMPONENTS if name in nlp.pipe_names]
+    docs = nlp.pipe(sentences, batch_size=batch_size, disable=disable)
+    return [format_english_doc(doc) for doc in docs]
+
+
+def normalize_vietnamese_bulk(sentences, executor=None, chunksize=256):
+    """Normalize the casing of many Vietnamese sentences, optionally across a process pool.
+
+    Args:
+        sentences (list[str]): Sentences to normalize.
+        executor (ProcessPoolExecutor): Pool from :func:`vietnamese_pool`;
+            None runs in-process.
+        chunksize (int): Number of sentences sent to a worker at a time.
+
+    Returns:
+        list[str]: Normalized sentences, in input order.
+    """
+    sentences = list(sentences)
+    if executor is None:
+        return [normalize_vietnamese(sentence) for sentence in sentences]
+    return list(executor.map(normalize_vietnamese, sentences, chunksize=chunksize))
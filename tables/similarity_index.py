@@ -0,0 +1,72 @@
+import numpy as np
+
+
+class SimilarityIndex:
+    """Cosine-similarity index over a fixed vocabulary of word embeddings.
+
+    The embedding matrix is L2-normalized once, so a batch of top-k queries is
+    a single matrix product followed by a partial selection per row instead of
+    one ``cosine_similarity`` call per word pair.
+    """
+
+    def __init__(self, words, matrix):
+        """
+        Args:
+            words (list[str]): Vocabulary, one word per matrix row.
+            matrix (np.ndarray): Embedding matrix of shape (len(words), dim).
+        """
+        matrix = np.asarray(matrix, dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        self.words = list(words)
+        self.matrix = matrix / norms
+        self.word_to_row = {word: row for row, word in enumerate(self.words)}
+
+    def __len__(self):
+        return len(self.words)
+
+    def __contains__(self, word):
+        return word in self.word_to_row
+
+    def most_similar(self, target_words, top_n=2, batch_size=1024):
+        """Find the most similar vocabulary words for a batch of target words.
+
+        Args:
+            target_words (Iterable[str]): Words to query. Unknown words map to [].
+            top_n (int): Number of neighbours per word (the word itself excluded).
+            batch_size (int): Number of query rows scored per matrix product.
+
+        Returns:
+            dict[str, list[str]]: Neighbours for every queried word, most similar first.
+        """
+        targets = list(dict.fromkeys(target_words))
+        result = {word: [] for word in targets if word not in self.word_to_row}
+        known = [word for word in targets if word in self.word_to_row]
+        k = min(top_n, len(self.words) - 1)
+        if k <= 0:
+            result.update({word: [] for word in known})
+            return result
+
+        for start in range(0, len(known), batch_size):
+            batch = known[start:start + batch_size]
+            rows = np.array([self.word_to_row[word] for word in batch])
+            scores = self.matrix[rows] @ self.matrix.T
+            # Never return the query word as its own neighbour
+            scores[np.arange(len(rows)), rows] = -np.inf
+            top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+            top_scores = np.take_along_axis(scores, top, axis=1)
+            order = np.argsort(-top_scores, axis=1, kind="stable")
+            top = np.take_along_axis(top, order, axis=1)
+            for word, neighbours in zip(batch, top):
+                result[word] = [self.words[i] for i in neighbours]
+        return result
+
+    def save(self, path):
+        """Save the normalized matrix and vocabulary to a ``.npz`` file."""
+        np.savez(path, words=np.array(self.words, dtype=str), matrix=self.matrix)
+
+    @classmethod
+    def load(cls, path):
+        """Load an index previously written by :meth:`save`."""
+        with np.load(path) as data:
+            return cls(data["words"].tolist(), data["matrix"])
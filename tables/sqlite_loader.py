@@ -0,0 +1,261 @@
+"""Load the final tables into a SQLite database with the diagram's keys.
+
+Tables are created with primary and foreign keys plus the indexes of the web
+app's hot queries, then filled in dependency order with one transaction and
+one prepared ``executemany`` per table. Loading is an upsert: rows whose key
+already exists are only rewritten when a value changed, so reloading an
+unchanged dataset writes nothing. Run from the repository root::
+
+    python tables/sqlite_loader.py                      # all tables into DB_FILE
+    python tables/sqlite_loader.py --prune progress     # one table, deleting stale rows
+"""
+import argparse
+import os
+import sqlite3
+import time
+
+from friend_graph import FriendGraph
+from table_io import read_table, table_path, to_csv_frame
+
+DB_FILE = "data/se_data.sqlite"
+
+DDL = {
+    "topics": """
+        CREATE TABLE IF NOT EXISTS topics (
+            topic_id INTEGER PRIMARY KEY,
+            topic_name TEXT NOT NULL UNIQUE,
+            description TEXT
+        )""",
+    "users": """
+        CREATE TABLE IF NOT EXISTS users (
+            u_id INTEGER PRIMARY KEY,
+            username TEXT NOT NULL UNIQUE,
+            email TEXT NOT NULL UNIQUE,
+            password TEXT NOT NULL,
+            name TEXT,
+            dob TEXT,
+            gender TEXT CHECK (gender IN ('Male', 'Female', 'Other')),
+            points INTEGER NOT NULL DEFAULT 0,
+            avatar TEXT,
+            date_created TEXT
+        )""",
+    "sentences": """
+        CREATE TABLE IF NOT EXISTS sentences (
+            s_id INTEGER PRIMARY KEY,
+            eng TEXT NOT NULL,
+            viet TEXT NOT NULL,
+            topic_name TEXT NOT NULL REFERENCES topics (topic_name)
+        )""",
+    "words": """
+        CREATE TABLE IF NOT EXISTS words (
+            w_id INTEGER PRIMARY KEY,
+            s_id INTEGER NOT NULL REFERENCES sentences (s_id),
+            idx INTEGER NOT NULL,
+            viet TEXT NOT NULL,
+            viet_similar_words TEXT,
+            eng TEXT,
+            eng_similar_words TEXT
+        )""",
+    "lessons": """
+        CREATE TABLE IF NOT EXISTS lessons (
+            topic_id INTEGER NOT NULL REFERENCES topics (topic_id),
+            lesson_id INTEGER NOT NULL,
+            lesson_type TEXT NOT NULL,
+            PRIMARY KEY (topic_id, lesson_id)
+        ) WITHOUT ROWID""",
+    "lessons_sentences": """
+        CREATE TABLE IF NOT EXISTS lessons_sentences (
+            topic_id INTEGER NOT NULL,
+            lesson_id INTEGER NOT NULL,
+            s_id INTEGER NOT NULL REFERENCES sentences (s_id),
+            PRIMARY KEY (topic_id, lesson_id, s_id),
+            FOREIGN KEY (topic_id, lesson_id) REFERENCES lessons (topic_id, lesson_id)
+        ) WITHOUT ROWID""",
+    "progress": """
+        CREATE TABLE IF NOT EXISTS progress (
+            u_id INTEGER NOT NULL REFERENCES users (u_id),
+            topic_id INTEGER NOT NULL,
+            lesson_id INTEGER NOT NULL,
+            score INTEGER NOT NULL CHECK (score BETWEEN 0 AND 10000),
+            status TEXT NOT NULL CHECK (status IN ('Not_Started', 'In_Progress', 'Completed')),
+            last_updated TEXT,
+            PRIMARY KEY (u_id, topic_id, lesson_id),
+            FOREIGN KEY (topic_id, lesson_id) REFERENCES lessons (topic_id, lesson_id)
+        ) WITHOUT ROWID""",
+    "user_friends": """
+        CREATE TABLE IF NOT EXISTS user_friends (
+            user_id INTEGER NOT NULL REFERENCES users (u_id),
+            friend_id INTEGER NOT NULL REFERENCES users (u_id),
+            PRIMARY KEY (user_id, friend_id)
+        ) WITHOUT ROWID""",
+}
+
+# Lookups not already served by a primary key prefix: progress by
+# (u_id, topic_id, lesson_id) and lessons_sentences by (topic_id, lesson_id)
+# use their primary keys
+INDEXES = [
+    "CREATE INDEX IF NOT EXISTS sentences_topic ON sentences (topic_name)",
+    "CREATE INDEX IF NOT EXISTS words_sentence ON words (s_id, idx)",
+    "CREATE INDEX IF NOT EXISTS lessons_sentences_sentence ON lessons_sentences (s_id)",
+    "CREATE INDEX IF NOT EXISTS progress_lesson ON progress (topic_id, lesson_id)",
+    "CREATE INDEX IF NOT EXISTS users_points ON users (points DESC)",
+    "CREATE INDEX IF NOT EXISTS user_friends_friend ON user_friends (friend_id)",
+]
+
+PRIMARY_KEYS = {
+    "topics": ["topic_id"],
+    "users": ["u_id"],
+    "sentences": ["s_id"],
+    "words": ["w_id"],
+    "lessons": ["topic_id", "lesson_id"],
+    "lessons_sentences": ["topic_id", "lesson_id", "s_id"],
+    "progress": ["u_id", "topic_id", "lesson_id"],
+    "user_friends": ["user_id", "friend_id"],
+}
+
+# (table_io name, folder) of every table; final_data has no sentences or words
+SOURCES = {
+    "topics": ("topics", "final_data"),
+    "users": ("users", "final_data"),
+    "sentences": ("sentences", "data"),
+    "words": ("selected_words", "data"),
+    "lessons": ("lessons", "final_data"),
+    "lessons_sentences": ("lessons_sentences", "final_data"),
+    "progress": ("progress", "final_data"),
+    "user_friends": ("user_friends", "final_data"),
+}
+
+# Parents before children, so foreign keys hold after every table
+LOAD_ORDER = ["topics", "users", "sentences", "words", "lessons", "lessons_sentences", "progress", "user_friends"]
+
+
+def connect(path=DB_FILE):
+    """Open the database with foreign keys enforced and the schema created."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA foreign_keys = ON")
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute("PRAGMA synchronous = NORMAL")
+    with conn:
+        for ddl in DDL.values():
+            conn.execute(ddl)
+        for index in INDEXES:
+            conn.execute(index)
+    return conn
+
+
+def read_source(name):
+    """Read the rows of SQLite table ``name`` from its CSV/Parquet source."""
+    source, root = SOURCES[name]
+    if name == "user_friends":
+        if os.path.exists(table_path("user_friends_edges", root)):
+            return read_table("user_friends_edges", root)
+        return FriendGraph.from_legacy_frame(read_table(source, root)).to_edge_frame()
+    df = read_table(source, root)
+    if name == "sentences":
+        df = df[["s_id", "eng", "viet", "topic_name"]]
+    return to_csv_frame(df, source)
+
+
+def upsert_sql(name, columns):
+    """Prepared INSERT that only rewrites existing rows whose values differ."""
+    keys = PRIMARY_KEYS[name]
+    values = [column for column in columns if column not in keys]
+    sql = (f"INSERT INTO {name} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))}) "
+           f"ON CONFLICT ({', '.join(keys)}) DO ")
+    if not values:
+        return sql + "NOTHING"
+    return (sql + "UPDATE SET " + ", ".join(f"{column} = excluded.{column}" for column in values)
+            + " WHERE " + " OR ".join(f"{name}.{column} IS NOT excluded.{column}" for column in values))
+
+
+def rows_of(df):
+    """Rows of ``df`` as tuples of Python values, missing values as None."""
+    df = df.astype(object)
+    return df.where(df.notna(), None).itertuples(index=False, name=None)
+
+
+def load_table(conn, name, df):
+    """Upsert ``df`` into table ``name`` in one transaction.
+
+    Args:
+        conn (sqlite3.Connection): Connection from :func:`connect`.
+        name (str): SQLite table name.
+        df (pd.DataFrame): Rows to load; columns must be a subset of the table's.
+
+    Returns:
+        int: Number of rows inserted or changed.
+    """
+    with conn:
+        before = conn.total_changes
+        conn.executemany(upsert_sql(name, list(df.columns)), rows_of(df))
+        return conn.total_changes - before
+
+
+def prune_table(conn, name, df):
+    """Delete the rows of table ``name`` whose key is not in ``df``.
+
+    Returns:
+        int: Number of rows deleted.
+    """
+    keys = ", ".join(PRIMARY_KEYS[name])
+    with conn:
+        conn.execute("DROP TABLE IF EXISTS temp.source_keys")
+        conn.execute(f"CREATE TEMP TABLE source_keys ({keys}, PRIMARY KEY ({keys}))")
+        conn.executemany(f"INSERT OR IGNORE INTO source_keys VALUES ({', '.join('?' * len(PRIMARY_KEYS[name]))})",
+                         rows_of(df[PRIMARY_KEYS[name]]))
+        before = conn.total_changes
+        conn.execute(f"DELETE FROM {name} WHERE ({keys}) NOT IN (SELECT {keys} FROM source_keys)")
+        deleted = conn.total_changes - before
+        conn.execute("DROP TABLE temp.source_keys")
+    return deleted
+
+
+def load_all(path=DB_FILE, tables=None, prune=False):
+    """Load ``tables`` (default: all) from their sources into the database at ``path``.
+
+    Args:
+        path (str): SQLite database file, created if missing.
+        tables (list[str]): Tables to load.
+        prune (bool): Also delete rows missing from the sources.
+
+    Returns:
+        dict[str, dict]: Rows ``written`` and ``deleted`` and ``seconds`` per table.
+    """
+    tables = [name for name in LOAD_ORDER if not tables or name in tables]
+    conn = connect(path)
+    report = {name: {"written": 0, "deleted": 0, "seconds": 0.0} for name in tables}
+    try:
+        sources = {}
+        for name in tables:
+            start = time.perf_counter()
+            sources[name] = read_source(name)
+            report[name]["seconds"] += time.perf_counter() - start
+        if prune:
+            # Children first, so a delete never leaves a dangling foreign key
+            for name in reversed(tables):
+                start = time.perf_counter()
+                report[name]["deleted"] = prune_table(conn, name, sources[name])
+                report[name]["seconds"] += time.perf_counter() - start
+        for name in tables:
+            start = time.perf_counter()
+            report[name]["written"] = load_table(conn, name, sources[name])
+            report[name]["seconds"] = round(report[name]["seconds"] + time.perf_counter() - start, 3)
+    finally:
+        conn.close()
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load the final tables into SQLite.")
+    parser.add_argument("tables", nargs="*", help=f"tables to load (default: all of {', '.join(LOAD_ORDER)})")
+    parser.add_argument("--db", default=DB_FILE, help="SQLite database file")
+    parser.add_argument("--prune", action="store_true", help="delete rows missing from the sources")
+    args = parser.parse_args()
+
+    unknown = set(args.tables) - set(LOAD_ORDER)
+    if unknown:
+        raise SystemExit(f"Unknown tables: {', '.join(sorted(unknown))}")
+
+    for name, result in load_all(args.db, args.tables, prune=args.prune).items():
+        print(f"{name}: {result['written']} rows written, {result['deleted']} deleted in {result['seconds']}s")
@@ -0,0 +1,215 @@
+import os
+import shutil
+from collections import namedtuple
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    HAS_PARQUET = True
+except ImportError:
+    HAS_PARQUET = False
+
+# Datetime column with the text format used in the CSV exports
+DateTime = namedtuple("DateTime", ["fmt"])
+
+TIMESTAMP = DateTime('%Y-%m-%d %H:%M:%S')
+DATE = DateTime('%Y-%m-%d')
+
+STATUSES = pd.CategoricalDtype(['Not_Started', 'In_Progress', 'Completed'])
+LESSON_TYPES = pd.CategoricalDtype(['Vocab', 'Fill_in_the_blank', 'Re_order_words', 'Re_order_chars', 'Listen_and_fill'])
+GENDERS = pd.CategoricalDtype(['Male', 'Female', 'Other'])
+
+# Spellings written by older versions of progress.py
+LEGACY_STATUSES = {'In Progress': 'In_Progress', 'Not Started': 'Not_Started'}
+
+# Column types per table. Columns missing from a file (e.g. points/avatar in
+# data/users.csv) are simply not read.
+SCHEMAS = {
+    'users': {
+        'u_id': 'int64', 'username': 'string', 'email': 'string', 'password': 'string',
+        'name': 'string', 'dob': DATE, 'gender': GENDERS, 'points': 'Int64',
+        'avatar': 'category', 'date_created': TIMESTAMP,
+    },
+    'topics': {'topic_id': 'int64', 'topic_name': 'string', 'description': 'string'},
+    'sentences': {'s_id': 'int64', 'eng': 'string', 'viet': 'string', 'topic_name': 'category'},
+    # Canonical sentence of every near-duplicate cluster, see dedupe.py
+    'sentence_duplicates': {'s_id': 'int64', 'canonical_s_id': 'int64'},
+    'selected_sentences': {'s_id': 'int64', 'viet': 'string', 'eng': 'string', 'topic': 'category'},
+    'words': {
+        'w_id': 'int64', 's_id': 'int64', 'idx': 'int64', 'viet': 'string',
+        'viet_similar_words': 'string', 'eng': 'string', 'eng_similar_words': 'string',
+    },
+    'lessons': {'topic_id': 'int64', 'lesson_id': 'int64', 'lesson_type': LESSON_TYPES},
+    'lessons_sentences': {'topic_id': 'int64', 'lesson_id': 'int64', 's_id': 'int64'},
+    'progress': {
+        'u_id': 'int64', 'topic_id': 'int64', 'lesson_id': 'int64', 'score': 'int64',
+        'status': STATUSES, 'last_updated': TIMESTAMP,
+    },
+    # Comma-joined friend ids, the format read by the web app importer
+    'user_friends': {'user_id': 'int64', 'friend_id': 'string'},
+    'user_friends_edges': {'user_id': 'int64', 'friend_id': 'int64'},
+    'media': {
+        's_id': 'int64', 'lang': 'category', 'path': 'string', 'duration_ms': 'Int64',
+        'bytes': 'Int64', 'checksum': 'string', 'peak_dbfs': 'float64', 'rms_dbfs': 'float64',
+        'trim_start_ms': 'Int64', 'trim_end_ms': 'Int64', 'status': 'category',
+    },
+}
+
+# Tables sharing the schema of another table
+SCHEMA_ALIASES = {'selected_words': 'words'}
+
+
+def table_path(name, root='data', ext='csv'):
+    return os.path.join(root, f"{name}.{ext}")
+
+
+def schema_of(name):
+    return SCHEMAS[SCHEMA_ALIASES.get(name, name)]
+
+
+def to_categories(values, dtype, column):
+    """Cast ``values`` to a fixed ``CategoricalDtype``, refusing unknown values.
+
+    ``astype`` alone would silently turn them into missing values.
+    """
+    unknown = values[values.notna() & ~values.isin(dtype.categories)]
+    if len(unknown):
+        raise ValueError(f"Column {column!r} has values outside {list(dtype.categories)}: "
+                         f"{sorted(map(str, unknown.unique()))[:10]}")
+    return values.astype(dtype)
+
+
+def apply_schema(df, name):
+    """Cast the columns of ``df`` to the types declared for table ``name``.
+
+    Raises:
+        ValueError: If a column with fixed categories (status, lesson type,
+            gender) holds another value.
+    """
+    schema = schema_of(name)
+    df = df.copy()
+    for column, dtype in schema.items():
+        if column not in df.columns:
+            continue
+        if isinstance(dtype, DateTime):
+            if not pd.api.types.is_datetime64_any_dtype(df[column]):
+                df[column] = pd.to_datetime(df[column], format=dtype.fmt)
+        elif dtype is STATUSES:
+            df[column] = to_categories(df[column].replace(LEGACY_STATUSES), dtype, column)
+        elif isinstance(dtype, pd.CategoricalDtype) and dtype.categories is not None:
+            df[column] = to_categories(df[column], dtype, column)
+        else:
+            df[column] = df[column].astype(dtype)
+    return df
+
+
+def read_table(name, root='data', columns=None, prefer_parquet=True):
+    """Read a typed table, from Parquet when available and otherwise from CSV.
+
+    Args:
+        name (str): Table name, e.g. ``'progress'`` (file ``{root}/{name}.*``).
+        root (str): Folder holding the table, ``data`` or ``final_data``.
+        columns (list[str]): Only read these columns.
+        prefer_parquet (bool): Read ``{name}.parquet`` if it exists.
+
+    Returns:
+        pd.DataFrame: Table with the declared column types.
+    """
+    parquet_path = table_path(name, root, 'parquet')
+    csv_path = table_path(name, root)
+    # A CSV edited or regenerated after the Parquet file wins
+    if (prefer_parquet and HAS_PARQUET and os.path.exists(parquet_path)
+            and (not os.path.exists(csv_path) or os.path.getmtime(parquet_path) >= os.path.getmtime(csv_path))):
+        return pd.read_parquet(parquet_path, columns=columns)
+
+    schema = schema_of(name)
+    text_dtypes = {column: ('string' if isinstance(dtype, (DateTime, pd.CategoricalDtype)) or dtype == 'category'
+                            else dtype)
+                   for column, dtype in schema.items()}
+    df = pd.read_csv(csv_path, usecols=columns, dtype=text_dtypes, keep_default_na=False,
+                     na_values={column: [''] for column, dtype in schema.items() if dtype in ('Int64', 'float64')})
+    return apply_schema(df, name)
+
+
+def to_csv_frame(df, name):
+    """Render datetime columns with the per-column text format of the CSV exports."""
+    df = df.copy()
+    for column, dtype in schema_of(name).items():
+        if isinstance(dtype, DateTime) and column in df.columns:
+            df[column] = df[column].dt.strftime(dtype.fmt)
+    return df
+
+
+def write_table(df, name, root='data', parquet=True, csv=True):
+    """Write a table as Parquet (typed, dictionary-encoded) and/or CSV.
+
+    The CSV export keeps the layout the web app importer expects.
+    """
+    os.makedirs(root, exist_ok=True)
+    df = apply_schema(df, name)
+    # CSV first: read_table only trusts a Parquet file at least as new as the CSV
+    if csv or not HAS_PARQUET:
+        to_csv_frame(df, name).to_csv(table_path(name, root), index=False)
+    if parquet and HAS_PARQUET:
+        df.to_parquet(table_path(name, root, 'parquet'), index=False)
+
+
+def copy_table(name, source='data', target='final_data'):
+    """Copy the files of a table unchanged from ``source`` to ``target``.
+
+    A format missing from ``source`` is removed from ``target``, so an older
+    Parquet copy is never read instead of the new CSV.
+    """
+    os.makedirs(target, exist_ok=True)
+    for ext in ['csv', 'parquet']:
+        if os.path.exists(table_path(name, source, ext)):
+            shutil.copy2(table_path(name, source, ext), table_path(name, target, ext))
+        elif os.path.exists(table_path(name, target, ext)):
+            os.remove(table_path(name, target, ext))
+
+
+class TableWriter:
+    """Write a table chunk by chunk to CSV and Parquet (one row group per chunk).
+
+    Usage::
+
+        with TableWriter('progress', root='data') as writer:
+            for chunk in chunks:
+                writer.write(chunk)
+    """
+
+    def __init__(self, name, root='data', parquet=True, csv=True):
+        self.name = name
+        self.root = root
+        self.parquet = parquet and HAS_PARQUET
+        self.csv = csv or not self.parquet
+        self.rows = 0
+        self._csv_file = None
+        self._parquet_writer = None
+
+    def __enter__(self):
+        os.makedirs(self.root, exist_ok=True)
+        if self.csv:
+            self._csv_file = open(table_path(self.name, self.root), 'w', encoding='utf-8', newline='')
+        return self
+
+    def write(self, chunk):
+        chunk = apply_schema(chunk, self.name)
+        if self.parquet:
+            table = pa.Table.from_pandas(chunk, preserve_index=False)
+            if self._parquet_writer is None:
+                self._parquet_writer = pq.ParquetWriter(table_path(self.name, self.root, 'parquet'), table.schema)
+            self._parquet_writer.write_table(table)
+        if self.csv:
+            to_csv_frame(chunk, self.name).to_csv(self._csv_file, index=False, header=self.rows == 0)
+        self.rows += len(chunk)
+
+    def __exit__(self, *exc_info):
+        if self._csv_file is not None:
+            if self.rows == 0:
+                pd.DataFrame(columns=list(schema_of(self.name))).to_csv(self._csv_file, index=False)
+            self._csv_file.close()
+        if self._parquet_writer is not None:
+            self._parquet_writer.close()
@@ -0,0 +1,165 @@
+import csv
+import sqlite3
+
+from metrics import count
+
+TRANSLATION_ERROR = "translation_error"
+
+
+class GoogleBackend:
+    """Google Translate backend that sends many short texts per request.
+
+    Texts are joined with newlines, which Google Translate preserves, so a
+    chunk of words costs one request. If the answer does not split back into
+    the same number of lines the chunk is retried one text at a time. The
+    client is only created on the first request, so runs answered entirely
+    by the memo never import it.
+    """
+
+    def __init__(self, source="vi", target="en", max_chars=4500):
+        self.source = source
+        self.target = target
+        self.max_chars = max_chars
+        self._translator = None
+
+    @property
+    def translator(self):
+        if self._translator is None:
+            from deep_translator import GoogleTranslator
+
+            self._translator = GoogleTranslator(source=self.source, target=self.target)
+        return self._translator
+
+    def _chunks(self, texts):
+        chunk, size = [], 0
+        for text in texts:
+            if chunk and size + len(text) + 1 > self.max_chars:
+                yield chunk
+                chunk, size = [], 0
+            chunk.append(text)
+            size += len(text) + 1
+        if chunk:
+            yield chunk
+
+    def translate_batch(self, texts):
+        """Translate a list of texts, returning None for texts that failed."""
+        results = []
+        for chunk in self._chunks(texts):
+            try:
+                count("translator_calls")
+                lines = self.translator.translate("\n".join(chunk)).split("\n")
+            except Exception as e:
+                print(f"Bulk translation error, retrying one by one: {e}")
+                lines = []
+            if len(lines) != len(chunk):
+                lines = [self._translate_one(text) for text in chunk]
+            results.extend(lines)
+        return results
+
+    def _translate_one(self, text):
+        try:
+            count("translator_calls")
+            return self.translator.translate(text)
+        except Exception as e:
+            print(f"Translation error for word '{text}': {e}")
+            return None
+
+
+class DictionaryBackend:
+    """Offline backend answering from a local ``{source_text: translation}`` mapping."""
+
+    def __init__(self, mapping):
+        self.mapping = dict(mapping)
+
+    @classmethod
+    def from_words_table(cls, path):
+        """Build a dictionary from an existing words table (e.g. ``data/words.csv``)."""
+        mapping = {}
+        with open(path, "r", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                pairs = [(row["viet"], row["eng"])]
+                viet_similar = row["viet_similar_words"].split(", ") if row["viet_similar_words"] else []
+                eng_similar = row["eng_similar_words"].split(", ") if row["eng_similar_words"] else []
+                if len(viet_similar) == len(eng_similar):
+                    pairs.extend(zip(viet_similar, eng_similar))
+                for viet, eng in pairs:
+                    if eng != TRANSLATION_ERROR:
+                        mapping.setdefault(viet, eng)
+        return cls(mapping)
+
+    def translate_batch(self, texts):
+        return [self.mapping.get(text) for text in texts]
+
+
+class TranslationMemo:
+    """Persistent translation cache keyed by (source, target, text).
+
+    Every run first deduplicates the texts it needs, answers what it can from
+    the SQLite store and sends only the misses to the backend. Failed
+    translations are not stored so they are retried on the next run.
+    """
+
+    def __init__(self, path, backend, source="vi", target="en"):
+        """
+        Args:
+            path (str): SQLite database file.
+            backend: Object with a ``translate_batch(texts)`` method returning
+                one translation (or None on failure) per text.
+            source (str): Source language code.
+            target (str): Target language code.
+        """
+        self.backend = backend
+        self.source = source
+        self.target = target
+        self.conn = sqlite3.connect(path)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS translations ("
+            "source TEXT NOT NULL, target TEXT NOT NULL, text TEXT NOT NULL, "
+            "translation TEXT NOT NULL, PRIMARY KEY (source, target, text))"
+        )
+
+    def lookup(self, texts, chunk_size=500):
+        """Return the cached translations for ``texts`` as a dict."""
+        texts = list(dict.fromkeys(texts))
+        found = {}
+        for start in range(0, len(texts), chunk_size):
+            chunk = texts[start:start + chunk_size]
+            placeholders = ",".join("?" * len(chunk))
+            rows = self.conn.execute(
+                f"SELECT text, translation FROM translations "
+                f"WHERE source = ? AND target = ? AND text IN ({placeholders})",
+                [self.source, self.target, *chunk],
+            )
+            found.update(rows)
+        return found
+
+    def translate_many(self, texts):
+        """Translate many texts, calling the backend once for all cache misses.
+
+        Returns:
+            dict[str, str]: Translation per distinct input text; texts the
+            backend could not translate map to ``TRANSLATION_ERROR``.
+        """
+        texts = list(dict.fromkeys(texts))
+        translations = self.lookup(texts)
+        misses = [text for text in texts if text not in translations]
+        count("translation_cache_hits", len(texts) - len(misses))
+        count("translation_cache_misses", len(misses))
+        if misses:
+            print(f"Translating {len(misses)} new texts ({len(texts) - len(misses)} cached)...")
+            results = self.backend.translate_batch(misses)
+            new_rows = [
+                (self.source, self.target, text, result)
+                for text, result in zip(misses, results)
+                if result
+            ]
+            with self.conn:
+                self.conn.executemany("INSERT OR REPLACE INTO translations VALUES (?, ?, ?, ?)", new_rows)
+            translations.update((text, result) for _, _, text, result in new_rows)
+        return {text: translations.get(text, TRANSLATION_ERROR) for text in texts}
+
+    def translate(self, text):
+        return self.translate_many([text])[text]
+
+    def close(self):
+        self.conn.close()
@@ -0,0 +1,256 @@
+import hashlib
+import os
+import random
+import shutil
+import sqlite3
+import subprocess
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from tqdm.auto import tqdm
+
+from metrics import count
+
+# One audio file to produce
+TTSJob = namedtuple("TTSJob", ["lang", "s_id", "text", "path"])
+
+# Output folder and file prefix per sentence column
+LANGUAGES = {
+    "eng": ("en", "english", "eng"),
+    "viet": ("vi", "vietnamese", "viet"),
+}
+
+# Leading bytes of the audio containers a backend may produce
+AUDIO_SIGNATURES = (b"ID3", b"RIFF", b"OggS", b"fLaC")
+
+
+class GTTSBackend:
+    """Google Text-to-Speech backend (needs network access)."""
+
+    # gTTS always returns MP3
+    extension = "mp3"
+
+    def synthesize(self, text: str, lang: str, output_filename: str) -> None:
+        from gtts import gTTS
+
+        output = gTTS(text, lang=lang, slow=False)
+        output.save(output_filename)
+
+
+class CommandBackend:
+    """Offline backend running a local synthesizer command.
+
+    ``command`` is an argv template formatted with ``text``, ``lang`` and
+    ``path``, e.g. ``["espeak-ng", "-v", "{lang}", "-w", "{path}", "{text}"]``;
+    ``extension`` is the format it writes (``-w`` makes espeak-ng write WAV).
+    """
+
+    def __init__(self, command, extension="wav"):
+        self.command = list(command)
+        self.extension = extension
+
+    def synthesize(self, text: str, lang: str, output_filename: str) -> None:
+        argv = [part.format(text=text, lang=lang, path=output_filename) for part in self.command]
+        subprocess.run(argv, check=True, capture_output=True)
+
+
+class TokenBucket:
+    """Thread-safe token bucket allowing ``rate`` calls per second with bursts of ``capacity``."""
+
+    def __init__(self, rate: float, capacity: int = 1):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self) -> None:
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+def is_valid_audio(path: str) -> bool:
+    """Whether ``path`` exists, is non-empty and starts like an audio file."""
+    try:
+        with open(path, "rb") as f:
+            header = f.read(4)
+    except OSError:
+        return False
+    if len(header) < 4:
+        return False
+    # MPEG audio frames start with an 11-bit sync word
+    return header.startswith(AUDIO_SIGNATURES) or (header[0] == 0xFF and header[1] & 0xE0 == 0xE0)
+
+
+def is_decodable_audio(path: str) -> bool:
+    """Whether ``path`` is valid audio that decodes to at least one sample."""
+    if not is_valid_audio(path):
+        return False
+    import librosa
+
+    try:
+        y, _ = librosa.load(path, sr=None, mono=True)
+    except Exception:
+        return False
+    return len(y) > 0
+
+
+def audio_file(column: str, s_id: int, extension: str = "mp3") -> str:
+    """Path of the audio of one sentence column, relative to the media folder."""
+    _, folder, prefix = LANGUAGES[column]
+    return f"{folder}/{prefix}_{s_id}.{extension}"
+
+
+def build_manifest(sentences, media_dir: str = "data/media", extension: str = "mp3"):
+    """List the TTS jobs for every sentence in both languages.
+
+    Args:
+        sentences (pd.DataFrame): Table with ``s_id``, ``eng`` and ``viet`` columns.
+        media_dir (str): Root folder of the audio files.
+        extension (str): Audio format written by the backend.
+
+    Returns:
+        list[TTSJob]: One job per (language, sentence).
+    """
+    jobs = []
+    for column, (lang, _, _) in LANGUAGES.items():
+        for s_id, text in zip(sentences["s_id"], sentences[column]):
+            path = os.path.join(media_dir, audio_file(column, s_id, extension))
+            jobs.append(TTSJob(lang, int(s_id), text, path))
+    return jobs
+
+
+def text_hash(lang: str, text: str) -> str:
+    return hashlib.sha256(f"{lang}\0{text}".encode("utf-8")).hexdigest()
+
+
+class AudioTexts:
+    """SQLite record of the text every audio file was synthesized from.
+
+    ``s_id`` values shift whenever the sentences table is rebuilt, so a file
+    is only reused while the hash recorded for its path matches its job.
+    """
+
+    def __init__(self, path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("CREATE TABLE IF NOT EXISTS audio_texts (path TEXT PRIMARY KEY, text_hash TEXT NOT NULL)")
+
+    def hashes(self):
+        return dict(self.conn.execute("SELECT path, text_hash FROM audio_texts"))
+
+    def adopt(self, jobs, check=is_decodable_audio):
+        """Record the files of ``jobs`` that already exist and decode as made from the job's text.
+
+        Backfills the record for audio generated before texts were recorded,
+        so it is not regenerated; only done while nothing is recorded yet.
+
+        Returns:
+            int: Number of files adopted.
+        """
+        if self.conn.execute("SELECT 1 FROM audio_texts LIMIT 1").fetchone() is not None:
+            return 0
+        existing = [job for job in jobs if os.path.exists(job.path)]
+        adopted = [job for job in tqdm(existing, desc="Adopting existing audio") if check(job.path)]
+        self.record(adopted)
+        return len(adopted)
+
+    def record(self, jobs):
+        with self.conn:
+            self.conn.executemany("INSERT OR REPLACE INTO audio_texts VALUES (?, ?)",
+                                  [(job.path, text_hash(job.lang, job.text)) for job in jobs])
+
+    def close(self):
+        self.conn.close()
+
+
+def _synthesize_with_retry(backend, bucket, lang, text, path, retries, backoff):
+    tmp_path = path + ".part"
+    for attempt in range(retries + 1):
+        bucket.acquire()
+        try:
+            count("tts_calls")
+            backend.synthesize(text, lang, tmp_path)
+            if not is_valid_audio(tmp_path):
+                raise RuntimeError("backend produced an empty or invalid audio file")
+            os.replace(tmp_path, path)
+            return None
+        except Exception as e:
+            if attempt == retries:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                return e
+            # Exponential backoff with jitter
+            time.sleep(backoff * (2 ** attempt) * (1 + random.random()))
+
+
+def run_jobs(jobs, backend, texts_file: str, workers: int = 4, rate: float = 1.0, burst: int = 1,
+             retries: int = 3, backoff: float = 2.0):
+    """Generate the audio for ``jobs`` concurrently under a rate limit.
+
+    Jobs whose file looks valid and was recorded in ``texts_file`` as made
+    from the same text are skipped. On the first run against an empty
+    ``texts_file``, existing files that decode are adopted as made from the
+    current text (:meth:`AudioTexts.adopt`) instead of regenerated. Jobs
+    with identical (language, text) are synthesized once and the file is
+    copied to the other paths.
+
+    Args:
+        jobs (list[TTSJob]): Jobs from :func:`build_manifest`.
+        backend: Object with ``synthesize(text, lang, output_filename)``.
+        texts_file (str): SQLite file of :class:`AudioTexts`.
+        workers (int): Number of concurrent backend calls.
+        rate (float): Maximum backend calls per second across all workers.
+        burst (int): Number of calls allowed back to back.
+        retries (int): Retries per job after the first failure.
+        backoff (float): Base delay in seconds for exponential backoff.
+
+    Returns:
+        list[tuple[TTSJob, Exception]]: Jobs that still failed after retries.
+    """
+    audio_texts = AudioTexts(texts_file)
+    adopted = audio_texts.adopt(jobs)
+    if adopted:
+        print(f"Adopted {adopted} existing audio files")
+    recorded = audio_texts.hashes()
+    pending = [job for job in jobs
+               if recorded.get(job.path) != text_hash(job.lang, job.text) or not is_valid_audio(job.path)]
+    groups = {}
+    for job in pending:
+        groups.setdefault((job.lang, job.text), []).append(job)
+    print(f"{len(jobs) - len(pending)} audio files are up to date, "
+          f"{len(pending)} to generate from {len(groups)} distinct texts")
+
+    for job in pending:
+        os.makedirs(os.path.dirname(job.path), exist_ok=True)
+
+    bucket = TokenBucket(rate, burst)
+    failures = []
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(_synthesize_with_retry, backend, bucket, lang, text,
+                            group[0].path, retries, backoff): group
+            for (lang, text), group in groups.items()
+        }
+        for future in tqdm(as_completed(futures), total=len(futures), desc="Generating audio"):
+            group = futures[future]
+            error = future.result()
+            if error is not None:
+                print(f"Error processing {group[0].lang} sentence {group[0].s_id}: {error}")
+                failures.extend((job, error) for job in group)
+                continue
+            for job in group[1:]:
+                shutil.copyfile(group[0].path, job.path)
+            audio_texts.record(group)
+    audio_texts.close()
+    return failures
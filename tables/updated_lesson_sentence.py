@@ -1,41 +1,72 @@
-import pandas as pd 
-import random 
-
-topics = pd.read_csv('data/topics.csv')
-sentences = pd.read_csv('data/sentences.csv')
-
-lesson_types = ['Vocab', 'Fill_in_the_blank', 'Re_order_words', 'Re_order_chars', 'Listen_and_fill']
-lesson_data = []
-sents = []
-
-for i in range(len(topics)):
-    selected_sentences = sentences[sentences['topic_name'] == topics['topic_name'][i]]['s_id'].to_list()
-    selected_sentences = random.sample(selected_sentences, min(20, len(selected_sentences)))
-    # with open(f"selected_sentences_{i}.txt", "w") as f:
-    #     for s_id in selected_sentences:
-    #         f.write(f"{s_id}\n")
-    # for j in range(5):
-    #     for s_id in selected_sentences:
-    #         lesson_data.append({
-    #             'topic_id': topics['topic_id'][i],
-    #             'lesson_id': j + 1,
-    #             's_id': s_id
-    #         })
-    for s_id in selected_sentences:
-        sents.append({
-            's_id': s_id,
-            'viet': sentences[sentences['s_id'] == s_id]['viet'].values[0],
-            'eng': sentences[sentences['s_id'] == s_id]['eng'].values[0],
-            'topic': sentences[sentences['s_id'] == s_id]['topic_name'].values[0]
-        })
-        
-
-# Create a DataFrame from the lesson data
-# lesson_df = pd.DataFrame(lesson_data)
-sentences_df = pd.DataFrame(sents)
-
-# Save the DataFrame to a CSV file
-# lesson_df.to_csv('data/lessons_sentences.csv', index=False)
-sentences_df.to_csv('data/selected_sentences.csv', index=False)
-
-print("Lesson table has been created successfully!")
\ No newline at end of file
+import os
+
+import pandas as pd
+
+from dedupe import load_duplicates, non_canonical_ids
+from table_io import read_table, write_table
+
+DATA_DIR = 'data'
+SAMPLES_PER_TOPIC = 20
+SEED = 42
+# Sentences listed in these files (any table with an s_id column) are never
+# re-selected, e.g. a previous selected_sentences.csv when building a new lesson set
+EXCLUDE_FILES = []
+# Only select the canonical sentence of every near-duplicate cluster (needs dedupe.py's output)
+SKIP_DUPLICATES = True
+
+
+def sample_sentences(sentences, topics, per_topic=SAMPLES_PER_TOPIC, exclude=(), seed=SEED):
+    """Sample up to ``per_topic`` sentences for every topic in one pass.
+
+    Candidates are shuffled once with ``seed``, the first ``per_topic`` rows of
+    every topic are kept with a groupby, and the sentence text is fetched with
+    a single join on ``s_id``.
+
+    Args:
+        sentences (pd.DataFrame): Sentences table (s_id, eng, viet, topic_name).
+        topics (pd.DataFrame): Topics table; output follows its topic order.
+        per_topic (int): Maximum number of sentences per topic.
+        exclude (Iterable[int]): s_ids that must not be selected.
+        seed (int): Seed of the shuffle, for reproducible selections.
+
+    Returns:
+        pd.DataFrame: Selected sentences with columns s_id, viet, eng, topic.
+    """
+    candidates = sentences[['s_id', 'topic_name']]
+    candidates = candidates[candidates['topic_name'].isin(topics['topic_name'])
+                            & ~candidates['s_id'].isin(list(exclude))]
+
+    picked = (candidates.sample(frac=1, random_state=seed)
+              .groupby('topic_name', sort=False)
+              .head(per_topic))
+    topic_order = pd.Categorical(picked['topic_name'], categories=topics['topic_name'].unique(), ordered=True)
+    picked = picked.iloc[topic_order.argsort(kind='stable')]
+
+    selected = picked[['s_id']].join(sentences.set_index('s_id')[['viet', 'eng', 'topic_name']], on='s_id')
+    return selected.rename(columns={'topic_name': 'topic'}).reset_index(drop=True)
+
+
+def load_exclusions(paths):
+    """Collect the s_ids listed in previously generated tables."""
+    excluded = set()
+    for path in paths:
+        if os.path.exists(path):
+            excluded.update(pd.read_csv(path, usecols=['s_id'])['s_id'])
+    return excluded
+
+
+if __name__ == "__main__":
+    topics = read_table('topics', DATA_DIR, columns=['topic_id', 'topic_name'])
+    sentences = read_table('sentences', DATA_DIR)
+
+    exclude = load_exclusions(EXCLUDE_FILES)
+    duplicates = load_duplicates(DATA_DIR, sentences) if SKIP_DUPLICATES else None
+    if duplicates is not None:
+        exclude |= non_canonical_ids(duplicates)
+
+    sentences_df = sample_sentences(sentences, topics, SAMPLES_PER_TOPIC, exclude=exclude, seed=SEED)
+
+    # Save the DataFrame to a CSV file
+    write_table(sentences_df, 'selected_sentences', DATA_DIR)
+
+    print("Lesson table has been created successfully!")
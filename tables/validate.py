@@ -0,0 +1,168 @@
+"""Referential-integrity and consistency checks across the final tables.
+
+Every check is a vectorized hash join or groupby over whole columns, so the
+run time grows linearly with the data. Tables are read from the same
+sources as the SQLite loader. Run from the repository root; the exit status
+is 1 when any check fails::
+
+    python tables/validate.py
+    python tables/validate.py --json
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from collections import namedtuple
+
+import pandas as pd
+
+from sqlite_loader import PRIMARY_KEYS, SOURCES, read_source
+from table_io import table_path
+
+MAX_EXAMPLES = 5
+
+# (child table, child columns, parent table, parent columns)
+FOREIGN_KEYS = [
+    ("sentences", ["topic_name"], "topics", ["topic_name"]),
+    ("words", ["s_id"], "sentences", ["s_id"]),
+    ("lessons", ["topic_id"], "topics", ["topic_id"]),
+    ("lessons_sentences", ["s_id"], "sentences", ["s_id"]),
+    ("lessons_sentences", ["topic_id", "lesson_id"], "lessons", ["topic_id", "lesson_id"]),
+    ("progress", ["u_id"], "users", ["u_id"]),
+    ("progress", ["topic_id", "lesson_id"], "lessons", ["topic_id", "lesson_id"]),
+    ("user_friends", ["user_id"], "users", ["u_id"]),
+    ("user_friends", ["friend_id"], "users", ["u_id"]),
+]
+
+# Unique columns besides the primary keys
+UNIQUE_KEYS = [
+    ("topics", ["topic_name"]),
+    ("users", ["username"]),
+    ("users", ["email"]),
+]
+
+MAX_SCORE = 10000
+
+# Outcome of one check; ``examples`` holds up to MAX_EXAMPLES offending rows
+CheckResult = namedtuple("CheckResult", ["check", "table", "detail", "violations", "examples"])
+
+
+def examples_of(df):
+    return json.loads(df.head(MAX_EXAMPLES).to_json(orient="records", date_format="iso"))
+
+
+def check_foreign_key(child, child_columns, parent, parent_columns):
+    """Rows of ``child`` whose key is missing from ``parent`` (hash-based set join)."""
+    if len(child_columns) == 1:
+        missing = ~child[child_columns[0]].isin(parent[parent_columns[0]])
+    else:
+        missing = ~pd.MultiIndex.from_frame(child[child_columns]).isin(
+            pd.MultiIndex.from_frame(parent[parent_columns]))
+    return child[missing]
+
+
+def check_unique(df, columns):
+    """Rows sharing their ``columns`` with another row."""
+    return df[df.duplicated(subset=columns, keep=False)].sort_values(columns)
+
+
+def check_points(users, progress):
+    """Users whose ``points`` differ from the sum of their progress scores."""
+    totals = progress.groupby("u_id")["score"].sum()
+    compared = users[["u_id", "points"]].assign(expected=users["u_id"].map(totals).fillna(0).astype("int64"))
+    # Missing points count as a mismatch
+    mismatched = (compared["points"].astype("Int64") != compared["expected"]).fillna(True).astype(bool)
+    return compared[mismatched]
+
+
+def check_status_scores(progress):
+    """Progress rows whose score is out of range or contradicts their status.
+
+    Not_Started rows score 0, Completed rows MAX_SCORE and In_Progress rows
+    strictly in between.
+    """
+    score = progress["score"]
+    status = progress["status"].astype(str)
+    valid = (
+        ((status == "Not_Started") & (score == 0))
+        | ((status == "Completed") & (score == MAX_SCORE))
+        | ((status == "In_Progress") & (score > 0) & (score < MAX_SCORE))
+    )
+    return progress[~valid]
+
+
+def load_tables(names):
+    """Read the tables whose source exists; the others are reported as skipped."""
+    tables = {}
+    for name in names:
+        source, root = SOURCES[name]
+        paths = [table_path(source, root), table_path(source, root, "parquet")]
+        if name == "user_friends":
+            paths.append(table_path("user_friends_edges", root))
+        if any(os.path.exists(path) for path in paths):
+            tables[name] = read_source(name)
+    return tables
+
+
+def validate(tables=None):
+    """Run every check whose tables are available.
+
+    Args:
+        tables (dict[str, pd.DataFrame]): Tables by name; read from their
+            sources when omitted.
+
+    Returns:
+        list[CheckResult]: One result per check, failed or not. A check
+        whose tables are missing has ``violations`` None.
+    """
+    if tables is None:
+        tables = load_tables(PRIMARY_KEYS)
+
+    def run(check, table, detail, needed, func):
+        if any(name not in tables for name in needed):
+            return CheckResult(check, table, detail, None, [])
+        rows = func()
+        return CheckResult(check, table, detail, len(rows), examples_of(rows))
+
+    results = []
+    for name, columns in list(PRIMARY_KEYS.items()) + UNIQUE_KEYS:
+        results.append(run("unique", name, ", ".join(columns), [name],
+                           lambda: check_unique(tables[name], columns)))
+    for child, child_columns, parent, parent_columns in FOREIGN_KEYS:
+        detail = f"({', '.join(child_columns)}) -> {parent} ({', '.join(parent_columns)})"
+        results.append(run("foreign_key", child, detail, [child, parent],
+                           lambda: check_foreign_key(tables[child], child_columns, tables[parent], parent_columns)))
+    results.append(run("points", "users", "points = sum of progress scores", ["users", "progress"],
+                       lambda: check_points(tables["users"], tables["progress"])))
+    results.append(run("status_score", "progress", "score matches status", ["progress"],
+                       lambda: check_status_scores(tables["progress"])))
+    return results
+
+
+def failed(results):
+    return [result for result in results if result.violations]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check keys and consistency of the final tables.")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    results = validate()
+    seconds = time.perf_counter() - start
+
+    if args.json:
+        print(json.dumps([result._asdict() for result in results], indent=1))
+    else:
+        for result in results:
+            if result.violations is None:
+                outcome = "skipped (table missing)"
+            else:
+                outcome = "ok" if not result.violations else f"{result.violations} violations"
+            print(f"{result.check:<13} {result.table:<18} {result.detail:<55} {outcome}")
+            for example in result.examples if result.violations else []:
+                print(f"    {example}")
+        print(f"{len(failed(results))} of {len(results)} checks failed in {seconds:.3f}s")
+    sys.exit(1 if failed(results) else 0)
@@ -1,40 +1,49 @@
-from pyvi import ViTokenizer, ViPosTagger
-from underthesea import word_tokenize, ner
-import pandas as pd
-from transformers import AutoModel, AutoTokenizer   #type: ignore
-import torch
 import numpy as np
-from sklearn.metrics.pairwise import cosine_similarity
-import random
-from tqdm.auto import tqdm
-from concurrent.futures import ThreadPoolExecutor
 import pickle
 import os
-from deep_translator import GoogleTranslator
-import re 
-import string
+from functools import partial
+from similarity_index import SimilarityIndex
+from embedding_store import EmbeddingStore, update_store
+from quantization import neighbour_overlap, quantized_revision, sample_items
+import models
+from translation_memo import DictionaryBackend, GoogleBackend, TranslationMemo
+from table_io import read_table, write_table
+from words_builder import analyze_shards, make_shards, merge_shards, select_shards
+import metrics
+from dedupe import canonical_sentences
 
 # Configuration
-CACHE_FILE = "data/word_embeddings.pkl"
-SENTENCES_FILE = "data/sentences.csv"
-OUTPUT_FILE = "data/words.csv"
+CACHE_FILE = "data/word_embeddings.npy"
+LEGACY_CACHE_FILE = "data/word_embeddings.pkl"
+EMBED_BATCH_SIZE = 64
+MODEL_NAME = "vinai/phobert-base"
+INDEX_FILE = "data/word_index.npz"
+DATA_DIR = "data"
+SENTENCES_TABLE = "sentences"
+OUTPUT_TABLE = "words"
 STOPWORDS_FILE = "data/stopwords.txt"
-
-# Sentence cleaning function
-def clean_sentence(sentence):
-    """Clean a Vietnamese sentence: lowercase, remove punctuation, strip redundant spaces."""
-    entities = ner(sentence)
-    words = [entity[0] for entity in entities]
-    for entity in entities: 
-        if entity[3] != 'O':
-            words.remove(entity[0])
-            
-    sentence = ' '.join(words)        #type: ignore
-    sentence = sentence.lower()
-    sentence = sentence.translate(str.maketrans(string.punctuation, ' ' * len(string.punctuation)))
-    sentence = re.sub(r'\s+', ' ', sentence).strip()  # Strip redundant spaces
-    
-    return sentence
+ANALYSIS_CACHE_FILE = "data/sentence_analysis.sqlite"
+TRANSLATION_CACHE_FILE = "data/translations.sqlite"
+# "google" for Google Translate, "dictionary" to translate offline from DICTIONARY_FILE
+TRANSLATION_BACKEND = "google"
+DICTIONARY_FILE = "data/words.csv"
+# Sharded execution: shards are fixed s_id ranges, so the output for a given
+# SEED is identical for any number of WORKERS
+SEED = 42
+SHARD_SIZE = 500
+WORKERS = os.cpu_count() or 1
+SHARD_DIR = "data/word_shards"
+SAMPLE_SIZE = 2
+# Run PhoBERT with int8 dynamic quantization (faster on CPU). Its embeddings
+# and index are cached in their own files, so switching keeps the fp32 cache;
+# with CHECK_AGREEMENT the top-k neighbours of AGREEMENT_SAMPLE words are
+# compared against fp32 first.
+QUANTIZE = False
+INT8_CACHE_FILE = "data/word_embeddings_int8.npy"
+INT8_INDEX_FILE = "data/word_index_int8.npz"
+CHECK_AGREEMENT = True
+AGREEMENT_SAMPLE = 500
+AGREEMENT_TOP_N = 10
 
 # Load stopwords
 # Load stopwords
@@ -48,137 +57,113 @@ def load_stopwords(file_path):
             word_set.add(line)
     return word_set
 
-def load_or_create_embeddings(sentences):
-    """Load cached embeddings or create new ones with progress tracking."""
-    if os.path.exists(CACHE_FILE):
-        print("Loading cached embeddings...")
-        with open(CACHE_FILE, "rb") as f:
-            return pickle.load(f)
+def cache_files():
+    """Embedding cache and similarity index files of the current QUANTIZE mode."""
+    return (INT8_CACHE_FILE, INT8_INDEX_FILE) if QUANTIZE else (CACHE_FILE, INDEX_FILE)
+
+def load_or_create_embeddings(analyses):
+    """Load cached embeddings, embedding only vocabulary missing from the cache.
+
+    PhoBERT (or the model worker, see models.py) is only used when words are
+    missing from the cache.
+    """
+    cache_file, _ = cache_files()
+    revision = quantized_revision(models.revision(MODEL_NAME), QUANTIZE)
+    if not EmbeddingStore.exists(CACHE_FILE) and os.path.exists(LEGACY_CACHE_FILE):
+        print("Converting pickled embeddings...")
+        with open(LEGACY_CACHE_FILE, "rb") as f:
+            # Pickled embeddings always came from the fp32 model
+            EmbeddingStore.from_dict(pickle.load(f), MODEL_NAME, models.revision(MODEL_NAME)).save(CACHE_FILE)
     
-    print("Generating new embeddings...")
     vocab = set()
     
     print("Extracting vocabulary...")
-    for sentence in tqdm(sentences, desc="Extracting vocabulary"):
-        cleaned = clean_sentence(sentence)
-        tokenized = ViTokenizer.tokenize(cleaned)
-        words, _ = ViPosTagger.postagging(tokenized)
-        vocab.update(words)
-    
-    print("Generating embeddings...")
-    vocab = list(vocab)
-    embeddings = {}
-    
-    def process_word(word):
-        inputs = tokenizer(word, return_tensors="pt", padding=True, truncation=True)
-        with torch.no_grad():
-            outputs = model(**inputs)
-        return word, outputs.last_hidden_state.mean(dim=1).squeeze().numpy()
+    for analysis in analyses:
+        vocab.update(analysis["tokens"])
     
-    with ThreadPoolExecutor(max_workers=4) as executor:
-        results = list(tqdm(executor.map(process_word, vocab), total=len(vocab), desc="Generating embeddings"))
-        for word, embedding in results:
-            embeddings[word] = embedding
-    
-    with open(CACHE_FILE, "wb") as f:
-        pickle.dump(embeddings, f)
-    
-    return embeddings
+    embed = partial(models.embed, name=MODEL_NAME, quantize=QUANTIZE, batch_size=EMBED_BATCH_SIZE)
+    return update_store(cache_file, sorted(vocab), embed, MODEL_NAME, revision)
 
-# Load PhoBERT
-tokenizer = AutoTokenizer.from_pretrained("vinai/phobert-base", use_fast=True)
-model = AutoModel.from_pretrained("vinai/phobert-base")
+def check_agreement(embedding_store):
+    """Compare the int8 embeddings of a sample of the vocabulary with fp32 ones."""
+    words = sample_items(embedding_store.words, AGREEMENT_SAMPLE, seed=SEED)
+    candidate = np.stack([embedding_store[word] for word in words])
+    reference = models.embed(words, MODEL_NAME, quantize=False, batch_size=EMBED_BATCH_SIZE)
+    report = neighbour_overlap(words, reference, candidate, top_n=AGREEMENT_TOP_N)
+    print(f"int8 vs fp32 on {report['sample']} words: top-{AGREEMENT_TOP_N} overlap {report['overlap']:.1%}, "
+          f"mean cosine {report['mean_cosine']:.4f}")
+    return report
 
-# Load stopwords
-stopwords = load_stopwords(STOPWORDS_FILE)
+def load_or_create_index(embedding_store):
+    """Load the cached similarity index, rebuilding it if the embedding cache is newer."""
+    cache_file, index_file = cache_files()
+    if os.path.exists(index_file) and os.path.getmtime(index_file) >= os.path.getmtime(cache_file):
+        print("Loading cached similarity index...")
+        return SimilarityIndex.load(index_file)
 
-# Initialize translator
-translator = GoogleTranslator(source='vi', target='en')
+    print("Building similarity index...")
+    index = SimilarityIndex(embedding_store.words, embedding_store.matrix)
+    index.save(index_file)
+    return index
 
-# Load sentences
-sentences_df = pd.read_csv(SENTENCES_FILE)
-vietnamese_sentences = sentences_df['viet'].tolist()
+def build_words(sentences_table=SENTENCES_TABLE, output_table=OUTPUT_TABLE, shard_dir=SHARD_DIR,
+                sample_size=SAMPLE_SIZE):
+    """Build a words table from the sentences of ``sentences_table``.
 
-# Get or create embeddings
-word_embeddings = load_or_create_embeddings(vietnamese_sentences)
+    Args:
+        sentences_table (str): Sentences table read from DATA_DIR.
+        output_table (str): Words table written to DATA_DIR; also the name of
+            the metrics run.
+        shard_dir (str): Folder of the per-shard intermediate results.
+        sample_size (int): Target words selected per sentence.
+    """
+    with metrics.run(output_table):
+        # Load stopwords
+        stopwords = load_stopwords(STOPWORDS_FILE)
 
-def find_similar_words(target_word, embeddings_dict, top_n=2):
-    """Find similar words using precomputed embeddings."""
-    if target_word not in embeddings_dict:
-        return []
-    
-    target_embedding = embeddings_dict[target_word].reshape(1, -1)
-    similarities = {}
-    
-    for word, embedding in embeddings_dict.items():
-        if word == target_word:
-            continue
-        similarity = cosine_similarity(target_embedding, embedding.reshape(1, -1))[0][0]
-        similarities[word] = similarity
-    
-    return sorted(similarities, key=similarities.get, reverse=True)[:top_n]   #type: ignore
+        # Initialize translator
+        if TRANSLATION_BACKEND == "dictionary":
+            translation_backend = DictionaryBackend.from_words_table(DICTIONARY_FILE)
+        else:
+            translation_backend = GoogleBackend(source='vi', target='en')
 
-# Process sentences
-words_data = []
-w_id = 1
+        # Load sentences
+        sentences_df = canonical_sentences(read_table(sentences_table, DATA_DIR, columns=['s_id', 'viet']), DATA_DIR)
+        shards = make_shards(sentences_df, SHARD_SIZE)
 
-print("Processing sentences...")
-for _, row in tqdm(sentences_df.iterrows(), total=len(sentences_df), desc="Processing sentences"):
-    s_id = row['s_id']
-    viet_sent = row['viet']
-    
-    cleaned_sent = clean_sentence(viet_sent)
-    tokenized = ViTokenizer.tokenize(cleaned_sent)
-    words, pos_tags = ViPosTagger.postagging(tokenized)
-    
-    candidate_words = [
-        (idx + 1, word)
-        for idx, (word, tag) in enumerate(zip(words, pos_tags))
-        if tag != "Np" and word not in stopwords and word in word_embeddings
-    ]
-
-    print(candidate_words)
-    selected_words = random.sample(candidate_words, min(2, len(candidate_words)))
-    
-    for idx, word in selected_words:
-        # Replace underscore with space for display and translation
-        word_display = word.replace('_', ' ')
-        word_for_translation = word.replace('_', ' ')
-        # Find similar words (assuming this function exists)
-        similar_words = find_similar_words(word, word_embeddings, top_n=2)
-        similar_words_display = [w.replace('_', ' ').lower() for w in similar_words]
-        similar_words_for_translation = [w.replace('_', ' ') for w in similar_words]
-        
-        # Translate the word (assuming a translator object exists)
+        # Clean, segment and tag each sentence once; reused by every phase below
+        with metrics.phase("analysis", items=len(sentences_df)):
+            shard_analyses = analyze_shards(shards, ANALYSIS_CACHE_FILE, workers=WORKERS)
+
+        # Get or create embeddings; PhoBERT is loaded on first use
+        with metrics.phase("embeddings") as p:
+            word_embeddings = load_or_create_embeddings(
+                analysis for analyses in shard_analyses for analysis in analyses)
+            p.items = len(word_embeddings)
+
+        if QUANTIZE and CHECK_AGREEMENT:
+            with metrics.phase("agreement", items=AGREEMENT_SAMPLE):
+                check_agreement(word_embeddings)
+
+        with metrics.phase("index", items=len(word_embeddings)):
+            load_or_create_index(word_embeddings)
+
+        # Select target words and find their similar words, one shard per task
+        print("Processing sentences...")
+        with metrics.phase("similarity", items=len(sentences_df)):
+            shard_paths = select_shards(shards, shard_analyses, cache_files()[1], stopwords, sample_size, SEED,
+                                        shard_dir, top_n=2, workers=WORKERS)
+
+        # Merge shards, assign w_id and translate
+        translator = TranslationMemo(TRANSLATION_CACHE_FILE, translation_backend, source='vi', target='en')
         try:
-            eng = translator.translate(word_for_translation).lower()
-        except Exception as e:
-            eng = "translation_error"
-            print(f"Translation error for word '{word_for_translation}': {e}")
-        
-        # Translate similar words
-        similar_eng = []
-        for sim_word in similar_words_for_translation:
-            try:
-                sim_eng = translator.translate(sim_word).lower()
-                similar_eng.append(sim_eng)
-            except Exception as e:
-                similar_eng.append("translation_error")
-                print(f"Translation error for similar word '{sim_word}': {e}")
-        
-        # Append the row data
-        words_data.append({
-            "w_id": w_id,
-            "s_id": s_id,
-            "idx": idx,
-            "viet": word_display,
-            "viet_similar_words": ", ".join(similar_words_display),
-            "eng": eng,
-            "eng_similar_words": ", ".join(similar_eng)
-        })
-        w_id += 1
-
-# Save results with specified columns
-columns = ["w_id", "s_id", "idx", "viet", "viet_similar_words", "eng", "eng_similar_words"]
-pd.DataFrame(words_data, columns=columns).to_csv(OUTPUT_FILE, index=False)
-print("Successfully created the words table!")
\ No newline at end of file
+            with metrics.phase("translate") as p:
+                words_df = merge_shards(shard_paths, translator)
+                p.items = len(words_df)
+            write_table(words_df, output_table, DATA_DIR)
+        finally:
+            translator.close()
+        print(f"Successfully created the {output_table} table!")
+
+if __name__ == "__main__":
+    build_words()
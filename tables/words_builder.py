@@ -0,0 +1,146 @@
+import hashlib
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+import pandas as pd
+from tqdm.auto import tqdm
+
+from sentence_analysis import SentenceAnalysisCache
+from similarity_index import SimilarityIndex
+
+COLUMNS = ["w_id", "s_id", "idx", "viet", "viet_similar_words", "eng", "eng_similar_words"]
+SHARD_COLUMNS = ["s_id", "idx", "word", "similar_words"]
+
+# Similarity index of the current worker process, see _init_select_worker
+_index = None
+
+
+def shard_seed(seed, shard_id):
+    """Seed for one shard, derived from the run seed and the shard id only."""
+    digest = hashlib.sha256(f"{seed}:{shard_id}".encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big")
+
+
+def make_shards(sentences_df, shard_size):
+    """Split sentences into contiguous ``s_id`` ranges of ``shard_size`` rows.
+
+    Shard boundaries depend only on the data and ``shard_size``, never on the
+    number of workers, which is what keeps the output reproducible.
+
+    Returns:
+        list[tuple[int, list[int], list[str]]]: (shard_id, s_ids, sentences).
+    """
+    df = sentences_df.sort_values("s_id", kind="stable")
+    s_ids = df["s_id"].tolist()
+    sentences = df["viet"].tolist()
+    return [
+        (shard_id, s_ids[start:start + shard_size], sentences[start:start + shard_size])
+        for shard_id, start in enumerate(range(0, len(s_ids), shard_size))
+    ]
+
+
+def _map(func, items, workers, desc, initializer=None, initargs=()):
+    """Run ``func`` over ``items`` in order, in a process pool if ``workers`` > 1."""
+    if workers <= 1:
+        if initializer is not None:
+            initializer(*initargs)
+        return [func(item) for item in tqdm(items, desc=desc)]
+    with ProcessPoolExecutor(max_workers=workers, initializer=initializer, initargs=initargs) as executor:
+        return list(tqdm(executor.map(func, items), total=len(items), desc=desc))
+
+
+def _analyze_shard(shard, analysis_cache_file):
+    _, _, sentences = shard
+    cache = SentenceAnalysisCache(analysis_cache_file)
+    analyses = cache.analyze_many(sentences)
+    cache.close()
+    return analyses
+
+
+def analyze_shards(shards, analysis_cache_file, workers=1):
+    """Analyse (NER, segmentation, tagging) every shard, in parallel if requested.
+
+    Returns:
+        list[list[dict]]: Analyses per shard, aligned with the shard sentences.
+    """
+    return _map(partial(_analyze_shard, analysis_cache_file=analysis_cache_file),
+                shards, workers, "Analysing shards")
+
+
+def _init_select_worker(index_file):
+    global _index
+    _index = SimilarityIndex.load(index_file)
+
+
+def _select_shard(task, stopwords, sample_size, top_n, seed, shard_dir):
+    (shard_id, s_ids, _), analyses = task
+    rng = random.Random(shard_seed(seed, shard_id))
+
+    rows = []
+    for s_id, analysis in zip(s_ids, analyses):
+        candidate_words = [
+            (idx + 1, word)
+            for idx, (word, tag) in enumerate(zip(analysis["tokens"], analysis["pos_tags"]))
+            if tag != "Np" and word not in stopwords and word in _index
+        ]
+        for idx, word in rng.sample(candidate_words, min(sample_size, len(candidate_words))):
+            rows.append((s_id, idx, word))
+
+    similar_words_map = _index.most_similar((word for _, _, word in rows), top_n=top_n)
+    shard_df = pd.DataFrame(
+        [(s_id, idx, word, " ".join(similar_words_map[word])) for s_id, idx, word in rows],
+        columns=SHARD_COLUMNS,
+    )
+    path = os.path.join(shard_dir, f"shard_{shard_id:05d}.csv")
+    shard_df.to_csv(path, index=False)
+    return path
+
+
+def select_shards(shards, shard_analyses, index_file, stopwords, sample_size, seed,
+                  shard_dir, top_n=2, workers=1):
+    """Pick target words and their distractors for every shard.
+
+    Each shard samples with its own ``random.Random(shard_seed(seed, shard_id))``
+    and writes ``shard_{id}.csv`` to ``shard_dir``.
+
+    Returns:
+        list[str]: Paths of the per-shard outputs, in shard order.
+    """
+    os.makedirs(shard_dir, exist_ok=True)
+    func = partial(_select_shard, stopwords=stopwords, sample_size=sample_size,
+                   top_n=top_n, seed=seed, shard_dir=shard_dir)
+    return _map(func, list(zip(shards, shard_analyses)), workers, "Selecting words",
+                initializer=_init_select_worker, initargs=(index_file,))
+
+
+def merge_shards(shard_paths, translator):
+    """Merge per-shard outputs into the words table.
+
+    ``w_id`` is assigned sequentially in shard order, so it is independent of
+    how the shards were scheduled. All words are translated in one
+    deduplicated pass through ``translator`` (a ``TranslationMemo``).
+    """
+    frames = [pd.read_csv(path, dtype={"word": str, "similar_words": str}, keep_default_na=False)
+              for path in shard_paths]
+    selected = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=SHARD_COLUMNS)
+
+    words = [word.replace('_', ' ') for word in selected["word"]]
+    similar_words = [[w.replace('_', ' ') for w in similar.split()] for similar in selected["similar_words"]]
+
+    print("Translating words...")
+    texts_to_translate = list(words)
+    for similar in similar_words:
+        texts_to_translate.extend(similar)
+    translations = translator.translate_many(texts_to_translate)
+
+    return pd.DataFrame({
+        "w_id": range(1, len(selected) + 1),
+        "s_id": selected["s_id"].astype(int),
+        "idx": selected["idx"].astype(int),
+        "viet": words,
+        "viet_similar_words": [", ".join(w.lower() for w in similar) for similar in similar_words],
+        "eng": [translations[word].lower() for word in words],
+        "eng_similar_words": [", ".join(translations[w].lower() for w in similar) for similar in similar_words],
+    }, columns=COLUMNS)
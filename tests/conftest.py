@@ -0,0 +1,6 @@
+import os
+import sys
+
+# The table scripts import each other as top-level modules, as when run from tables/
+TABLES_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "tables")
+sys.path.insert(0, TABLES_DIR)
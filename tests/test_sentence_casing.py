@@ -0,0 +1,74 @@
+"""The bulk casing path must match the original one-sentence-at-a-time rules."""
+import os
+
+import pandas as pd
+import pytest
+
+SENTENCES_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "sentences.csv")
+SAMPLE_SIZE = 200
+SEED = 42
+
+
+def reference_english(nlp, sentence):
+    """process_sentence(sentence, 'en') before the bulk rewrite: full pipeline, one call per sentence."""
+    tokens = []
+    for i, token in enumerate(nlp(sentence)):
+        text = token.text
+        if token.pos_ == "PROPN":
+            text = text.capitalize()
+        if i == 0 and token.pos_ != "PROPN":
+            text = text.capitalize()
+        tokens.append(text + token.whitespace_)
+    return "".join(tokens)
+
+
+def reference_vietnamese(sentence):
+    """process_sentence(sentence, 'vi') before the bulk rewrite."""
+    from underthesea import pos_tag
+
+    tokens = []
+    for i, (word, tag) in enumerate(pos_tag(sentence)):
+        new_word = word
+        if tag == "Np":
+            new_word = word.capitalize()
+        if i == 0 and tag != "Np":
+            new_word = word.capitalize()
+        tokens.append(new_word)
+    return " ".join(tokens)
+
+
+@pytest.fixture(scope="module")
+def sentences():
+    if not os.path.exists(SENTENCES_FILE):
+        pytest.skip("data/sentences.csv is not available")
+    df = pd.read_csv(SENTENCES_FILE, usecols=["eng", "viet"], keep_default_na=False, dtype=str)
+    # Lowercased, as the dataset sentences are before normalization
+    return df.sample(min(SAMPLE_SIZE, len(df)), random_state=SEED).apply(lambda column: column.str.lower())
+
+
+@pytest.fixture(scope="module")
+def nlp():
+    spacy = pytest.importorskip("spacy")
+    try:
+        return spacy.load("en_core_web_sm")
+    except OSError:
+        pytest.skip("en_core_web_sm is not installed")
+
+
+def test_english_bulk_matches_per_sentence(sentences, nlp):
+    from sentence_casing import english_pool, normalize_english_bulk
+
+    expected = [reference_english(nlp, sentence) for sentence in sentences["eng"]]
+    assert normalize_english_bulk(sentences["eng"].tolist(), nlp, batch_size=32) == expected
+    with english_pool("en_core_web_sm", 2) as executor:
+        assert normalize_english_bulk(sentences["eng"].tolist(), None, batch_size=32, executor=executor) == expected
+
+
+def test_vietnamese_bulk_matches_per_sentence(sentences):
+    pytest.importorskip("underthesea")
+    from sentence_casing import normalize_vietnamese_bulk, vietnamese_pool
+
+    expected = [reference_vietnamese(sentence) for sentence in sentences["viet"]]
+    assert normalize_vietnamese_bulk(sentences["viet"].tolist()) == expected
+    with vietnamese_pool(2) as executor:
+        assert normalize_vietnamese_bulk(sentences["viet"].tolist(), executor, chunksize=16) == expected
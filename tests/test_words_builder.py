@@ -0,0 +1,66 @@
+"""The sharded words build must give the same output for any number of workers."""
+import os
+import random
+import zlib
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from similarity_index import SimilarityIndex
+from translation_memo import DictionaryBackend, TranslationMemo
+from words_builder import make_shards, merge_shards, select_shards
+
+SEED = 42
+NUM_SENTENCES = 300
+SHARD_SIZE = 40
+TAGS = ["N", "V", "A", "Np"]
+
+
+@pytest.fixture(scope="module")
+def fixture(tmp_path_factory):
+    """Sentences, their analyses and a similarity index over their vocabulary."""
+    root = tmp_path_factory.mktemp("words")
+    rng = random.Random(SEED)
+    vocab = [f"tu_{i}" for i in range(200)]
+    s_ids = rng.sample(range(1, 10 * NUM_SENTENCES), NUM_SENTENCES)
+    tokens = {s_id: rng.choices(vocab, k=rng.randint(3, 12)) for s_id in s_ids}
+    sentences = pd.DataFrame({"s_id": s_ids, "viet": [" ".join(tokens[s_id]) for s_id in s_ids]})
+
+    shards = make_shards(sentences, SHARD_SIZE)
+    tags = {word: TAGS[zlib.crc32(word.encode("utf-8")) % len(TAGS)] for word in vocab}
+    analyses = [[{"tokens": tokens[s_id], "pos_tags": [tags[word] for word in tokens[s_id]]} for s_id in shard_s_ids]
+                for _, shard_s_ids, _ in shards]
+
+    index_file = str(root / "index.npz")
+    matrix = np.random.default_rng(SEED).standard_normal((len(vocab), 16), dtype=np.float32)
+    SimilarityIndex(vocab, matrix).save(index_file)
+    backend = DictionaryBackend({word.replace("_", " "): f"word {word}" for word in vocab})
+    return root, shards, analyses, index_file, backend
+
+
+def build(fixture, workers):
+    root, shards, analyses, index_file, backend = fixture
+    shard_dir = root / f"shards_{workers}"
+    shard_paths = select_shards(shards, analyses, index_file, {"tu_0"}, 2, SEED, str(shard_dir),
+                                top_n=2, workers=workers)
+    translator = TranslationMemo(str(root / f"translations_{workers}.sqlite"), backend)
+    try:
+        words = merge_shards(shard_paths, translator)
+    finally:
+        translator.close()
+    output = root / f"words_{workers}.csv"
+    words.to_csv(output, index=False)
+    return shard_paths, output
+
+
+def test_output_independent_of_workers(fixture):
+    serial_shards, serial_output = build(fixture, workers=1)
+    parallel_shards, parallel_output = build(fixture, workers=4)
+
+    assert [os.path.basename(path) for path in serial_shards] == [os.path.basename(path) for path in parallel_shards]
+    for serial, parallel in zip(serial_shards, parallel_shards):
+        with open(serial, "rb") as a, open(parallel, "rb") as b:
+            assert a.read() == b.read()
+    assert serial_output.read_bytes() == parallel_output.read_bytes()
+    assert len(pd.read_csv(serial_output)) > 0